@@ -2,7 +2,13 @@ from fastapi import FastAPI
 import logging
 import logging.config
 
+from api.core.admission import DeadlineMiddleware
+from api.core.compression import CompressionMiddleware
 from api.core.exceptions import APIException, api_exception_handler
+from api.core.executor import get_executor
+from api.core.metrics import MetricsMiddleware, metrics_endpoint
+from api.core.readiness import get_readiness, ready_endpoint
+from api.core.tracing import TracingMiddleware, get_trace
 from .urls import router
 from .settings import get_app_settings, AppSettings
 
@@ -39,6 +45,10 @@ def setup_logging(app_settings: AppSettings):
     logging.config.dictConfig(log_config)
 
 
+async def executor_stats():
+    return get_executor().stats
+
+
 def create_app(testing: bool = False) -> FastAPI:
     """
     Prepares the app instance, connects to database and
@@ -52,10 +62,38 @@ def create_app(testing: bool = False) -> FastAPI:
 
     app.state.testing = testing
 
+    @app.on_event("startup")
+    def warm_up() -> None:
+        # The API only reports to be ready once warmed up, it answers other requests meanwhile
+        if app_settings.warm_up_enabled:
+            app.state.warm_up = get_readiness().start()
+        else:
+            get_readiness().mark_ready()
+
     @app.on_event("shutdown")
-    def shutdown() -> None:
+    async def shutdown() -> None:
         logging.getLogger("main").info("API shutdown...")
+        # Services are stopped after this, so they must not be warming up anymore
+        if getattr(app.state, "warm_up", None) is not None:
+            await app.state.warm_up
 
     app.add_exception_handler(APIException, api_exception_handler)
     app.include_router(router)
+    if app_settings.compression_enabled:
+        # Innermost, so decompressing the requests counts in their parsing and deadlines
+        app.add_middleware(
+            CompressionMiddleware,
+            max_decompressed_size=app_settings.request_max_decompressed_mb * 1024 * 1024,
+            min_size=app_settings.response_compression_min_size,
+            gzip_level=app_settings.response_gzip_level,
+            zstd_level=app_settings.response_zstd_level,
+        )
+    app.add_middleware(DeadlineMiddleware)
+    app.add_middleware(TracingMiddleware)
+    app.add_api_route("/ready", ready_endpoint, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/executor", executor_stats, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/traces/{trace_id}", get_trace, methods=["GET"], include_in_schema=False)
+    if app_settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+        app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
     return app
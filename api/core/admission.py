@@ -0,0 +1,159 @@
+import time
+import typing
+import asyncio
+import logging
+import contextvars
+import collections
+from api.core.exceptions import ServiceUnavailableException
+from api.core.metrics import REGISTRY, Counter
+
+
+# Milliseconds the client is willing to wait for the response, counted from when the request arrives
+DEADLINE_HEADER = b"x-deadline-ms"
+
+REJECTED = REGISTRY.register(
+    Counter("api_admission_rejected_total", "Calculations rejected by the admission control, by reason", ["reason"])
+)
+# Reasons to reject a calculation
+QUEUE_FULL = "queue_full"
+DEADLINE_EXCEEDED = "deadline_exceeded"
+
+
+logger = logging.getLogger("api.core.admission")
+
+
+_deadline: contextvars.ContextVar[typing.Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> typing.Optional[float]:
+    """
+    Returns the deadline of the request being handled, in `time.monotonic()` seconds, None when it has none
+    :return:
+    """
+    return _deadline.get()
+
+
+def clear_deadline() -> None:
+    # For work done on behalf of several requests, which none of their deadlines applies to
+    _deadline.set(None)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware reading the deadline of the requests from their `X-Deadline-Ms` header. Requests without it,
+    or with an invalid value, have no deadline.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        deadline = None
+        for name, value in scope["headers"]:
+            if name == DEADLINE_HEADER:
+                try:
+                    deadline = time.monotonic() + float(value) / 1000
+                except ValueError:
+                    logger.debug(f"Ignoring invalid deadline {value!r}")
+        token = _deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+
+class Admission:
+    """
+    Bounds the calculations running at the same time, and the ones waiting for their turn. Calculations over both
+    limits, or whose request deadline passes before they start, are rejected straight away with a 503 telling the
+    client when to retry, instead of being queued to finish once nobody waits for them.
+
+    Waiting calculations start in order of arrival.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int = 1):
+        """
+        :param max_concurrency: Maximum number of calculations running, 0 for no limit
+        :param max_queue: Maximum number of calculations waiting to run
+        :param retry_after: Seconds clients are told to wait before retrying rejected requests
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.running = 0
+        self._waiters: typing.Deque[asyncio.Future] = collections.deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def reject(self, reason: str, msg: str) -> ServiceUnavailableException:
+        REJECTED.inc(reason)
+        return ServiceUnavailableException(msg, retry_after=self.retry_after)
+
+    def check_deadline(self, deadline: typing.Optional[float]) -> None:
+        """
+        Rejects calculations whose request deadline has already passed, e.g. before running them inline
+        :param deadline: Deadline of the request, in `time.monotonic()` seconds
+        :raises ServiceUnavailableException: When the deadline has passed
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            raise self.reject(DEADLINE_EXCEEDED, "Request deadline exceeded before starting its calculations")
+
+    async def acquire(self, deadline: typing.Optional[float] = None) -> float:
+        """
+        Waits for a slot to run a calculation, which must be released afterwards
+        :param deadline: Deadline of the request, in `time.monotonic()` seconds
+        :return: Seconds waited
+        :raises ServiceUnavailableException: When the queue is full, or the deadline passes
+        """
+        self.check_deadline(deadline)
+        if self.max_concurrency <= 0 or (self.running < self.max_concurrency and not self._waiters):
+            self.running += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise self.reject(QUEUE_FULL, "Too many calculations waiting, try again later")
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            timeout = deadline - start if deadline is not None else None
+            # Slots are handed over by `release`, which sets the result of the waiter
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise self.reject(DEADLINE_EXCEEDED, "Request deadline exceeded while waiting for its calculations")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return time.monotonic() - start
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot was handed over meanwhile, so it goes to the next one
+            self.release()
+        else:
+            self._waiters.remove(waiter)
+            waiter.cancel()
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot goes straight to the next calculation, so running stays the same
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    @property
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "rejected": {reason: REJECTED.value(reason) for reason in (QUEUE_FULL, DEADLINE_EXCEEDED)},
+        }
@@ -0,0 +1,92 @@
+import typing
+import asyncio
+from api.core.admission import clear_deadline
+from api.core.metrics import REGISTRY, Histogram
+
+
+BATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "api_microbatch_size",
+        "Requests calculated together by each micro-batch",
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    )
+)
+
+
+class MicroBatcher:
+    """
+    Collects the items submitted by concurrent requests and runs them in batches, so a burst of requests costs one
+    calculation instead of one each.
+
+    Items are grouped by key, and only items sharing a key go in the same batch. A batch is run once its first item
+    has waited for the window, or straight away when it gets to the maximum size. Each request waits for its own
+    result, or gets its own exception.
+    """
+
+    def __init__(
+        self,
+        run: typing.Callable[[typing.Hashable, typing.List[typing.Any]], typing.Awaitable[typing.List[typing.Any]]],
+        window: float,
+        max_size: int,
+    ):
+        """
+        :param run: Coroutine function calculating a batch, given its key and items. It returns a result for each
+        item in the same order, which is an exception for items that failed.
+        :param window: Seconds the first item of a batch waits for others
+        :param max_size: Maximum number of items of a batch
+        """
+        self.run = run
+        self.window = window
+        self.max_size = max_size
+        self._groups: typing.Dict[typing.Hashable, typing.List[typing.Tuple[typing.Any, asyncio.Future]]] = {}
+        self._timers: typing.Dict[typing.Hashable, asyncio.TimerHandle] = {}
+        # Running batches, so they are not garbage collected while running
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    async def submit(self, key: typing.Hashable, item: typing.Any) -> typing.Any:
+        """
+        Adds the item to the batch of its key, and waits for its result
+        :param key:
+        :param item:
+        :return: The item result
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = self._groups.setdefault(key, [])
+        group.append((item, future))
+        if len(group) >= self.max_size:
+            self.flush(key)
+        elif len(group) == 1:
+            self._timers[key] = loop.call_later(self.window, self.flush, key)
+        return await future
+
+    def flush(self, key: typing.Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, None)
+        if group:
+            task = asyncio.ensure_future(self._run(key, group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: typing.Hashable, group: typing.List[typing.Tuple[typing.Any, asyncio.Future]]) -> None:
+        # Batches are calculated on behalf of several requests, so none of their deadlines applies
+        clear_deadline()
+        BATCH_SIZE.observe(len(group))
+        try:
+            results = await self.run(key, [item for item, _ in group])
+        except Exception as e:
+            results = [e] * len(group)
+        for (_, future), result in zip(group, results):
+            # Requests cancelled meanwhile, e.g. when their client went away, don't wait anymore
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(group) for group in self._groups.values())
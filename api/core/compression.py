@@ -0,0 +1,316 @@
+import zlib
+import typing
+import importlib.util
+from functools import lru_cache
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import ClientDisconnect, Request
+from api.core.exceptions import (
+    APIException,
+    BadRequestException,
+    PayloadTooLargeException,
+    UnsupportedMediaTypeException,
+    api_exception_handler,
+)
+
+
+GZIP = "gzip"
+ZSTD = "zstd"
+IDENTITY = "identity"
+ALIASES = {"x-gzip": GZIP}
+# Bodies are decompressed in pieces of this size at most, so a small compressed chunk can't inflate far past the
+# limit before it is checked
+PIECE_SIZE = 64 * 1024
+# Compressed bytes given to zstd at once, since its output can't be limited
+ZSTD_SLICE_SIZE = 128
+
+
+@lru_cache(maxsize=1)
+def zstd_available() -> bool:
+    # zstd is optional, the codec is only imported when used so it does not slow down the API start
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def supported_encodings() -> typing.List[str]:
+    # In order of preference, for clients accepting several of them equally
+    return [ZSTD, GZIP] if zstd_available() else [GZIP]
+
+
+def negotiate_encoding(accept_encoding: typing.Optional[str]) -> typing.Optional[str]:
+    """
+    Picks the encoding of the response among the ones the client accepts, with the highest quality value
+    :param accept_encoding: `Accept-Encoding` header
+    :return: The encoding, None to send the response as it is
+    """
+    if not accept_encoding:
+        return None
+    qualities: typing.Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        coding = coding.strip().lower()
+        qualities[ALIASES.get(coding, coding)] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class LimitedBuffer:
+    """
+    Collects the pieces of a decompressed body, failing as soon as they go over the limit
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self.chunks: typing.List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.limit:
+            raise PayloadTooLargeException(f"Request body is bigger than {self.limit} bytes once decompressed")
+        self.chunks.append(data)
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def trailing_data(encoding: str) -> BadRequestException:
+    # Only a single gzip member or zstd frame is accepted, anything after it would be silently lost
+    return BadRequestException(f"Invalid {encoding} request body: data after the end of the stream")
+
+
+class GzipDecoder:
+    def __init__(self, sink: LimitedBuffer):
+        self.sink = sink
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> None:
+        try:
+            while data:
+                if self.decompressor.eof:
+                    raise trailing_data(GZIP)
+                self.sink.write(self.decompressor.decompress(data, PIECE_SIZE))
+                if self.decompressor.unused_data:
+                    raise trailing_data(GZIP)
+                data = self.decompressor.unconsumed_tail
+        except zlib.error as e:
+            raise BadRequestException(f"Invalid gzip request body: {e}")
+
+    def finish(self) -> None:
+        if not self.decompressor.eof:
+            raise BadRequestException("Invalid gzip request body: truncated")
+
+
+class ZstdDecoder:
+    def __init__(self, sink: LimitedBuffer):
+        import zstandard
+
+        self.sink = sink
+        self.error = zstandard.ZstdError
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj(write_size=PIECE_SIZE)
+
+    def feed(self, data: bytes) -> None:
+        # zstd gives all the output of the data at once, so it is fed in slices small enough for their output to be
+        # checked against the limit before much more of it is decompressed, about 4 MB at most
+        data = memoryview(data)
+        try:
+            for start in range(0, len(data), ZSTD_SLICE_SIZE):
+                if self.decompressor.eof:
+                    raise trailing_data(ZSTD)
+                self.sink.write(self.decompressor.decompress(data[start : start + ZSTD_SLICE_SIZE]))
+                if self.decompressor.unused_data:
+                    raise trailing_data(ZSTD)
+        except self.error as e:
+            raise BadRequestException(f"Invalid zstd request body: {e}")
+
+    def finish(self) -> None:
+        if not self.decompressor.eof:
+            raise BadRequestException("Invalid zstd request body: truncated")
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Streamed chunks are flushed, so clients can decode each one as it arrives
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        import zstandard
+
+        self.block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self.compressor.compress(data) + (self.compressor.flush() if final else self.compressor.flush(self.block))
+
+
+DECODERS = {GZIP: GzipDecoder, ZSTD: ZstdDecoder}
+ENCODERS = {GZIP: GzipEncoder, ZSTD: ZstdEncoder}
+
+
+async def read_decompressed(receive, encoding: str, limit: int) -> bytes:
+    """
+    Reads a compressed request body, decompressing each chunk as it arrives, so the compressed body is never held
+    whole
+    :param receive: ASGI receive channel of the request
+    :param encoding: Content encoding of the body
+    :param limit: Maximum size of the decompressed body, in bytes
+    :return: Decompressed body
+    :raises UnsupportedMediaTypeException: When the encoding is not supported
+    :raises PayloadTooLargeException: When the decompressed body goes over the limit
+    :raises BadRequestException: When the body is not valid for its encoding
+    """
+    if encoding not in supported_encodings():
+        raise UnsupportedMediaTypeException(
+            f"Content encoding '{encoding}' not supported, use one of: {', '.join(supported_encodings())}"
+        )
+    sink = LimitedBuffer(limit)
+    decoder = DECODERS[encoding](sink)
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnect()
+        decoder.feed(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    decoder.finish()
+    return sink.getvalue()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware decompressing gzip or zstd request bodies, given in their `Content-Encoding` header, and
+    compressing responses with the best encoding of the request `Accept-Encoding` header.
+
+    Decompressed bodies are limited in size, to protect the memory from small payloads inflating into huge ones.
+    Responses are compressed when they are at least the minimum size, or streamed, chunk by chunk.
+    """
+
+    def __init__(self, app, max_decompressed_size: int, min_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        """
+        :param app:
+        :param max_decompressed_size: Maximum size of the decompressed request bodies, in bytes
+        :param min_size: Minimum size of the responses to compress, in bytes
+        :param gzip_level: Compression level of gzip responses
+        :param zstd_level: Compression level of zstd responses
+        """
+        self.app = app
+        self.max_decompressed_size = max_decompressed_size
+        self.min_size = min_size
+        self.levels = {GZIP: gzip_level, ZSTD: zstd_level}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+
+        codings = [coding.strip().lower() for coding in headers.get("content-encoding", "").split(",")]
+        codings = [ALIASES.get(coding, coding) for coding in codings if coding and coding != IDENTITY]
+        if codings:
+            try:
+                if len(codings) > 1:
+                    raise UnsupportedMediaTypeException("Only one content encoding is supported")
+                body = await read_decompressed(receive, codings[0], self.max_decompressed_size)
+            except APIException as error:
+                return await api_exception_handler(Request(scope), error)(scope, receive, send)
+            except ClientDisconnect:
+                return
+            # Replaced in place, so the middlewares around this one see what the router adds to the scope
+            scope["headers"] = decoded_headers(scope["headers"], len(body))
+            receive = replay_body(body, receive)
+
+        encoding = negotiate_encoding(headers.get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, CompressingSender(send, encoding, self.levels[encoding], self.min_size))
+
+
+def decoded_headers(raw: typing.List[typing.Tuple[bytes, bytes]], size: int) -> typing.List[typing.Tuple[bytes, bytes]]:
+    # The app gets the body as if it was sent decompressed
+    headers = [(name, value) for name, value in raw if name not in (b"content-encoding", b"content-length")]
+    return headers + [(b"content-length", str(size).encode())]
+
+
+def replay_body(body: bytes, receive):
+    sent = False
+
+    async def receive_body():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Waits for the client to disconnect, same as the server would
+        return await receive()
+
+    return receive_body
+
+
+class CompressingSender:
+    """
+    Wraps the ASGI send channel of a request, compressing the response body with the negotiated encoding
+    """
+
+    def __init__(self, send, encoding: str, level: int, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.min_size = min_size
+        self.start: typing.Optional[typing.Dict] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message: typing.Dict) -> None:
+        if message["type"] == "http.response.start":
+            # Held until the first body chunk, which tells whether the response is worth compressing
+            self.start = message
+            headers = MutableHeaders(raw=message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            # The bytes sent depend on the compression, so the tag only identifies the content. It is weak whenever
+            # an encoding is negotiated, compressed or not, so 304 responses carry the same tag as the 200 ones they
+            # revalidate. Tags are compared weakly, so the ones sent back still match.
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}"
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if (
+                "content-encoding" in headers
+                or self.start["status"] in (204, 304)
+                or (not more_body and len(body) < self.min_size)
+            ):
+                self.passthrough = True
+                await self.send(self.start)
+                return await self.send(message)
+            self.encoder = ENCODERS[self.encoding](self.level)
+            headers["content-encoding"] = self.encoding
+            body = self.encoder.compress(body, final=not more_body)
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(body))
+            await self.send(self.start)
+        else:
+            body = self.encoder.compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -13,8 +13,11 @@ BAD_TOKEN = "bad_token"
 UNAUTHORIZED = "unauthorized"
 NOT_ALLOWED = "No_permissions_enough"
 NOT_FOUND = "not_found"
+PAYLOAD_TOO_LARGE = "payload_too_large"
+UNSUPPORTED_MEDIA_TYPE = "unsupported_media_type"
 NO_CONTENT = "no_content"
 NOT_IMPLEMENTED = "not_implemented"
+SERVICE_UNAVAILABLE = "service_unavailable"
 IM_A_TEAPOT = "Teapot"
 
 
@@ -26,8 +29,11 @@ ERRORS = {
     BAD_TOKEN: "Invalid login token.",
     BAD_CREDENTIALS: "Invalid username/password credentials provided.",
     NOT_FOUND: "Requested resource could not be found.",
+    PAYLOAD_TOO_LARGE: "The request payload is bigger than allowed.",
+    UNSUPPORTED_MEDIA_TYPE: "The request payload is in a format not supported.",
     NO_CONTENT: "Found no valid data to return.",
     NOT_IMPLEMENTED: "This feature has not yet been implemented.",
+    SERVICE_UNAVAILABLE: "The service is not available at the moment, try again later.",
     IM_A_TEAPOT: "I'm a teapot",
 }
 
@@ -40,7 +46,7 @@ class APIException(Exception):
     Base exception for webservice API calls
     """
 
-    def __init__(self, msg=None, status_code=500, error_code=UNEXPECTED, response_type="error"):
+    def __init__(self, msg=None, status_code=500, error_code=UNEXPECTED, response_type="error", headers=None):
         super().__init__(self)
         if not msg:
             if error_code not in ERRORS:
@@ -50,6 +56,8 @@ class APIException(Exception):
         self.status_code = status_code
         self.error_code = error_code
         self.response_type = response_type
+        # Extra headers of the error response
+        self.headers = headers
 
     @property
     def traceback(self):
@@ -89,6 +97,11 @@ class APIException(Exception):
         """
         return f"{self.__class__}: {self.message}"
 
+    def __reduce__(self):
+        # Exceptions are rebuilt from their args, which hold the exception itself, so they are pickled by their
+        # attributes instead. Needed to send them back from worker processes.
+        return _rebuild_exception, (self.__class__, self.__dict__)
+
 
 class BadRequestException(APIException):
     """Abstracts Bad request (HTTP 400) in a general case"""
@@ -132,6 +145,20 @@ class NotFoundException(APIException):
         super().__init__(msg, status_code, error_code)
 
 
+class PayloadTooLargeException(APIException):
+    """Abstracts Payload Too Large (HTTP 413), e.g. for bodies growing over the limit once decompressed"""
+
+    def __init__(self, msg=None, status_code=413, error_code=PAYLOAD_TOO_LARGE):
+        super().__init__(msg, status_code, error_code)
+
+
+class UnsupportedMediaTypeException(APIException):
+    """Abstracts Unsupported Media Type (HTTP 415), e.g. for bodies with an unknown content encoding"""
+
+    def __init__(self, msg=None, status_code=415, error_code=UNSUPPORTED_MEDIA_TYPE):
+        super().__init__(msg, status_code, error_code)
+
+
 class NoContentException(APIException):
     """
     Abstracts a No Content Response.
@@ -151,6 +178,17 @@ class NotImplementedServiceError(APIException):
         super().__init__(msg, status_code, error_code)
 
 
+class ServiceUnavailableException(APIException):
+    """
+    Server can not handle the request right now, e.g. it is still starting or overloaded (HTTP 503).
+    Clients are told when to retry when `retry_after` is given, in seconds.
+    """
+
+    def __init__(self, msg=None, status_code=503, error_code=SERVICE_UNAVAILABLE, retry_after=None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        super().__init__(msg, status_code, error_code, headers=headers)
+
+
 class ImATeapotError(APIException):
     """
     This is actually used to distract some weird clients that could be
@@ -161,6 +199,13 @@ class ImATeapotError(APIException):
         super().__init__(msg, status_code, error_code)
 
 
+def _rebuild_exception(cls, attributes):
+    error = cls.__new__(cls)
+    Exception.__init__(error, error)
+    error.__dict__.update(attributes)
+    return error
+
+
 def error_factory(error_code, message=None):
     """
     Return the right exception for the given error code
@@ -173,8 +218,11 @@ def error_factory(error_code, message=None):
         BAD_REQUEST: BadRequestException,
         UNAUTHORIZED: UnauthorizedException,
         NOT_FOUND: NotFoundException,
+        PAYLOAD_TOO_LARGE: PayloadTooLargeException,
+        UNSUPPORTED_MEDIA_TYPE: UnsupportedMediaTypeException,
         NO_CONTENT: NoContentException,
         NOT_IMPLEMENTED: NotImplementedServiceError,
+        SERVICE_UNAVAILABLE: ServiceUnavailableException,
         IM_A_TEAPOT: ImATeapotError,
     }
     if error_code not in ERRORS:
@@ -198,4 +246,6 @@ def api_exception_handler(request: Request, error: APIException):
         "responseType": error.response_type,
     }
 
-    return JSONResponse(status_code=error.status_code, content=item, media_type="application/json")
+    return JSONResponse(
+        status_code=error.status_code, content=item, media_type="application/json", headers=error.headers
+    )
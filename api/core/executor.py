@@ -0,0 +1,237 @@
+import os
+import time
+import typing
+import asyncio
+import logging
+import contextvars
+import threading
+import functools
+import importlib
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import Executor as PoolExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from api.core.admission import Admission, current_deadline
+from api.core.metrics import REGISTRY, Gauge, observe_stage
+from api.core.tracing import current_trace
+from api.settings import get_app_settings
+
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+
+logger = logging.getLogger("api.core.executor")
+
+
+def preload(modules: typing.Sequence[str]) -> None:
+    """
+    Imports the given modules, so a new worker process has them ready before its first task
+    :param modules:
+    :return:
+    """
+    for module in modules:
+        importlib.import_module(module)
+
+
+def call_timed(func: typing.Callable, args: typing.Tuple) -> typing.Tuple[float, typing.Any]:
+    # Returns when the call started along with its result. The monotonic clock is shared by all processes.
+    return time.monotonic(), func(*args)
+
+
+class Executor:
+    """
+    Runs the calculations of the API either inline on the event loop, on a thread pool or on a process pool,
+    depending on the size of their payload.
+
+    Small payloads take less time to calculate than to hop to a worker thread, so they are run inline. Large ones
+    are sent to worker processes, where they don't compete for the GIL, when there are any. Everything else goes
+    to the thread pool. Pools are created on first use.
+    """
+
+    def __init__(
+        self,
+        inline_max_size: int,
+        process_min_size: int,
+        thread_workers: int,
+        process_workers: int,
+        preload_modules: typing.Sequence[str] = (),
+        admission: typing.Optional[Admission] = None,
+    ):
+        self.inline_max_size = inline_max_size
+        self.process_min_size = process_min_size
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.preload_modules = list(preload_modules)
+        # Limits the tasks running on the pools and waiting for them, inline tasks are not limited
+        self.admission = admission
+        self._lock = threading.Lock()
+        self._threads: typing.Optional[ThreadPoolExecutor] = None
+        self._processes: typing.Optional[ProcessPoolExecutor] = None
+        # Tasks submitted to each backend and not finished yet
+        self.pending = {INLINE: 0, THREAD: 0, PROCESS: 0}
+        self.completed = {INLINE: 0, THREAD: 0, PROCESS: 0}
+
+    def backend(self, size: int, processes: bool = True) -> str:
+        """
+        Returns the backend a task of the given size runs on
+        :param size: Size of the task payload, e.g. the number of plants to dispatch
+        :param processes: Whether the task can run in another process. Tasks relying on state of this process,
+        like its caches, can't. Neither can traced ones, as their trace stays here.
+        :return:
+        """
+        if size <= self.inline_max_size:
+            return INLINE
+        processes = processes and current_trace() is None
+        if processes and self.process_workers > 0 and size >= self.process_min_size:
+            return PROCESS
+        return THREAD
+
+    def check_deadline(self) -> None:
+        """
+        Rejects the calculations of the current request when its deadline has passed
+        :raises ServiceUnavailableException: When the deadline has passed, see `Admission`
+        """
+        if self.admission is not None:
+            self.admission.check_deadline(current_deadline())
+
+    async def run(self, func: typing.Callable, *args, size: int, processes: bool = True) -> typing.Any:
+        """
+        Runs the function with the given arguments on the backend for its size. Functions run on worker processes,
+        along with their arguments and results, must be picklable.
+        :param func:
+        :param args:
+        :param size: Size of the task payload
+        :param processes: Whether the task can run in another process
+        :return: The function result
+        :raises ServiceUnavailableException: When the task is not admitted, see `Admission`
+        """
+        backend = self.backend(size, processes)
+        self.pending[backend] += 1
+        try:
+            if backend == INLINE:
+                # Inline calculations don't wait for a slot, but are not started once their deadline has passed
+                self.check_deadline()
+                return func(*args)
+            if self.admission is None:
+                return await self._run_pool(backend, func, args)
+            observe_stage("admission_queue", await self.admission.acquire(current_deadline()))
+            try:
+                return await self._run_pool(backend, func, args)
+            finally:
+                self.admission.release()
+        finally:
+            self.pending[backend] -= 1
+            self.completed[backend] += 1
+
+    async def _run_pool(self, backend: str, func: typing.Callable, args: typing.Tuple) -> typing.Any:
+        pool = self._get_pool(backend)
+        submitted = time.monotonic()
+        call = functools.partial(call_timed, func, args)
+        if backend == THREAD:
+            # Worker threads see the context of the request, e.g. its trace
+            call = functools.partial(contextvars.copy_context().run, call)
+        started, result = await asyncio.get_running_loop().run_in_executor(pool, call)
+        observe_stage(f"executor_queue_{backend}", started - submitted)
+        return result
+
+    def _get_pool(self, backend: str) -> PoolExecutor:
+        with self._lock:
+            if backend == THREAD:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(
+                        max_workers=self.thread_workers or None, thread_name_prefix="api-worker"
+                    )
+                return self._threads
+            if self._processes is None:
+                # Forking a process running threads is not safe, so workers are spawned and import what they need
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=preload,
+                    initargs=(self.preload_modules,),
+                )
+            return self._processes
+
+    def warm_up(self) -> None:
+        """
+        Starts the worker processes, if any, so the first requests don't pay for starting them and importing
+        their modules
+        :return:
+        """
+        if self.process_workers <= 0:
+            return
+        pool = self._get_pool(PROCESS)
+        for future in [pool.submit(preload, self.preload_modules) for _ in range(self.process_workers)]:
+            future.result()
+        logger.info(f"Started {self.process_workers} worker processes")
+
+    def shutdown(self) -> None:
+        # Pools are created again if the executor is used after being shut down
+        with self._lock:
+            threads, processes = self._threads, self._processes
+            self._threads = self._processes = None
+        for pool in (threads, processes):
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    @property
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "inline_max_size": self.inline_max_size,
+            "process_min_size": self.process_min_size,
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "pending": dict(self.pending),
+            "completed": dict(self.completed),
+            "admission": self.admission.stats if self.admission is not None else None,
+        }
+
+
+def default_thread_workers() -> int:
+    # Same number of threads as the standard library pools start by default
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+@lru_cache(maxsize=1)
+def get_executor() -> Executor:
+    """
+    Returns the executor of the API calculations, as configured in settings. Unless set, calculations run at the
+    same time are bounded by the worker threads and processes, so the ones over them wait in the admission queue.
+    :return:
+    """
+    settings = get_app_settings()
+    workers = (settings.executor_thread_workers or default_thread_workers()) + settings.executor_process_workers
+    return Executor(
+        inline_max_size=settings.executor_inline_max_size,
+        process_min_size=settings.executor_process_min_size,
+        thread_workers=settings.executor_thread_workers,
+        process_workers=settings.executor_process_workers,
+        preload_modules=[f"{service}.controller" for service in settings.services],
+        admission=Admission(
+            max_concurrency=settings.admission_max_concurrency or workers,
+            max_queue=settings.admission_max_queue,
+            retry_after=settings.admission_retry_after,
+        ),
+    )
+
+
+REGISTRY.register(
+    Gauge(
+        "api_executor_pending_tasks",
+        "Calculations submitted to each executor backend and not finished yet",
+        lambda: {(backend,): pending for backend, pending in get_executor().pending.items()},
+        ["backend"],
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "api_admission_tasks",
+        "Calculations admitted and running, and waiting to be admitted",
+        lambda: {
+            ("running",): get_executor().admission.running,
+            ("queued",): get_executor().admission.queued,
+        },
+        ["state"],
+    )
+)
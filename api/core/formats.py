@@ -0,0 +1,89 @@
+import typing
+import email.message
+from fastapi.requests import Request
+from fastapi.responses import Response
+from api.core.responses import preferred_media_type
+
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def media_type(content_type: typing.Optional[str]) -> str:
+    """
+    Returns the media type of a content type header, without its parameters
+    :param content_type:
+    :return:
+    """
+    if not content_type:
+        return ""
+    message = email.message.Message()
+    message["content-type"] = content_type
+    return message.get_content_type()
+
+
+def accepted_format(request: Request, media_types: typing.Sequence[str] = ()) -> typing.Optional[str]:
+    """
+    Returns the media type the client prefers in the Accept header, among the binary ones and the given ones, when
+    it isn't JSON
+    :param request:
+    :param media_types: Other media types the response can be sent in, e.g. streamed ones
+    :return: The media type, None for JSON
+    """
+    offered = [JSON_MEDIA_TYPE, *media_types, ARROW_MEDIA_TYPE, *MSGPACK_MEDIA_TYPES]
+    preferred = preferred_media_type(request.headers.get("accept"), offered)
+    if preferred in MSGPACK_MEDIA_TYPES:
+        return MSGPACK_MEDIA_TYPE
+    return None if preferred == JSON_MEDIA_TYPE else preferred
+
+
+def unpack_msgpack(body: bytes) -> typing.Any:
+    # Codecs are only imported when used, so they don't slow down the API start
+    import msgpack
+
+    return msgpack.unpackb(body, raw=False)
+
+
+def read_arrow_table(body: bytes):
+    """
+    Reads an Arrow IPC stream into a table. Its columns use the memory of the body, without copies.
+    :param body:
+    :return:
+    """
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+
+
+class MessagePackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: typing.Any) -> bytes:
+        import msgpack
+
+        return msgpack.packb(content, use_bin_type=True)
+
+
+class ArrowResponse(Response):
+    """
+    Sends a list of records with the same keys as an Arrow IPC stream, with a column per key
+    """
+
+    media_type = ARROW_MEDIA_TYPE
+
+    def __init__(self, content: typing.List[typing.Dict], columns: typing.Optional[typing.List[str]] = None, **kwargs):
+        # Columns are taken from the first record when not given, there are none without records
+        self.columns = columns
+        super().__init__(content, **kwargs)
+
+    def render(self, content: typing.List[typing.Dict]) -> bytes:
+        import pyarrow as pa
+
+        keys = self.columns if self.columns is not None else list(content[0]) if content else []
+        table = pa.table({key: [record[key] for record in content] for key in keys})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
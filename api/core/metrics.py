@@ -0,0 +1,237 @@
+import time
+import bisect
+import typing
+import threading
+from fastapi.responses import Response
+from api.settings import get_app_settings
+
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+# Histogram buckets, in seconds, from a tenth of a millisecond to ten seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names: typing.Sequence[str], values: typing.Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    Monotonic counter, by label values
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: typing.Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: typing.Dict[typing.Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> typing.Iterator[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge:
+    """
+    Gauge whose values, by label values, are read from a function when collected
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: typing.Callable[[], typing.Dict[typing.Tuple[str, ...], float]],
+        labelnames: typing.Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> typing.Iterator[str]:
+        for labels, value in sorted(self.collect().items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, by label values
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Label values -> (count per bucket, the last one being +Inf, sum of the values)
+        self._values: typing.Dict[typing.Tuple[str, ...], typing.Tuple[typing.List[int], typing.List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][position] += 1
+            entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> typing.Iterator[str]:
+        with self._lock:
+            values = [(labels, list(counts), total[0]) for labels, (counts, total) in sorted(self._values.items())]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _labels(self.labelnames, labels, f'le="{le}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    Collection of metrics, rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics: typing.Dict[str, typing.Any] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.register(
+    Counter("api_requests_total", "Requests handled, by handler and status code", ["handler", "method", "status"])
+)
+REQUEST_DURATION = REGISTRY.register(
+    Histogram("api_request_duration_seconds", "Time spent handling requests, by handler", ["handler"])
+)
+STAGE_DURATION = REGISTRY.register(
+    Histogram("api_stage_duration_seconds", "Time spent in each named stage of the calculations", ["stage"])
+)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_DURATION.observe(time.perf_counter() - self.start, self.name)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """
+    Context manager timing a named stage of the calculations. Does nothing when metrics are disabled.
+    :param name:
+    :return:
+    """
+    if not get_app_settings().metrics_enabled:
+        return _NO_STAGE
+    return _Stage(name)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if get_app_settings().metrics_enabled:
+        STAGE_DURATION.observe(seconds, name)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting and timing the requests by handler, which keeps the number of label values bounded
+    whatever the paths requested
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        # Handlers can tell how long it took to get to them, e.g. reading and validating the payload
+        scope.setdefault("state", {})["started"] = start
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            REQUESTS.inc(handler, scope["method"], str(status[0]))
+            REQUEST_DURATION.observe(time.perf_counter() - start, handler)
+
+
+async def metrics_endpoint():
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_MEDIA_TYPE)
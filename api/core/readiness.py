@@ -0,0 +1,78 @@
+import time
+import typing
+import asyncio
+import logging
+from functools import lru_cache
+from api.core.exceptions import ServiceUnavailableException
+
+
+logger = logging.getLogger("api.core.readiness")
+
+
+class Readiness:
+    """
+    Warm-up of the API before it takes traffic. Services register the tasks getting them ready, e.g. a
+    representative calculation loading the modules it needs, and they are run one after the other at startup.
+    The API is only reported ready once all of them finished, so load balancers don't send requests to a cold
+    worker.
+    """
+
+    def __init__(self):
+        self.tasks: typing.Dict[str, typing.Callable[[], typing.Any]] = {}
+        # Time taken by each finished task, in seconds
+        self.durations: typing.Dict[str, float] = {}
+        self.ready = False
+        self.error: typing.Optional[str] = None
+        # Called once the API is ready, e.g. to tell a supervisor process
+        self.listeners: typing.List[typing.Callable[[], typing.Any]] = []
+
+    def register(self, name: str, task: typing.Callable[[], typing.Any]) -> None:
+        self.tasks[name] = task
+
+    def warm_up(self) -> None:
+        """
+        Runs the warm-up tasks. A failed task leaves the API not ready, as it would most likely fail its requests.
+        :return:
+        """
+        for name, task in self.tasks.items():
+            start = time.perf_counter()
+            try:
+                task()
+            except Exception as e:
+                logger.exception(f"Warm-up task '{name}' failed")
+                self.error = f"Warm-up task '{name}' failed: {e}"
+                return
+            self.durations[name] = time.perf_counter() - start
+            logger.info(f"Warm-up task '{name}' finished in {self.durations[name] * 1000:.1f} ms")
+        self.mark_ready()
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        for listener in self.listeners:
+            listener()
+
+    def start(self) -> "asyncio.Future":
+        """
+        Runs the warm-up on a thread, so the API answers `/ready` meanwhile
+        :return: Future of the warm-up
+        """
+        return asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+
+    @property
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "ready": self.ready,
+            "warm_up_ms": {name: duration * 1000 for name, duration in self.durations.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_readiness() -> Readiness:
+    return Readiness()
+
+
+async def ready_endpoint():
+    readiness = get_readiness()
+    if not readiness.ready:
+        raise ServiceUnavailableException(readiness.error or "Warm-up has not finished yet")
+    return readiness.stats
@@ -0,0 +1,121 @@
+import json
+import typing
+from fastapi.requests import Request
+from fastapi.responses import StreamingResponse
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Records encoded on each chunk sent
+NDJSON_CHUNK_SIZE = 1000
+
+
+def parse_accept(accept: typing.Optional[str]) -> typing.List[typing.Tuple[str, float]]:
+    """
+    Parses the media ranges of an Accept header with their quality values, 1 when not given
+    :param accept: Header value
+    :return: Media ranges, lowercase and without their other parameters, in header order
+    """
+    ranges = []
+    for item in (accept or "").split(","):
+        media_range, *params = item.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range, quality))
+    return ranges
+
+
+def preferred_media_type(accept: typing.Optional[str], offered: typing.Sequence[str]) -> typing.Optional[str]:
+    """
+    Picks the media type the client prefers among the offered ones. Each of them gets the quality of the most
+    specific range matching it, and the highest quality wins, then the most specific match, then the range listed
+    first. Media types with a 0 quality are not acceptable.
+    :param accept: Accept header value
+    :param offered: Media types the response can be sent in, the first one being the default
+    :return: The preferred media type, the first offered one without an Accept header, or None when the client
+    accepts none of them
+    """
+    ranges = parse_accept(accept)
+    if not ranges:
+        return offered[0]
+    best, best_rank = None, None
+    for order, media_type in enumerate(offered):
+        main_type = media_type.split("/")[0]
+        match = None
+        for position, (media_range, quality) in enumerate(ranges):
+            specificity = 2 if media_range == media_type else 1 if media_range == f"{main_type}/*" else 0
+            if specificity == 0 and media_range != "*/*":
+                continue
+            if match is None or specificity > match[1]:
+                match = (quality, specificity, position)
+        if match is None or match[0] <= 0:
+            continue
+        rank = (-match[0], -match[1], match[2], order)
+        if best_rank is None or rank < best_rank:
+            best, best_rank = media_type, rank
+    return best
+
+
+def accepts_ndjson(request: Request) -> bool:
+    """
+    Whether the client prefers a newline-delimited JSON response to a JSON one, through the Accept header
+    :param request:
+    :return:
+    """
+    offered = ["application/json", NDJSON_MEDIA_TYPE]
+    return preferred_media_type(request.headers.get("accept"), offered) == NDJSON_MEDIA_TYPE
+
+
+def etag_matches(if_none_match: typing.Optional[str], etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches the entity tag. It uses the weak comparison, so weak tags of the client
+    match too, and `*` matches any tag.
+    :param if_none_match: Header value, a list of tags
+    :param etag: Entity tag of the current response, quoted
+    :return:
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def iter_ndjson(records: typing.Iterable[typing.Dict], chunk_size: int = NDJSON_CHUNK_SIZE) -> typing.Iterator[bytes]:
+    """
+    Encodes the records as newline-delimited JSON, a chunk of them at a time
+    :param records:
+    :param chunk_size:
+    :return:
+    """
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    chunk = []
+    for record in records:
+        chunk.append(encode(record))
+        if len(chunk) >= chunk_size:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    Streams the records as newline-delimited JSON while they are produced. There is no response model
+    validation, the records are sent as given.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self, records: typing.Iterable[typing.Dict], status_code: int = 200, **kwargs):
+        super().__init__(iter_ndjson(records), status_code=status_code, media_type=self.media_type, **kwargs)
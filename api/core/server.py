@@ -0,0 +1,178 @@
+import os
+import time
+import signal
+import socket
+import typing
+import logging
+import multiprocessing
+import uvicorn
+from api.core.readiness import get_readiness
+
+
+logger = logging.getLogger("api.core.server")
+
+# Workers are spawned, as uvicorn does, so they don't inherit any state of the supervisor
+spawn = multiprocessing.get_context("spawn")
+multiprocessing.allow_connection_pickling()
+
+
+def available_cpus() -> typing.List[int]:
+    # CPUs this process is allowed to run on, which can be fewer than the machine ones, e.g. in containers
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_count(workers: int) -> int:
+    """
+    Returns the number of worker processes to run
+    :param workers: Configured number of workers, 0 for one per available CPU
+    :return:
+    """
+    return workers if workers > 0 else len(available_cpus())
+
+
+def run_worker(
+    config: uvicorn.Config, sockets: typing.List[socket.socket], ready, cpu: typing.Optional[int] = None
+) -> None:
+    """
+    Runs the API on a worker process, serving the sockets bound by the supervisor
+    :param config:
+    :param sockets:
+    :param ready: Event set once the worker is warmed up
+    :param cpu: CPU to pin the worker to, if any
+    :return:
+    """
+    # Hangups are for the supervisor, to restart the workers
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    get_readiness().listeners.append(ready.set)
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Worker:
+    def __init__(self, slot: int, process: multiprocessing.Process, ready):
+        self.slot = slot
+        self.process = process
+        self.ready = ready
+        self.started = time.monotonic()
+
+
+class Supervisor:
+    """
+    Runs the API on several worker processes sharing the same listening socket, so requests are spread over all the
+    CPUs. Workers are started up front and warm up before taking requests, and the ones exiting unexpectedly are
+    replaced.
+
+    SIGHUP restarts the workers one at a time, only stopping each one once its replacement is ready, so the API
+    keeps serving at full capacity. SIGINT and SIGTERM stop the workers gracefully, letting them finish the requests
+    in progress.
+    """
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        cpu_affinity: bool = False,
+        ready_timeout: float = 60,
+        shutdown_timeout: float = 30,
+    ):
+        self.config = config
+        self.workers = workers
+        self.cpu_affinity = cpu_affinity
+        self.ready_timeout = ready_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.cpus = available_cpus()
+        self.sockets: typing.List[socket.socket] = []
+        self.processes: typing.Dict[int, Worker] = {}
+        self.should_exit = False
+        self.should_restart = False
+
+    def cpu(self, slot: int) -> typing.Optional[int]:
+        return self.cpus[slot % len(self.cpus)] if self.cpu_affinity else None
+
+    def spawn(self, slot: int) -> Worker:
+        ready = spawn.Event()
+        process = spawn.Process(
+            target=run_worker,
+            kwargs={"config": self.config, "sockets": self.sockets, "ready": ready, "cpu": self.cpu(slot)},
+            name=f"api-worker-{slot}",
+        )
+        process.start()
+        logger.info(f"Started worker {slot} with pid {process.pid}")
+        return Worker(slot, process, ready)
+
+    def stop(self, worker: Worker) -> None:
+        # Workers shut down gracefully on SIGTERM, they are killed if they take too long
+        worker.process.terminate()
+        worker.process.join(self.shutdown_timeout)
+        if worker.process.is_alive():
+            logger.warning(f"Worker {worker.slot} with pid {worker.process.pid} did not stop in time, killing it")
+            worker.process.kill()
+            worker.process.join()
+
+    def wait_ready(self, worker: Worker) -> bool:
+        deadline = time.monotonic() + self.ready_timeout
+        while not self.should_exit and worker.process.is_alive():
+            if worker.ready.wait(min(0.5, max(deadline - time.monotonic(), 0))):
+                return True
+            if time.monotonic() >= deadline:
+                break
+        return False
+
+    def restart(self) -> None:
+        """
+        Replaces the workers one at a time. When a replacement does not get ready in time, the restart is stopped
+        and the worker it was replacing is kept.
+        :return:
+        """
+        logger.info("Restarting workers")
+        for slot in sorted(self.processes):
+            replacement = self.spawn(slot)
+            if not self.wait_ready(replacement):
+                logger.error(f"Replacement of worker {slot} did not get ready, stopping the restart")
+                self.stop(replacement)
+                return
+            self.stop(self.processes[slot])
+            self.processes[slot] = replacement
+        logger.info("Workers restarted")
+
+    def replace_exited(self) -> None:
+        for slot, worker in list(self.processes.items()):
+            if not worker.process.is_alive():
+                logger.error(f"Worker {slot} with pid {worker.process.pid} exited with code {worker.process.exitcode}")
+                self.processes[slot] = self.spawn(slot)
+
+    def handle_exit(self, sig, frame) -> None:
+        self.should_exit = True
+
+    def handle_restart(self, sig, frame) -> None:
+        self.should_restart = True
+
+    def run(self) -> None:
+        self.sockets = [self.config.bind_socket()]
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGHUP, self.handle_restart)
+        logger.info(f"Starting {self.workers} workers, listening on {self.config.host}:{self.config.port}")
+        try:
+            self.processes = {slot: self.spawn(slot) for slot in range(self.workers)}
+            for worker in self.processes.values():
+                if self.wait_ready(worker):
+                    logger.info(f"Worker {worker.slot} ready in {time.monotonic() - worker.started:.2f} s")
+            while not self.should_exit:
+                if self.should_restart:
+                    self.should_restart = False
+                    self.restart()
+                self.replace_exited()
+                time.sleep(0.5)
+        finally:
+            logger.info("Stopping workers")
+            for worker in self.processes.values():
+                worker.process.terminate()
+            for worker in self.processes.values():
+                self.stop(worker)
+            for sock in self.sockets:
+                sock.close()
@@ -0,0 +1,129 @@
+import json
+import time
+import uuid
+import random
+import typing
+import logging
+import contextvars
+from functools import lru_cache
+from api.core.cache import LRUCache
+from api.core.exceptions import NotFoundException
+from api.settings import get_app_settings
+
+
+# Requests with this header set to a true value are traced, whatever the sample rate
+TRACE_HEADER = b"x-trace"
+TRACE_ID_HEADER = b"x-trace-id"
+
+
+logger = logging.getLogger("api.core.tracing")
+
+
+class Trace:
+    """
+    Intermediate values of the calculations of a request. Values are kept as given and only rendered when the
+    trace is exported, so they must not be modified afterwards: copy them when needed.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.start = time.perf_counter()
+        self.events: typing.List[typing.Tuple[str, float, typing.Any]] = []
+
+    def record(self, name: str, value: typing.Any) -> None:
+        self.events.append((name, time.perf_counter() - self.start, value))
+
+    def export(self) -> typing.Dict:
+        return {
+            "id": self.id,
+            "events": [
+                {"name": name, "elapsed_ms": elapsed * 1000, "value": _render(value)}
+                for name, elapsed, value in self.events
+            ],
+        }
+
+
+def _render(value: typing.Any) -> typing.Any:
+    # Dataframes and arrays are told by their methods, so there is no need to import pandas nor numpy here
+    if hasattr(value, "to_json"):
+        return json.loads(value.to_json(orient="records"))
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(key): _render(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_render(item) for item in value]
+    return value
+
+
+_current_trace: contextvars.ContextVar[typing.Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> typing.Optional[Trace]:
+    """
+    Returns the trace of the request being handled, None when it's not traced. Checking it is the only cost paid by
+    untraced requests, so values to record should only be built once a trace is there.
+    :return:
+    """
+    return _current_trace.get()
+
+
+@lru_cache(maxsize=1)
+def get_trace_store() -> LRUCache:
+    """
+    Returns the store of the last finished traces, by id
+    :return:
+    """
+    return LRUCache(maxsize=get_app_settings().trace_history_size, ttl=float("inf"))
+
+
+def should_trace(headers: typing.List[typing.Tuple[bytes, bytes]]) -> bool:
+    """
+    Whether to trace a request with the given ASGI headers, which have lowercase names
+    :param headers:
+    :return:
+    """
+    for name, value in headers:
+        if name == TRACE_HEADER and value.upper() in (b"TRUE", b"1"):
+            return True
+    rate = get_app_settings().trace_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing the requests asking for it, or sampled at the configured rate. The id of the trace is
+    sent back in a response header, and the trace is logged and kept to be retrieved from `/traces/{trace_id}`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if not should_trace(scope["headers"]):
+            return await self.app(scope, receive, send)
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+
+        async def send_trace_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(TRACE_ID_HEADER, trace.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_trace_id)
+        finally:
+            _current_trace.reset(token)
+            exported = trace.export()
+            get_trace_store().set(trace.id, exported)
+            logger.info(f"Trace of {scope['method']} {scope['path']}: {json.dumps(exported, default=str)}")
+
+
+async def get_trace(trace_id: str):
+    trace = get_trace_store().get(trace_id)
+    if trace is None:
+        raise NotFoundException(f"Trace '{trace_id}' not found")
+    return trace
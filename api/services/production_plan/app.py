@@ -1,22 +1,328 @@
 import json
-import anyio
+import time
+import hashlib
 import typing
 import logging
-from fastapi import APIRouter
+from functools import lru_cache
+from fastapi import APIRouter, Body, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from api.core.batching import MicroBatcher
+from api.core.exceptions import APIException, BadRequestException, NotFoundException
+from api.core.executor import get_executor
+from api.core.formats import (
+    ARROW_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    ArrowResponse,
+    MessagePackResponse,
+    accepted_format,
+)
+from api.core.metrics import observe_stage, stage
+from api.core.readiness import get_readiness
+from api.core.responses import NDJSON_MEDIA_TYPE, NDJSONResponse, accepts_ndjson, etag_matches
+from api.core.tracing import current_trace
+from api.settings import get_app_settings
 from api.services.production_plan.types import (
+    FleetPayload,
+    FleetPowerPlantPayload,
+    MonteCarloPayload,
+    MonteCarloResultPayload,
     PowerPlantPayload,
     PerPlanCalculationsPayload,
+    RegisteredFleetPayload,
+    ScenarioResultPayload,
+    SupplyStackPayload,
+    SupplyStackResultPayload,
+    TimeSeriesPowerPlantPayload,
+)
+from api.services.production_plan.cache import fleet_cache_key, get_result_cache
+from api.services.production_plan.controller import (
+    SWEEP_DEFAULT_INTERVALS,
+    dispatch_fleet_batch,
+    dispatch_fleet_monte_carlo,
+    dispatch_fleet_supply_stack,
+    dispatch_fleet_timeseries,
+    dispatch_fleet_timeseries_lazy,
+    process_batch,
+    process_fleet,
+    process_parsed,
 )
-from api.services.production_plan.controller import process
+from api.services.production_plan.fleet import Fleet
+from api.services.production_plan.ingestion import parse_payload
+from api.services.production_plan.registry import get_fleet_registry
 
 
 api = APIRouter()
 logger = logging.getLogger("api.services.production_plan")
+PAYLOAD_SCHEMA = {
+    key: value
+    for key, value in PowerPlantPayload.schema(ref_template="#/components/schemas/{model}").items()
+    if key != "definitions"
+}
+
+
+def warm_up_payload(size: int) -> typing.Dict:
+    """
+    Returns a payload with a fleet of the given size, with plants of all the types
+    :param size:
+    :return:
+    """
+    fuel_types = ["gasfired", "turbojet", "windturbine"]
+    plants = [
+        {
+            "name": f"warmup{i}",
+            "type": fuel_types[i % len(fuel_types)],
+            "efficiency": 0.3 + 0.05 * (i % 7),
+            "pmin": 0 if i % len(fuel_types) else 10 * (i % 4),
+            "pmax": 100 + i,
+        }
+        for i in range(size)
+    ]
+    fuels = {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "co2(euro/ton)": 20, "wind(%)": 60}
+    return {"load": sum(plant["pmax"] for plant in plants) // 2, "fuels": fuels, "powerplants": plants}
+
+
+def warm_up() -> None:
+    """
+    Goes through the steps of a `/productionplan` request, so the modules of the configured engine are loaded
+    before the first request comes. The result is not cached.
+    :return:
+    """
+    settings = get_app_settings()
+    body = json.dumps(warm_up_payload(settings.warm_up_size)).encode()
+    fleet, data = parse_payload(body, JSON_MEDIA_TYPE, settings.fast_ingestion)
+    fleet_cache_key(fleet, data, settings.dispatch_engine)
+    result = process_parsed(fleet, data)
+    JSONResponse(result)
+
+
+get_readiness().register("executor", lambda: get_executor().warm_up())
+get_readiness().register("production_plan", warm_up)
+
+
+@api.on_event("shutdown")
+def stop_executor() -> None:
+    get_executor().shutdown()
+
+
+@api.post(
+    path="/productionplan",
+    response_model=typing.List[PerPlanCalculationsPayload],
+    # The body is parsed by the handler, so its schema is given here
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": PAYLOAD_SCHEMA},
+                MSGPACK_MEDIA_TYPE: {"schema": PAYLOAD_SCHEMA},
+                ARROW_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def calculate_production_plan(request: Request):
+    fleet, data = parse_payload(
+        await request.body(), request.headers.get("content-type"), get_app_settings().fast_ingestion
+    )
+    started = getattr(request.state, "started", None)
+    if started is not None:
+        # Reading the body and validating it
+        observe_stage("request_parsing", time.perf_counter() - started)
+
+    # Results are identified by the canonical content of the payload, which keys the cache and tags the responses
+    settings = get_app_settings()
+    cache = get_result_cache()
+    key = etag = None
+    if cache is not None or settings.etag_enabled:
+        with stage("cache_lookup"):
+            key = fleet_cache_key(fleet, data, settings.dispatch_engine)
+    if settings.etag_enabled:
+        etag = plan_etag(request, key)
+        # Clients already holding the results get neither calculations nor a body
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+    # Cached results are returned straight away, without going through a worker thread
+    if cache is not None:
+        with stage("cache_lookup"):
+            result = cache.get(key)
+        if result is not None:
+            return plan_response(request, result, etag)
+
+    # Calculations are sync code, so unless they are small enough to run inline they go to a worker thread or
+    # process, which allows it to keep being async and improved performance. With micro-batching, concurrent
+    # requests for the same fleet are calculated together.
+    batcher = get_request_batcher()
+    with stage("calculation"):
+        if batcher is not None and current_trace() is None:
+            # Batches are calculated on behalf of several requests, so deadlines are checked before joining one
+            get_executor().check_deadline()
+            result = await batcher.submit(fleet.key(), (fleet, data))
+        else:
+            result = await get_executor().run(process_parsed, fleet, data, size=len(fleet))
+    if cache is not None:
+        cache.set(key, result)
+    return plan_response(request, result, etag)
+
+
+async def calculate_batch(key: typing.Tuple, items: typing.List[typing.Tuple[Fleet, typing.Dict]]) -> typing.List:
+    # All the items share the same fleet, so the one of the first item is used for all of them
+    fleet = items[0][0]
+    if len(items) == 1:
+        return [await get_executor().run(process_parsed, fleet, items[0][1], size=len(fleet))]
+    scenarios = [data for _, data in items]
+    return await get_executor().run(dispatch_fleet_batch, fleet, scenarios, size=len(fleet) * len(scenarios))
+
+
+@lru_cache(maxsize=1)
+def get_request_batcher() -> typing.Optional[MicroBatcher]:
+    """
+    Returns the micro-batcher of `/productionplan` calculations, None when disabled. Only the `numpy` engine
+    calculates batches.
+    :return:
+    """
+    settings = get_app_settings()
+    if not settings.batching_enabled or settings.dispatch_engine != "numpy":
+        return None
+    return MicroBatcher(calculate_batch, window=settings.batching_window_ms / 1000, max_size=settings.batching_max_size)
+
+
+def plan_format(request: Request) -> str:
+    # Clients asking for newline-delimited JSON get the plants streamed, and the ones asking for a binary format
+    # get it encoded straight away.
+    return accepted_format(request, [NDJSON_MEDIA_TYPE]) or JSON_MEDIA_TYPE
+
+
+def plan_etag(request: Request, key: str) -> str:
+    """
+    Returns the entity tag of a production plan response. Each format of the same results has its own tag, since
+    their bodies differ.
+    :param request:
+    :param key: Cache key of the payload, from its canonical content and the engine version
+    :return: Quoted tag
+    """
+    return '"' + hashlib.sha256(f"{key}:{plan_format(request)}".encode()).hexdigest()[:32] + '"'
+
+
+def plan_response(request: Request, result: typing.List[typing.Dict], etag: typing.Optional[str] = None):
+    headers = {"ETag": etag, "Vary": "Accept"} if etag is not None else None
+    response_format = plan_format(request)
+    if response_format == NDJSON_MEDIA_TYPE:
+        return NDJSONResponse(result, headers=headers)
+    if response_format == ARROW_MEDIA_TYPE:
+        return ArrowResponse(result, columns=["name", "p"], headers=headers)
+    if response_format == MSGPACK_MEDIA_TYPE:
+        return MessagePackResponse(result, headers=headers)
+    # Results are built by the calculations in the response format, so validating them as the response model would
+    # only copy them twice more
+    return JSONResponse(result, headers=headers)
+
+
+@api.get(path="/productionplan/cache")
+async def get_production_plan_cache_stats():
+    cache = get_result_cache()
+    return {"enabled": cache is not None, **(cache.stats if cache is not None else {})}
+
+
+@api.post(path="/productionplan/batch", response_model=typing.List[ScenarioResultPayload])
+async def calculate_production_plan_batch(request: Request, payload: typing.List[typing.Any] = Body(...)):
+    settings = get_app_settings()
+    if len(payload) > settings.batch_max_scenarios:
+        raise BadRequestException(f"Too many scenarios, maximum allowed is {settings.batch_max_scenarios}")
+
+    # Each scenario is validated on its own, so an invalid one only fails its own result
+    results: typing.List[typing.Dict] = [{} for _ in payload]
+    positions, scenarios = [], []
+    for position, item in enumerate(payload):
+        try:
+            scenarios.append(PowerPlantPayload.parse_obj(item).dict())
+            positions.append(position)
+        except ValidationError as e:
+            results[position] = {"error": {**BadRequestException().data, "detail": e.errors()}}
+
+    size = sum(len(scenario["powerplants"]) for scenario in scenarios)
+    outcomes = await get_executor().run(process_batch, scenarios, settings.dispatch_engine, size=size)
+    for position, outcome in zip(positions, outcomes):
+        if isinstance(outcome, APIException):
+            results[position] = {"error": outcome.data}
+        else:
+            results[position] = {"result": outcome}
+
+    if accepts_ndjson(request):
+        # One record per plant of each scenario, or a single one with the error of a failed scenario
+        return NDJSONResponse(
+            {"scenario": position, **item}
+            for position, result in enumerate(results)
+            for item in (result["result"] if "result" in result else [result])
+        )
+    return results
+
+
+@api.post(
+    path="/productionplan/timeseries", response_model=typing.List[typing.List[PerPlanCalculationsPayload]]
+)
+async def calculate_production_plan_timeseries(payload: TimeSeriesPowerPlantPayload, request: Request):
+    fleet = Fleet.from_models(payload.powerplants)
+    data = payload.dict(exclude={"powerplants"})
+    size = len(fleet) * len(data["load"])
+    if accepts_ndjson(request):
+        # Results of each interval are built while streamed, so they are calculated in this process
+        intervals = await get_executor().run(dispatch_fleet_timeseries_lazy, fleet, data, size=size, processes=False)
+        return NDJSONResponse(
+            {"interval": interval, **item} for interval, result in enumerate(intervals) for item in result
+        )
+    return await get_executor().run(dispatch_fleet_timeseries, fleet, data, size=size)
+
+
+@api.post(path="/productionplan/supplystack", response_model=SupplyStackResultPayload)
+async def calculate_supply_stack(payload: SupplyStackPayload):
+    fleet = Fleet.from_models(payload.powerplants)
+    data = payload.dict(exclude={"powerplants"})
+    # The number of loads depends on the fleet capacity, so the size is the one of a sweep with the default step
+    size = len(fleet) * (SWEEP_DEFAULT_INTERVALS + 1)
+    result = await get_executor().run(dispatch_fleet_supply_stack, fleet, data, size=size)
+    # Sweeps have many values, validating them as the response model would takes longer than calculating them
+    return JSONResponse(result)
+
+
+@api.post(path="/productionplan/montecarlo", response_model=MonteCarloResultPayload)
+async def calculate_monte_carlo(payload: MonteCarloPayload):
+    fleet = Fleet.from_models(payload.powerplants)
+    data = payload.dict(exclude={"powerplants"})
+    return await get_executor().run(dispatch_fleet_monte_carlo, fleet, data, size=len(fleet) * data["samples"])
+
+
+@api.put(path="/fleets/{fleet_id}", response_model=RegisteredFleetPayload)
+async def register_fleet(fleet_id: str, payload: FleetPayload):
+    # Plants are validated and the fleet sorted once here, so dispatching it later skips both
+    fleet = Fleet.from_models(payload.powerplants)
+    if not get_fleet_registry().put(fleet_id, fleet):
+        raise BadRequestException("Maximum number of registered fleets reached")
+    return {"fleet_id": fleet_id, "powerplants": len(fleet)}
+
+
+@api.get(path="/fleets/{fleet_id}", response_model=FleetPayload)
+async def get_fleet(fleet_id: str):
+    fleet = get_fleet_registry().get(fleet_id)
+    if fleet is None:
+        raise NotFoundException(f"Fleet '{fleet_id}' not found")
+    return {"powerplants": fleet.plants()}
+
+
+@api.delete(path="/fleets/{fleet_id}", status_code=204)
+async def delete_fleet(fleet_id: str):
+    if not get_fleet_registry().delete(fleet_id):
+        raise NotFoundException(f"Fleet '{fleet_id}' not found")
+    return Response(status_code=204)
 
 
-@api.post(path="/productionplan", response_model=typing.List[PerPlanCalculationsPayload])
-async def calculate_production_plan(payload: PowerPlantPayload):
-    data = json.loads(payload.json())
-    # In FastAPI is not possible to run sync code in a different thread, unless using AnyIO primitives to run
-    # sync in a worker thread, which allows it to keep being async and improved performance
-    return await anyio.to_thread.run_sync(process, data)
+@api.post(path="/productionplan/fleet", response_model=typing.List[PerPlanCalculationsPayload])
+async def calculate_fleet_production_plan(payload: FleetPowerPlantPayload, request: Request):
+    fleet = get_fleet_registry().get(payload.fleet_id)
+    if fleet is None:
+        raise NotFoundException(f"Fleet '{payload.fleet_id}' not found")
+    data = {"load": payload.load, "fuels": payload.fuels}
+    # Supply curves of the registered fleets are cached in this process
+    result = await get_executor().run(process_fleet, fleet, data, size=len(fleet), processes=False)
+    return plan_response(request, result)
@@ -0,0 +1,70 @@
+import json
+import typing
+import hashlib
+from functools import lru_cache
+import numpy as np
+from api.core.cache import LRUCache
+from api.settings import get_app_settings
+from api.services.production_plan.controller import ENGINE_VERSION, get_fuel_table
+from api.services.production_plan.fleet import Fleet
+
+
+def cache_key(data: typing.Dict, engine: str) -> str:
+    """
+    Returns a hash of the payload content, which does not depend on the order of the plants nor the keys
+    :param data: Payload, as given to `process`
+    :param engine: Dispatch engine calculating the results
+    :return:
+    """
+    return fleet_cache_key(Fleet(data["powerplants"]), data, engine)
+
+
+def fleet_cache_key(fleet: Fleet, data: typing.Dict, engine: str) -> str:
+    """
+    Same as `cache_key`, for a payload whose plants were already parsed into a fleet.
+
+    The result only depends on the order of the plants among the ones with the same type, efficiency, pmin
+    and pmax, so plants are stably sorted by those fields. Types with the same cost are ranked by their first
+    appearance, so the ranking of the types is also part of the key.
+    :param fleet:
+    :param data: Payload load and fuels
+    :param engine:
+    :return:
+    :raises BadRequestException: When the fuels can't be costed, before anything is calculated
+    """
+    types = list(fleet.fuel_types)
+    fuel_costs, factors = get_fuel_table(data, fleet.fuel_types)
+    costs = fuel_costs.tolist()
+    types = [types[i] for i in sorted(range(len(types)), key=costs.__getitem__)]
+    type_names = np.array(fleet.fuel_types, dtype=object)
+    name_rank = np.argsort(np.argsort(type_names, kind="stable"), kind="stable")
+    order = np.lexsort((fleet.pmax, fleet.pmin, fleet.efficiency, name_rank[fleet.type_codes]))
+    content = {
+        "engine": engine,
+        "engine_version": ENGINE_VERSION,
+        "co2_adjusted": get_app_settings().co2_adjusted_costs,
+        "load": data["load"],
+        "types": types,
+        "names": [fleet.names[i] for i in order.tolist()],
+        "plant_types": type_names[fleet.type_codes[order]].tolist(),
+    }
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True, separators=(",", ":")).encode())
+    for column in (fleet.efficiency, fleet.pmin, fleet.pmax):
+        digest.update(column[order].tobytes())
+    # Results only depend on the fuels through the cost and factor of each type, which are also the only fuels
+    # validated. Hashing those leaves out any other key or value the payload may carry.
+    for column in (fuel_costs, factors):
+        digest.update(column[np.argsort(type_names, kind="stable")].tobytes())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> typing.Optional[LRUCache]:
+    """
+    Returns the production plan results cache, None if disabled in settings
+    :return:
+    """
+    settings = get_app_settings()
+    if not settings.result_cache_enabled:
+        return None
+    return LRUCache(maxsize=settings.result_cache_size, ttl=settings.result_cache_ttl)
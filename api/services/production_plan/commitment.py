@@ -0,0 +1,146 @@
+import time
+import bisect
+import typing
+import numpy as np
+
+
+class CommitmentResult(typing.NamedTuple):
+    # Power used from each plant, None when no solution cheaper than the given incumbent was found
+    usage: typing.Optional[np.ndarray]
+    cost: float
+    nodes: int
+    # Whether the search finished within its budget, so the solution is the cheapest one
+    complete: bool
+
+
+def dispatch_cost(usage: np.ndarray, unit_cost: np.ndarray) -> float:
+    return float(np.dot(usage[usage > 0], unit_cost[usage > 0]))
+
+
+def is_feasible(usage: np.ndarray, pmin_generated: np.ndarray, pmax_generated: np.ndarray, load: float) -> bool:
+    """
+    Checks whether the given usage serves exactly the load, with every plant either off or between its
+    min and max generation
+    :param usage:
+    :param pmin_generated:
+    :param pmax_generated:
+    :param load:
+    :return:
+    """
+    eps = _tolerance(load)
+    running = usage > eps
+    above_pmin = usage[running] >= pmin_generated[running] - eps
+    below_pmax = usage[running] <= pmax_generated[running] + eps
+    return bool((above_pmin & below_pmax).all()) and abs(float(usage.sum()) - load) <= eps
+
+
+def _tolerance(load: float) -> float:
+    return 1e-9 * max(1.0, abs(load))
+
+
+def solve_commitment(
+    pmin_generated: np.ndarray,
+    pmax_generated: np.ndarray,
+    unit_cost: np.ndarray,
+    load: float,
+    max_nodes: int,
+    time_budget: float,
+    incumbent_cost: float = float("inf"),
+) -> CommitmentResult:
+    """
+    Finds the cheapest set of plants to commit, and their power, so the load is served exactly with every
+    committed plant between its min and max generation.
+
+    Depth first branch and bound deciding on each plant in cost order, committing it first. Given the committed
+    plants, the cheapest dispatch runs all of them at pmin and fills the rest of the load in cost order. Nodes are
+    bounded by relaxing the pmin of the undecided plants, which also costs a binary search on prefix sums since
+    they come after all the committed ones in cost order.
+    :param pmin_generated: Min generation of each plant, sorted by unit cost
+    :param pmax_generated: Max generation of each plant, sorted by unit cost
+    :param unit_cost: Cost per MWh generated of each plant, ascending
+    :param load: Required load
+    :param max_nodes: Maximum number of search nodes to explore
+    :param time_budget: Maximum search time, in seconds
+    :param incumbent_cost: Cost of an already known solution, so only cheaper ones are searched for
+    :return:
+    """
+    size = len(pmax_generated)
+    eps = _tolerance(load)
+    deadline = time.perf_counter() + time_budget
+    pmin_values = pmin_generated.tolist()
+    pmax_values = pmax_generated.tolist()
+    cost_values = unit_cost.tolist()
+    # Cheapest way to produce any amount with the plants from a given position on, without pmin constraints
+    cum_pmax = np.concatenate(([0.0], np.cumsum(pmax_generated))).tolist()
+    cum_cost = np.concatenate(([0.0], np.cumsum(pmax_generated * unit_cost))).tolist()
+
+    # Committed plants of the current search path, with the cumulative headroom over their pmin and its cost
+    path_plants: typing.List[int] = []
+    path_headroom: typing.List[float] = []
+    path_cost: typing.List[float] = []
+
+    def fill_committed(amount: float, length: int) -> typing.Tuple[float, float]:
+        # Returns the cost of filling the amount with the headroom of the committed plants, and what is left
+        if amount <= eps:
+            return 0.0, 0.0
+        if not length:
+            return 0.0, amount
+        if path_headroom[length - 1] < amount - eps:
+            return path_cost[length - 1], amount - path_headroom[length - 1]
+        last = bisect.bisect_left(path_headroom, amount - eps, 0, length)
+        filled, cost = (path_headroom[last - 1], path_cost[last - 1]) if last else (0.0, 0.0)
+        return cost + cost_values[path_plants[last]] * (amount - filled), 0.0
+
+    def fill_undecided(amount: float, position: int) -> float:
+        if amount <= eps:
+            return 0.0
+        target = cum_pmax[position] + amount
+        if target > cum_pmax[size] + eps:
+            return float("inf")
+        last = min(bisect.bisect_left(cum_pmax, target - eps, position + 1), size)
+        return cum_cost[last - 1] - cum_cost[position] + cost_values[last - 1] * max(target - cum_pmax[last - 1], 0.0)
+
+    best_cost, best = incumbent_cost, None
+    nodes, complete = 0, True
+    # Search nodes: next plant to decide, committed path length, load left after committed pmin and their cost
+    stack = [(0, 0, load, 0.0)]
+    while stack:
+        if nodes >= max_nodes or (not nodes % 256 and time.perf_counter() > deadline):
+            complete = False
+            break
+        nodes += 1
+        position, length, rest, base_cost = stack.pop()
+        del path_plants[length:], path_headroom[length:], path_cost[length:]
+
+        fill_cost, left = fill_committed(rest, length)
+        if left <= eps:
+            # Committed plants serve the load. Any undecided plant costs at least as much as the committed ones,
+            # so committing more of them can't make it cheaper.
+            if base_cost + fill_cost < best_cost - eps:
+                best_cost, best = base_cost + fill_cost, (path_plants[:length], rest)
+            continue
+        if position == size or base_cost + fill_cost + fill_undecided(left, position) >= best_cost - eps:
+            continue
+
+        pmin, pmax = pmin_values[position], pmax_values[position]
+        # With no pmin, committing the plant is never worse than leaving it off
+        if pmin > 0 or pmax <= 0:
+            stack.append((position + 1, length, rest, base_cost))
+        if 0 < pmax and pmin <= rest + eps:
+            path_plants.append(position)
+            path_headroom.append((path_headroom[-1] if length else 0.0) + pmax - pmin)
+            path_cost.append((path_cost[-1] if length else 0.0) + cost_values[position] * (pmax - pmin))
+            stack.append((position + 1, length + 1, rest - pmin, base_cost + cost_values[position] * pmin))
+
+    if best is None:
+        return CommitmentResult(None, best_cost, nodes, complete)
+
+    committed, rest = best
+    usage = np.zeros(size, dtype=float)
+    for plant in committed:
+        usage[plant] = pmin_values[plant]
+    for plant in committed:
+        extra = max(min(pmax_values[plant] - pmin_values[plant], rest), 0.0)
+        usage[plant] += extra
+        rest -= extra
+    return CommitmentResult(usage, best_cost, nodes, complete)
@@ -1,21 +1,37 @@
-import json
 import typing
 import logging
 import operator
-import pandas as pd
+import numpy as np
+
+from api.core.exceptions import APIException, BadRequestException
+from api.core.metrics import stage
+from api.core.tracing import current_trace
+from api.settings import get_app_settings
+from api.services.production_plan import commitment, dispatch
+from api.services.production_plan.fleet import Fleet, fleet_key
+from api.services.production_plan.fuels import compile_fuel_samples, compile_fuels, get_fuel_cost_model
+from api.services.production_plan.supply import SupplyCurve, get_supply_curve_cache
+from api.services.production_plan.uncertainty import new_seed, sample_fuels, statistics
 
 
 logger = logging.getLogger("api.services.production_plan.controller")
 
+# Version of the calculations, to bump whenever any engine gives different results for the same payload, so results
+# cached or tagged by earlier versions are not used anymore
+ENGINE_VERSION = 1
+# Intervals of a supply stack sweep when no step is given
+SWEEP_DEFAULT_INTERVALS = 100
+# Maximum size of the plants x loads matrices of a supply stack sweep, about 8 MB each
+SWEEP_MAX_CELLS = 1 << 20
+# Plants x samples float matrices alive at once while dispatching a chunk of Monte Carlo samples
+MONTE_CARLO_MATRICES = 12
+# Plants x samples float matrices with all the Monte Carlo samples, the usage and its copy sorted for the percentiles
+MONTE_CARLO_KEPT_MATRICES = 2
+
 
 def get_cost_per_fuel_type(data: typing.Dict, fuel_type: str) -> float:
-    # Default return value will be for wind, at 0 cost.
-    cost = 0.0
-    if fuel_type == "gasfired":
-        cost = float(data["fuels"]["gas(euro/MWh)"])
-    elif fuel_type == "turbojet":
-        cost = float(data["fuels"]["kerosine(euro/MWh)"])
-    return cost
+    # Types without a registered cost model, like wind, have 0 cost
+    return get_fuel_cost_model(fuel_type).cost(data["fuels"], get_app_settings().co2_adjusted_costs)
 
 
 def get_types(plants: typing.List[typing.Dict]) -> typing.List[str]:
@@ -24,35 +40,45 @@ def get_types(plants: typing.List[typing.Dict]) -> typing.List[str]:
     return list(set(all_types))
 
 
-def process(data):
+def get_wind_factor(data: typing.Dict) -> float:
+    return get_fuel_cost_model("windturbine").factor(data["fuels"])
+
+
+def process_dataframe(data):
+    # pandas takes longer to import than the rest of the API, and only this engine needs it
+    import pandas as pd
+
     # Obtain the initial dataframe from the data, only from 'powerplants' section
-    df = pd.json_normalize(data, record_path=["powerplants"])
-    logger.debug(f"Read data: {df}")
+    with stage("json_normalize"):
+        df = pd.json_normalize(data, record_path=["powerplants"])
+    # Intermediate tables are only rendered for traced requests
+    trace = current_trace()
+    if trace is not None:
+        trace.record("read_data", df.copy())
 
     required_load = float(data["load"])
     logger.info(f"Required load: {required_load}")
 
     # Parse the data to obtain the fuel types and the costs per type
     fuel_types = get_types(data["powerplants"])
-    fuel_costs = {fuel_type: get_cost_per_fuel_type(data, fuel_type) for fuel_type in fuel_types}
-    logger.debug(f"Fuel costs: {fuel_costs}")
+    costs, factors = get_fuel_table(data, fuel_types)
+    fuel_costs = dict(zip(fuel_types, costs.tolist()))
+    if trace is not None:
+        trace.record("fuel_costs", fuel_costs)
 
     # Now sort the types by the cost in ascending order
     fuel_costs = dict(sorted(fuel_costs.items(), key=operator.itemgetter(1)))
 
-    # Now get the reduction factors: for wind it will read the value in the payload,
-    # otherwise it will assign a factor or 1.
-    factors = []
-    for key, _ in fuel_costs.items():
-        if key == "windturbine":
-            factors.append(float(data["fuels"]["wind(%)"] / 100))
-        else:
-            factors.append(1.0)
+    # Now get the reduction factors in the same order: for wind it will be the value in the payload,
+    # otherwise a factor of 1.
+    fuel_factors = dict(zip(fuel_types, factors.tolist()))
+    factors = [fuel_factors[key] for key in fuel_costs]
 
     # Create a new dataframe with  weigths, production costs, sorting keys and efficiency factors for each
     # plant type, so we obtain a mapped powerplant -> fuel set.
     df_map = pd.DataFrame({"type": fuel_costs.keys(), "cost": fuel_costs.values(), "factor": factors})
-    logger.debug(f"Mapped values: \n{df_map}")
+    if trace is not None:
+        trace.record("mapped_values", df_map)
 
     # Reorder the dataframe now by type.
     #
@@ -61,14 +87,16 @@ def process(data):
     # gasfired       1      13.4         1.0
     # turbojet       2      50.8         1.0
     sorted_map = df_map.reset_index().set_index("type")
-    logger.debug(f"First sorted mapped data:\n{sorted_map}")
+    if trace is not None:
+        trace.record("sorted_map", sorted_map.reset_index())
 
     # Now generate a working dataframe incorporating all the fields from the weighted dataframe above
     df["type_idx"] = df["type"].map(sorted_map["index"])
     df["cost"] = df["type"].map(sorted_map["cost"])
     df["factor"] = df["type"].map(sorted_map["factor"])
     df = df.reset_index().set_index("type_idx")
-    logger.debug(f"Reset index df\n{df}")
+    if trace is not None:
+        trace.record("reset_index", df.reset_index())
 
     #  Let's obtain now the data sorted by efficiency, power and all other necessary factors.
     #  - type (ascending)
@@ -77,12 +105,14 @@ def process(data):
     #  - max power (descending)
     # We will also remove intermediate columns. So we obtain a datasets with the right entering order in the
     # electrical grid
-    df2 = df.sort_values(
-        by=["type_idx", "efficiency", "pmin", "pmax"],
-        ascending=[True, False, False, False],
-    ).reset_index()
+    with stage("sort"):
+        df2 = df.sort_values(
+            by=["type_idx", "efficiency", "pmin", "pmax"],
+            ascending=[True, False, False, False],
+        ).reset_index()
     df_sorted = df2.drop(labels=["type_idx"], axis=1)
-    logger.info(f"\n{df2}")
+    if trace is not None:
+        trace.record("sorted", df2)
 
     # At this point, this is what we should have in the sorted dataframe
     #    name                       type        efficiency  pmin   pmax    cost    factor
@@ -105,44 +135,46 @@ def process(data):
 
     # Calculate production figures, including rolling sum of the generated production
     # First row will start with the desired production value, and we will rest the value  for each next row.
-    df_sorted.loc[0, "remaining"] = required_load - df_sorted.loc[0, "pmax_generated"]
-    for i in range(1, len(df_sorted)):
-        max_consumption = df_sorted.loc[i, "pmax_generated"]
-        min_consumption = df_sorted.loc[i, "pmin_generated"]
-        prev_remain = df_sorted.loc[i - 1, "remaining"]
-        energy_consumed = max_consumption
-        # If we don't have enough energy remaining, let's check to use if we have enough min power requirements.
-        if max_consumption > prev_remain > 0:
-            energy_consumed = 0
-            if prev_remain >= min_consumption:
-                energy_consumed = prev_remain
-        df_sorted.loc[i, "remaining"] = prev_remain - energy_consumed
-    logger.debug(
-        f'Calculations on remaining / max / min usage\n{df_sorted[["index", "name", "pmax_generated", "pmin_generated", "remaining"]]}'
-    )
+    with stage("dispatch"):
+        df_sorted.loc[0, "remaining"] = required_load - df_sorted.loc[0, "pmax_generated"]
+        for i in range(1, len(df_sorted)):
+            max_consumption = df_sorted.loc[i, "pmax_generated"]
+            min_consumption = df_sorted.loc[i, "pmin_generated"]
+            prev_remain = df_sorted.loc[i - 1, "remaining"]
+            energy_consumed = max_consumption
+            # If we don't have enough energy remaining, let's check to use if we have enough min power requirements.
+            if max_consumption > prev_remain > 0:
+                energy_consumed = 0
+                if prev_remain >= min_consumption:
+                    energy_consumed = prev_remain
+            df_sorted.loc[i, "remaining"] = prev_remain - energy_consumed
+        if trace is not None:
+            columns = ["index", "name", "pmax_generated", "pmin_generated", "remaining"]
+            trace.record("remaining", df_sorted[columns].copy())
 
-    # Now get the production for each plant to to get the desired load
-    # Since first row is 100% assigned to a 0-cost, wind-powered plant, won't check here for the min power
-    # generated in the calculation.
-    df_sorted.loc[0, "usage"] = 0
-    if df_sorted.loc[0, "remaining"] >= df_sorted.loc[0, "pmax_generated"]:
-        df_sorted.loc[0, "usage"] = df_sorted.loc[0, "pmax_generated"]
-    else:
-        if required_load <= df_sorted.loc[0, "pmax_generated"]:
-            df_sorted.loc[0, "usage"] = required_load
-
-    for i in range(1, len(df_sorted)):
-        remaining = df_sorted.loc[i - 1, "remaining"]
-        pmax_generated = df_sorted.loc[i, "pmax_generated"]
-        pmin_generated = df_sorted.loc[i, "pmin_generated"]
-        df_sorted.loc[i, "usage"] = 0
-        if remaining >= pmax_generated:
-            df_sorted.loc[i, "usage"] = pmax_generated
+        # Now get the production for each plant to to get the desired load
+        # Since first row is 100% assigned to a 0-cost, wind-powered plant, won't check here for the min power
+        # generated in the calculation.
+        df_sorted.loc[0, "usage"] = 0
+        if df_sorted.loc[0, "remaining"] >= df_sorted.loc[0, "pmax_generated"]:
+            df_sorted.loc[0, "usage"] = df_sorted.loc[0, "pmax_generated"]
         else:
-            if remaining >= 0 and remaining >= pmin_generated:
-                df_sorted.loc[i, "usage"] = remaining
+            if required_load <= df_sorted.loc[0, "pmax_generated"]:
+                df_sorted.loc[0, "usage"] = required_load
+
+        for i in range(1, len(df_sorted)):
+            remaining = df_sorted.loc[i - 1, "remaining"]
+            pmax_generated = df_sorted.loc[i, "pmax_generated"]
+            pmin_generated = df_sorted.loc[i, "pmin_generated"]
+            df_sorted.loc[i, "usage"] = 0
+            if remaining >= pmax_generated:
+                df_sorted.loc[i, "usage"] = pmax_generated
+            else:
+                if remaining >= 0 and remaining >= pmin_generated:
+                    df_sorted.loc[i, "usage"] = remaining
 
-    logger.debug(f"Sorted results after calculations:\n{json.loads(df_sorted.to_json(indent=4))}")
+    if trace is not None:
+        trace.record("results", df_sorted)
 
     # At this time this is the expected result figure:
     #
@@ -158,12 +190,621 @@ def process(data):
     # dataframe were usage > 0 will be first, and = 0 usage values will be after them (since the
     # order in the grid will also take it into account)
     result = []
-    df_final = pd.concat([df_sorted[df_sorted.usage > 0], df_sorted[df_sorted.usage <= 0]])
-    for idx, row in df_final[["name", "usage"]].iterrows():
-        result.append(
-            {
-                "name": row["name"],
-                "p": round(row["usage"]),
-            }
+    with stage("result"):
+        df_final = pd.concat([df_sorted[df_sorted.usage > 0], df_sorted[df_sorted.usage <= 0]])
+        for idx, row in df_final[["name", "usage"]].iterrows():
+            result.append(
+                {
+                    "name": row["name"],
+                    "p": round(row["usage"]),
+                }
+            )
+    return result
+
+
+def get_fuel_table(data: typing.Dict, fuel_types: typing.List[str]) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the cost and the reduction factor of each of the given fuel types, from their cost models
+    :param data:
+    :param fuel_types:
+    :return:
+    :raises BadRequestException: When a fuel needed by the types is missing or invalid
+    """
+    try:
+        return compile_fuels(data["fuels"], fuel_types, get_app_settings().co2_adjusted_costs)
+    except (KeyError, TypeError, ValueError) as e:
+        raise BadRequestException(f"Invalid fuels: {e!r}")
+
+
+def process_arrays(data):
+    """
+    Same calculations as `process_dataframe`, but working on plain numpy arrays: the sort is a single lexsort,
+    and the remaining / usage passes are cumulative array operations instead of row by row lookups.
+    :param data:
+    :return:
+    """
+    with stage("build_fleet"):
+        fleet = Fleet(data["powerplants"])
+    return dispatch_fleet(fleet, data)
+
+
+def dispatch_fleet(fleet: Fleet, data: typing.Dict) -> typing.List[typing.Dict]:
+    """
+    Merit order calculations for an already built fleet
+    :param fleet:
+    :param data: Payload with the load and fuels, plants are taken from the fleet
+    :return:
+    """
+    required_load = float(data["load"])
+    logger.info(f"Required load: {required_load}")
+
+    fuel_costs, factors = get_fuel_table(data, fleet.fuel_types)
+
+    with stage("sort"):
+        order = fleet.merit_order(fuel_costs)
+        factor = factors[fleet.type_codes[order]]
+        pmax_generated = fleet.pmax[order] * fleet.efficiency[order] * factor
+        pmin_generated = fleet.pmin[order] * fleet.efficiency[order] * factor
+
+    with stage("dispatch"):
+        remaining = dispatch.remaining_load(pmax_generated, pmin_generated, required_load)
+        usage = dispatch.plant_usage(pmax_generated, pmin_generated, remaining, required_load)
+    with stage("result"):
+        names = [fleet.names[i] for i in order.tolist()]
+        result = dispatch.as_result(names, usage)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.record("fuel_costs", dict(zip(fleet.fuel_types, fuel_costs.tolist())))
+        trace.record(
+            "results",
+            [
+                {"name": name, "pmax_generated": pmax, "pmin_generated": pmin, "remaining": rest, "usage": used}
+                for name, pmax, pmin, rest, used in zip(
+                    names, pmax_generated.tolist(), pmin_generated.tolist(), remaining.tolist(), usage.tolist()
+                )
+            ],
         )
     return result
+
+
+def get_supply_curve(fleet: Fleet, data: typing.Dict) -> SupplyCurve:
+    """
+    Returns the supply curve of the fleet for the fuels in the payload. Curves are cached by fleet and by the
+    costs and factors of its plant types, so other fuel values don't matter.
+    :param fleet:
+    :param data:
+    :return:
+    """
+    fuel_costs, factors = get_fuel_table(data, fleet.fuel_types)
+    key = (fleet.uid, fuel_costs.tobytes(), factors.tobytes())
+    cache = get_supply_curve_cache()
+    curve = cache.get(key)
+    if curve is None:
+        curve = build_supply_curve(fleet, fleet.merit_order(fuel_costs), factors)
+        cache.set(key, curve)
+    return curve
+
+
+def build_supply_curve(fleet: Fleet, order: np.ndarray, factors: np.ndarray) -> SupplyCurve:
+    factor = factors[fleet.type_codes[order]]
+    return SupplyCurve(
+        [fleet.names[i] for i in order.tolist()],
+        fleet.pmax[order] * fleet.efficiency[order] * factor,
+        fleet.pmin[order] * fleet.efficiency[order] * factor,
+    )
+
+
+def dispatch_fleet_curve(fleet: Fleet, data: typing.Dict) -> typing.List[typing.Dict]:
+    """
+    Merit order calculations for an already built fleet through its supply curve, which is built once for
+    each set of fuel prices. Then each load only costs a few binary searches.
+    :param fleet:
+    :param data: Payload with the load and fuels, plants are taken from the fleet
+    :return:
+    """
+    required_load = float(data["load"])
+    logger.info(f"Required load: {required_load}")
+    return get_supply_curve(fleet, data).dispatch(required_load)
+
+
+def get_sweep_loads(data: typing.Dict, capacity: float) -> np.ndarray:
+    """
+    Returns the loads of a supply stack sweep, from `load_min` to `load_max` (the fleet capacity by default) every
+    `step` (so there are `SWEEP_DEFAULT_INTERVALS` by default)
+    :param data: Supply stack payload
+    :param capacity: Maximum generation of the fleet
+    :return:
+    :raises BadRequestException: When there are more loads than allowed
+    """
+    load_min = data.get("load_min", 0)
+    load_max = data.get("load_max")
+    if load_max is None:
+        load_max = max(load_min, int(np.ceil(capacity)))
+    step = data.get("step") or max(1, (load_max - load_min) // SWEEP_DEFAULT_INTERVALS)
+    max_points = get_app_settings().supply_stack_max_points
+    if (load_max - load_min) // step + 1 > max_points:
+        raise BadRequestException(f"Too many loads to sweep, maximum allowed is {max_points}")
+    return np.arange(load_min, load_max + 1, step)
+
+
+def process_supply_stack(data: typing.Dict) -> typing.Dict:
+    """
+    Calculates the merit order stack of a fleet for the given fuels, and the production plan and marginal price for
+    a range of loads.
+
+    All the loads are dispatched together in a single pass over the sorted plants, instead of solving each one on
+    its own, with the same results as `dispatch_fleet` for each load. Loads are swept in chunks, so the plants x
+    loads matrices stay within `SWEEP_MAX_CELLS`.
+    :param data: Supply stack payload
+    :return: The stack, in merit order, and the plan of each load with the power of each plant in stack order
+    """
+    return dispatch_fleet_supply_stack(Fleet(data["powerplants"]), data)
+
+
+def dispatch_fleet_supply_stack(fleet: Fleet, data: typing.Dict) -> typing.Dict:
+    """
+    Supply stack calculations for an already built fleet
+    :param fleet:
+    :param data: Supply stack payload, plants are taken from the fleet
+    :return:
+    """
+    fuel_costs, factors = get_fuel_table(data, fleet.fuel_types)
+    order = fleet.merit_order(fuel_costs)
+    curve = build_supply_curve(fleet, order, factors)
+    efficiency = fleet.efficiency[order]
+    # Cost per MWh generated. Plants with 0 efficiency generate nothing, their cost is left at 0.
+    costs = np.divide(fuel_costs[fleet.type_codes[order]], efficiency, out=np.zeros(len(fleet)), where=efficiency > 0)
+    capacity = float(curve.cum_pmax[-1]) if len(fleet) else 0.0
+    loads = get_sweep_loads(data, capacity)
+    logger.info(f"Supply stack of {len(fleet)} plants, {len(loads)} loads")
+
+    points = []
+    chunk = max(1, SWEEP_MAX_CELLS // max(len(fleet), 1))
+    for start in range(0, len(loads), chunk):
+        chunk_loads = loads[start : start + chunk]
+        with stage("dispatch"):
+            usage = curve.sweep(chunk_loads.astype(float))
+        with stage("result"):
+            # Marginal price is the cost of the most expensive plant used, -inf when none is
+            marginal = np.where(usage > 0, costs[:, None], -np.inf).max(axis=0, initial=-np.inf)
+            served = usage.sum(axis=0)
+            total_cost = (usage * costs[:, None]).sum(axis=0)
+            power = np.rint(usage).astype(np.int64).T.tolist()
+            points.extend(
+                {
+                    "load": load,
+                    "marginal_price": price if price > -np.inf else None,
+                    "served": load_served,
+                    "cost": load_cost,
+                    "p": load_power,
+                }
+                for load, price, load_served, load_cost, load_power in zip(
+                    chunk_loads.tolist(), marginal.tolist(), served.tolist(), total_cost.tolist(), power
+                )
+            )
+
+    stack = [
+        {
+            "name": name,
+            "type": fleet.fuel_types[code],
+            "cost": cost,
+            "pmin_generated": pmin,
+            "pmax_generated": pmax,
+            "capacity": cumulative,
+        }
+        for name, code, cost, pmin, pmax, cumulative in zip(
+            curve.names,
+            fleet.type_codes[order].tolist(),
+            costs.tolist(),
+            curve.pmin_generated.tolist(),
+            curve.pmax_generated.tolist(),
+            curve.cum_pmax.tolist(),
+        )
+    ]
+    return {"capacity": capacity, "stack": stack, "points": points}
+
+
+def solve_fleet_scenarios(
+    fleet: Fleet, loads: np.ndarray, fuel_tables: typing.List[typing.Tuple[np.ndarray, np.ndarray]]
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the production plan of several scenarios sharing the same fleet, all of them at once: each
+    scenario is a column of a plants x scenarios matrix, in its own merit order.
+    :param fleet:
+    :param loads: Required load of each scenario
+    :param fuel_tables: Fuel costs and factors of each scenario, as returned by `get_fuel_table`
+    :return: Merit order and usage of the plants, as plants x scenarios matrices
+    """
+    orders = np.empty((len(fleet), len(loads)), dtype=np.intp)
+    factor = np.empty((len(fleet), len(loads)), dtype=float)
+    for column, (fuel_costs, factors) in enumerate(fuel_tables):
+        orders[:, column] = fleet.merit_order(fuel_costs)
+        factor[:, column] = factors[fleet.type_codes[orders[:, column]]]
+    return orders, solve_merit_orders(fleet, orders, factor, loads)
+
+
+def solve_merit_orders(fleet: Fleet, orders: np.ndarray, factor: np.ndarray, loads: np.ndarray) -> np.ndarray:
+    """
+    Calculates the usage of the plants of several scenarios at once, given their merit orders
+    :param fleet:
+    :param orders: Merit order of each scenario, as a plants x scenarios matrix
+    :param factor: Reduction factor of each plant, in the merit order of each scenario
+    :param loads: Required load of each scenario
+    :return: Usage of the plants, in the merit order of each scenario
+    """
+    efficiency = fleet.efficiency[orders]
+    pmax_generated = fleet.pmax[orders] * efficiency * factor
+    pmin_generated = fleet.pmin[orders] * efficiency * factor
+
+    remaining = dispatch.remaining_load(pmax_generated, pmin_generated, loads)
+    return dispatch.plant_usage(pmax_generated, pmin_generated, remaining, loads)
+
+
+def iter_scenario_results(
+    fleet: Fleet, orders: np.ndarray, usage: np.ndarray
+) -> typing.Iterator[typing.List[typing.Dict]]:
+    # Builds the result of each scenario only when it's needed
+    for column in range(orders.shape[1]):
+        yield dispatch.as_result([fleet.names[i] for i in orders[:, column].tolist()], usage[:, column])
+
+
+def process_fleet_scenarios(
+    fleet: Fleet, loads: np.ndarray, fuel_tables: typing.List[typing.Tuple[np.ndarray, np.ndarray]]
+) -> typing.List[typing.List[typing.Dict]]:
+    # Same as `solve_fleet_scenarios`, returning the results of each scenario
+    return list(iter_scenario_results(fleet, *solve_fleet_scenarios(fleet, loads, fuel_tables)))
+
+
+def process_batch(
+    scenarios: typing.List[typing.Dict], engine: typing.Optional[str] = None
+) -> typing.List[typing.Union[typing.List[typing.Dict], APIException]]:
+    """
+    Calculates the production plan of many payloads in one go. Payloads are grouped by fleet, so each fleet is
+    built and pre-sorted once, and its scenarios are dispatched together with the merit order engines. The exact
+    engine searches each scenario on its own.
+
+    Results keep the order of the given payloads. A payload that can't be calculated gets an exception in its
+    position instead of failing the whole batch.
+    :param scenarios:
+    :param engine: Dispatch engine, the one of the app settings when not given
+    :return:
+    """
+    engine = engine or get_app_settings().dispatch_engine
+    if engine not in PARSED_ENGINES:
+        raise ValueError(f"Unknown dispatch engine '{engine}', available: {', '.join(PARSED_ENGINES)}")
+    results: typing.List[typing.Any] = [None] * len(scenarios)
+    groups: typing.Dict[typing.Tuple, typing.List[int]] = {}
+    for position, data in enumerate(scenarios):
+        groups.setdefault(fleet_key(data["powerplants"]), []).append(position)
+    logger.debug(f"Batch of {len(scenarios)} scenarios, {len(groups)} different fleets")
+
+    for positions in groups.values():
+        fleet = Fleet(scenarios[positions[0]]["powerplants"])
+        if engine == "exact":
+            outcomes = dispatch_fleet_each(fleet, [scenarios[i] for i in positions], dispatch_fleet_exact)
+        else:
+            outcomes = dispatch_fleet_batch(fleet, [scenarios[i] for i in positions])
+        for position, result in zip(positions, outcomes):
+            results[position] = result
+    return results
+
+
+def dispatch_fleet_each(
+    fleet: Fleet, scenarios: typing.List[typing.Dict], calculate: typing.Callable
+) -> typing.List[typing.Union[typing.List[typing.Dict], APIException]]:
+    # Same as `dispatch_fleet_batch`, calculating the scenarios one by one
+    results: typing.List[typing.Any] = []
+    for data in scenarios:
+        try:
+            results.append(calculate(fleet, data))
+        except APIException as e:
+            results.append(e)
+    return results
+
+
+def dispatch_fleet_batch(
+    fleet: Fleet, scenarios: typing.List[typing.Dict]
+) -> typing.List[typing.Union[typing.List[typing.Dict], APIException]]:
+    """
+    Merit order calculations of several payloads sharing the same fleet, dispatched together. Same results as
+    `dispatch_fleet` for each of them.
+    :param fleet:
+    :param scenarios: Payloads with the load and fuels
+    :return: Result of each payload, or the error its fuels gave
+    """
+    results: typing.List[typing.Any] = [None] * len(scenarios)
+    valid, fuel_tables = [], []
+    for position, data in enumerate(scenarios):
+        try:
+            fuel_tables.append(get_fuel_table(data, fleet.fuel_types))
+            valid.append(position)
+        except APIException as e:
+            results[position] = e
+    if valid:
+        loads = np.array([float(scenarios[position]["load"]) for position in valid], dtype=float)
+        for position, result in zip(valid, process_fleet_scenarios(fleet, loads, fuel_tables)):
+            results[position] = result
+    return results
+
+
+def get_sample_merit_orders(fleet: Fleet, fuel_costs: np.ndarray) -> np.ndarray:
+    """
+    Returns the merit order of each sample of the fuel costs. Samples share a handful of rankings of the plant types,
+    so the plants are only sorted once for each ranking.
+    :param fleet:
+    :param fuel_costs: Cost of each of the fleet types, as a types x samples matrix
+    :return: Merit orders, as a plants x samples matrix
+    """
+    if not len(fleet):
+        return np.empty((0, fuel_costs.shape[1]), dtype=np.intp)
+    rankings = np.argsort(fuel_costs, axis=0, kind="stable")
+    _, first, inverse = np.unique(rankings.T, axis=0, return_index=True, return_inverse=True)
+    orders = np.stack([fleet.merit_order(fuel_costs[:, column]) for column in first.tolist()], axis=1)
+    return orders[:, inverse.reshape(-1)]
+
+
+def process_monte_carlo(data: typing.Dict) -> typing.Dict:
+    """
+    Calculates the distribution of the production plan and of its cost when some fuels are uncertain. Each sample
+    of the uncertain fuels is dispatched with the same results as `dispatch_fleet` would give, but all of them as
+    columns of plants x samples matrices. Samples are dispatched in chunks, so those matrices stay within the memory
+    budget, along with the usage of all the samples.
+    :param data: Monte Carlo payload
+    :return: Statistics of the total cost, of the power served and of the power of each plant, in payload order
+    :raises BadRequestException: When there are more samples than allowed, or than fit the memory budget, or the
+    fuels can't be costed
+    """
+    return dispatch_fleet_monte_carlo(Fleet(data["powerplants"]), data)
+
+
+def dispatch_fleet_monte_carlo(fleet: Fleet, data: typing.Dict) -> typing.Dict:
+    """
+    Monte Carlo calculations for an already built fleet
+    :param fleet:
+    :param data: Monte Carlo payload, plants are taken from the fleet
+    :return:
+    """
+    settings = get_app_settings()
+    samples = data["samples"]
+    if samples > settings.monte_carlo_max_samples:
+        raise BadRequestException(f"Too many samples, maximum allowed is {settings.monte_carlo_max_samples}")
+    # The usage of all the samples is kept for the percentiles, what's left of the budget is for the chunks
+    budget = settings.monte_carlo_memory_mb * 2**20
+    column_size = max(len(fleet), 1) * 8
+    kept = samples * column_size * MONTE_CARLO_KEPT_MATRICES
+    if kept >= budget:
+        raise BadRequestException(
+            f"Too many samples for {len(fleet)} plants, maximum allowed is "
+            f"{(budget - 1) // (column_size * MONTE_CARLO_KEPT_MATRICES)}"
+        )
+    seed = data.get("seed")
+    if seed is None:
+        seed = new_seed()
+
+    with stage("sampling"):
+        fuels = {**data["fuels"], **sample_fuels(data["uncertainty"], samples, seed)}
+        try:
+            fuel_costs, factors = compile_fuel_samples(fuels, fleet.fuel_types, samples, settings.co2_adjusted_costs)
+        except (KeyError, TypeError, ValueError) as e:
+            raise BadRequestException(f"Invalid fuels: {e!r}")
+
+    required_load = float(data["load"])
+    # Usage of each plant in payload order, and total cost, of each sample
+    usage = np.empty((len(fleet), samples), dtype=float)
+    cost = np.empty(samples, dtype=float)
+    chunk = max(1, (budget - kept) // (column_size * MONTE_CARLO_MATRICES))
+    logger.info(f"Monte Carlo of {len(fleet)} plants, {samples} samples in chunks of {chunk}")
+    for start in range(0, samples, chunk):
+        stop = min(start + chunk, samples)
+        columns = np.arange(stop - start)
+        with stage("dispatch"):
+            orders = get_sample_merit_orders(fleet, fuel_costs[:, start:stop])
+            codes = fleet.type_codes[orders]
+            factor = factors[:, start:stop][codes, columns]
+            chunk_usage = solve_merit_orders(fleet, orders, factor, np.full(stop - start, required_load))
+        with stage("result"):
+            # Cost per MWh generated. Plants with 0 efficiency generate nothing, their cost is left at 0.
+            efficiency = fleet.efficiency[orders]
+            plant_costs = np.divide(
+                fuel_costs[:, start:stop][codes, columns], efficiency, out=np.zeros(orders.shape), where=efficiency > 0
+            )
+            cost[start:stop] = (chunk_usage * plant_costs).sum(axis=0)
+            usage[orders, start + columns] = chunk_usage
+
+    with stage("statistics"):
+        percentiles = data["percentiles"]
+        plant_stats = statistics(usage, percentiles)
+        bands = list(plant_stats["percentiles"].items())
+        powerplants = [
+            {
+                "name": name,
+                "mean": mean,
+                "std": std,
+                "min": low,
+                "max": high,
+                "percentiles": {key: band[plant] for key, band in bands},
+            }
+            for plant, (name, mean, std, low, high) in enumerate(
+                zip(fleet.names, plant_stats["mean"], plant_stats["std"], plant_stats["min"], plant_stats["max"])
+            )
+        ]
+        return {
+            "samples": samples,
+            "seed": seed,
+            "cost": statistics(cost, percentiles),
+            "served": statistics(usage.sum(axis=0), percentiles),
+            "powerplants": powerplants,
+        }
+
+
+def get_interval_fuels(fuels: typing.Dict, intervals: int) -> typing.List[typing.Dict]:
+    """
+    Splits a time-series fuels block, where each value is either a single value or a list with one value per
+    interval, into the fuels of each interval.
+    :param fuels:
+    :param intervals:
+    :return:
+    """
+    return [
+        {key: value[i] if isinstance(value, list) else value for key, value in fuels.items()}
+        for i in range(intervals)
+    ]
+
+
+def process_timeseries(data):
+    """
+    Calculates the production plan for each interval of a time-series payload. The fleet is built and sorted
+    once, and all the intervals are dispatched together as a plants x intervals matrix.
+    :param data:
+    :return: The production plan of each interval, in the same order
+    """
+    return dispatch_fleet_timeseries(Fleet(data["powerplants"]), data)
+
+
+def dispatch_fleet_timeseries(fleet: Fleet, data: typing.Dict) -> typing.List[typing.List[typing.Dict]]:
+    """
+    Time-series calculations for an already built fleet
+    :param fleet:
+    :param data: Time-series payload with the loads and fuels, plants are taken from the fleet
+    :return:
+    """
+    return list(dispatch_fleet_timeseries_lazy(fleet, data))
+
+
+def process_timeseries_lazy(data) -> typing.Iterator[typing.List[typing.Dict]]:
+    """
+    Same as `process_timeseries`, but the result of each interval is only built when iterated. All calculations
+    are done before returning.
+    :param data:
+    :return:
+    """
+    return dispatch_fleet_timeseries_lazy(Fleet(data["powerplants"]), data)
+
+
+def dispatch_fleet_timeseries_lazy(fleet: Fleet, data: typing.Dict) -> typing.Iterator[typing.List[typing.Dict]]:
+    """
+    Same as `dispatch_fleet_timeseries`, but the result of each interval is only built when iterated
+    :param fleet:
+    :param data: Time-series payload with the loads and fuels, plants are taken from the fleet
+    :return:
+    """
+    loads = np.array(data["load"], dtype=float)
+    logger.info(f"Required load for {len(loads)} intervals")
+
+    fuel_tables = [
+        get_fuel_table({"fuels": fuels}, fleet.fuel_types) for fuels in get_interval_fuels(data["fuels"], len(loads))
+    ]
+    return iter_scenario_results(fleet, *solve_fleet_scenarios(fleet, loads, fuel_tables))
+
+
+def process_exact(data):
+    """
+    Finds the cheapest commitment of plants serving exactly the required load, taking every plant pmin into
+    account. The greedy merit order result is used as the starting solution, so the search only looks for cheaper
+    ones, and it's also returned when no feasible commitment exists or none is found within the search budget.
+    :param data:
+    :return:
+    """
+    return dispatch_fleet_exact(Fleet(data["powerplants"]), data)
+
+
+def dispatch_fleet_exact(fleet: Fleet, data: typing.Dict) -> typing.List[typing.Dict]:
+    """
+    Exact commitment calculations for an already built fleet
+    :param fleet:
+    :param data: Payload with the load and fuels, plants are taken from the fleet
+    :return:
+    """
+    settings = get_app_settings()
+    required_load = float(data["load"])
+    logger.info(f"Required load: {required_load}")
+
+    fuel_costs, factors = get_fuel_table(data, fleet.fuel_types)
+    order = fleet.merit_order(fuel_costs)
+    efficiency = fleet.efficiency[order]
+    factor = factors[fleet.type_codes[order]]
+    pmax_generated = fleet.pmax[order] * efficiency * factor
+    pmin_generated = fleet.pmin[order] * efficiency * factor
+    remaining = dispatch.remaining_load(pmax_generated, pmin_generated, required_load)
+    usage = dispatch.plant_usage(pmax_generated, pmin_generated, remaining, required_load)
+
+    # Cost per MWh generated. Plants that can't generate anything are left out of the search.
+    unit_cost = np.full(len(fleet), np.inf)
+    np.divide(fuel_costs[fleet.type_codes[order]], efficiency, out=unit_cost, where=efficiency > 0)
+    usable = np.flatnonzero((pmax_generated > 0) & (pmax_generated >= pmin_generated) & np.isfinite(unit_cost))
+    usable = usable[np.argsort(unit_cost[usable], kind="stable")]
+
+    incumbent_cost = float("inf")
+    if commitment.is_feasible(usage, pmin_generated, pmax_generated, required_load):
+        incumbent_cost = commitment.dispatch_cost(usage, unit_cost)
+    solution = commitment.solve_commitment(
+        pmin_generated[usable],
+        pmax_generated[usable],
+        unit_cost[usable],
+        required_load,
+        max_nodes=settings.exact_solver_max_nodes,
+        time_budget=settings.exact_solver_time_budget_ms / 1000,
+        incumbent_cost=incumbent_cost,
+    )
+    logger.info(
+        f"Commitment search: {solution.nodes} nodes, complete: {solution.complete}, "
+        f"improved greedy result: {solution.usage is not None}"
+    )
+    if solution.usage is not None:
+        usage = np.zeros(len(fleet), dtype=float)
+        usage[usable] = solution.usage
+    return dispatch.as_result([fleet.names[i] for i in order.tolist()], usage)
+
+
+ENGINES = {
+    "pandas": process_dataframe,
+    "numpy": process_arrays,
+    "exact": process_exact,
+}
+
+
+# Engines for already built fleets. These are only kept in array form, so the dataframe engine uses the array
+# calculations, which give the same results. Merit order ones go through the cached supply curves.
+FLEET_ENGINES = {
+    "pandas": dispatch_fleet_curve,
+    "numpy": dispatch_fleet_curve,
+    "exact": dispatch_fleet_exact,
+}
+
+
+# Engines for fleets parsed from a single payload. Their calculations can't be reused, so merit order ones don't
+# build supply curves.
+PARSED_ENGINES = {
+    "pandas": lambda fleet, data: process_dataframe({**data, "powerplants": fleet.plants()}),
+    "numpy": dispatch_fleet,
+    "exact": dispatch_fleet_exact,
+}
+
+
+def get_engine(name: str) -> typing.Callable:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown dispatch engine '{name}', available: {', '.join(ENGINES)}")
+    return ENGINES[name]
+
+
+def process(data):
+    # The engine is chosen through the app settings. The merit order engines, pandas and numpy, give the same results,
+    # the exact one can find cheaper plans when minimum powers make the merit order miss them
+    return get_engine(get_app_settings().dispatch_engine)(data)
+
+
+def process_fleet(fleet: Fleet, data: typing.Dict) -> typing.List[typing.Dict]:
+    # Same as `process`, for an already built fleet
+    engine = get_app_settings().dispatch_engine
+    if engine not in FLEET_ENGINES:
+        raise ValueError(f"Unknown dispatch engine '{engine}', available: {', '.join(FLEET_ENGINES)}")
+    return FLEET_ENGINES[engine](fleet, data)
+
+
+def process_parsed(fleet: Fleet, data: typing.Dict) -> typing.List[typing.Dict]:
+    # Same as `process`, for a payload whose plants were already parsed into a fleet
+    engine = get_app_settings().dispatch_engine
+    if engine not in PARSED_ENGINES:
+        raise ValueError(f"Unknown dispatch engine '{engine}', available: {', '.join(PARSED_ENGINES)}")
+    return PARSED_ENGINES[engine](fleet, data)
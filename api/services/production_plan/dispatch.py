@@ -0,0 +1,130 @@
+import typing
+import numpy as np
+
+
+# Initial size of the window scanned on every pass of the remaining load calculation. It doubles each time a
+# window is fully consumed without any plant being partially used, so long runs of fully-used plants cost a
+# handful of array operations instead of one Python step per plant.
+SCAN_WINDOW = 32
+
+
+def remaining_load(pmax_generated: np.ndarray, pmin_generated: np.ndarray, load: float) -> np.ndarray:
+    """
+    Calculates the remaining load after each plant in merit order has entered the grid.
+
+    A plant is fully used unless the remaining load is positive but below its max generation: in that case it
+    takes the whole remaining load if it is above its min generation, otherwise the plant is skipped.
+    Values are obtained with the very same sequence of float operations as the row by row loop, so results
+    are bit-for-bit identical.
+
+    2-D inputs hold one column per scenario (plants x scenarios), each column in its own merit order, and
+    `load` then holds one value per scenario.
+    :param pmax_generated: Max generation of each plant, in merit order
+    :param pmin_generated: Min generation of each plant, in merit order
+    :param load: Required load
+    :return:
+    """
+    if np.ndim(pmax_generated) > 1:
+        return _remaining_load_columns(pmax_generated, pmin_generated, load)
+
+    size = len(pmax_generated)
+    remaining = np.empty(size, dtype=float)
+    if not size:
+        return remaining
+
+    remaining[0] = load - pmax_generated[0]
+    start, window = 1, SCAN_WINDOW
+    while start < size:
+        stop = min(start + window, size)
+        pmax_window = pmax_generated[start:stop]
+        # Remaining load before each plant of the window, assuming all of them are fully used. The subtract
+        # accumulation is sequential, so it matches the chained subtractions of a loop.
+        before = np.subtract.accumulate(np.concatenate(([remaining[start - 1]], pmax_window)))[:-1]
+        partial = (pmax_window > before) & (before > 0)
+        if not partial.any():
+            remaining[start:stop] = before - pmax_window
+            start, window = stop, window * 2
+            continue
+
+        # Plants before the first partially used one are fully used
+        offset = int(partial.argmax())
+        plant = start + offset
+        remaining[start:plant] = before[:offset] - pmax_window[:offset]
+        prev_remain = before[offset]
+        energy_consumed = prev_remain if prev_remain >= pmin_generated[plant] else 0
+        remaining[plant] = prev_remain - energy_consumed
+        start, window = plant + 1, SCAN_WINDOW
+    return remaining
+
+
+def _remaining_load_columns(pmax_generated: np.ndarray, pmin_generated: np.ndarray, load: np.ndarray) -> np.ndarray:
+    # Partially used plants happen at different positions on each scenario, so walk the plants and calculate
+    # all the scenarios at once on every step.
+    remaining = np.empty(np.shape(pmax_generated), dtype=float)
+    if not len(remaining):
+        return remaining
+
+    remaining[0] = load - pmax_generated[0]
+    for i in range(1, len(remaining)):
+        prev_remain = remaining[i - 1]
+        partial = (pmax_generated[i] > prev_remain) & (prev_remain > 0)
+        energy_consumed = np.where(
+            partial, np.where(prev_remain >= pmin_generated[i], prev_remain, 0.0), pmax_generated[i]
+        )
+        remaining[i] = prev_remain - energy_consumed
+    return remaining
+
+
+def plant_usage(
+    pmax_generated: np.ndarray, pmin_generated: np.ndarray, remaining: np.ndarray, load: float
+) -> np.ndarray:
+    """
+    Calculates the power used from each plant, in merit order, given the remaining load figures. Same as
+    `remaining_load`, 2-D inputs hold one column per scenario.
+    :param pmax_generated: Max generation of each plant, in merit order
+    :param pmin_generated: Min generation of each plant, in merit order
+    :param remaining: Remaining load after each plant, as returned by `remaining_load`
+    :param load: Required load
+    :return:
+    """
+    if not len(remaining):
+        return np.empty(np.shape(remaining), dtype=float)
+
+    prev_remain = np.empty_like(remaining)
+    prev_remain[1:] = remaining[:-1]
+    usage = np.where(
+        prev_remain >= pmax_generated,
+        pmax_generated,
+        np.where((prev_remain >= 0) & (prev_remain >= pmin_generated), prev_remain, 0.0),
+    )
+
+    # First plant is a 0-cost one, so it does not check for the min power generated
+    usage[0] = np.where(
+        remaining[0] >= pmax_generated[0],
+        pmax_generated[0],
+        np.where(load <= pmax_generated[0], load, 0.0),
+    )
+    return usage
+
+
+def grid_order(usage: np.ndarray) -> np.ndarray:
+    """
+    Returns the positions of the plants with usage > 0 first, followed by the ones with usage = 0, keeping
+    the merit order within each group.
+    :param usage:
+    :return:
+    """
+    return np.concatenate((np.flatnonzero(usage > 0), np.flatnonzero(usage <= 0)))
+
+
+def as_result(names: typing.Sequence[str], usage: np.ndarray) -> typing.List[typing.Dict]:
+    """
+    Builds the final name / power list for the given plants and usages, already in merit order
+    :param names:
+    :param usage:
+    :return:
+    """
+    positions = grid_order(usage)
+    # np.rint rounds half to even, same as the builtin round
+    power = np.rint(usage[positions]).astype(np.int64).tolist()
+    return [{"name": names[i], "p": p} for i, p in zip(positions.tolist(), power)]
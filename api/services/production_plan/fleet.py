@@ -0,0 +1,152 @@
+import sys
+import uuid
+import typing
+import numpy as np
+
+
+def fleet_key(plants: typing.List[typing.Dict]) -> typing.Tuple:
+    """
+    Returns a hashable key identifying a list of plants, so payloads sharing the same fleet can be grouped
+    :param plants:
+    :return:
+    """
+    return tuple((plant["name"], plant["type"], plant["efficiency"], plant["pmin"], plant["pmax"]) for plant in plants)
+
+
+class Fleet:
+    """
+    Struct-of-arrays representation of the plants in a payload.
+
+    Plant types are stored as codes into `fuel_types` (in order of appearance), and plants are pre-sorted by
+    efficiency, pmin and pmax since that part of the merit order does not depend on the fuel prices.
+
+    Fleets are immutable once built, so a single one is shared by the validation, the calculations and the results
+    of a request, and by all the requests of a registered fleet, without copies. Names are kept as the strings they
+    were given, which results refer to.
+    """
+
+    def __init__(self, plants: typing.List[typing.Dict]):
+        self._set_columns(
+            [plant["name"] for plant in plants],
+            [plant["type"] for plant in plants],
+            np.array([plant["efficiency"] for plant in plants], dtype=float),
+            np.array([plant["pmin"] for plant in plants], dtype=float),
+            np.array([plant["pmax"] for plant in plants], dtype=float),
+        )
+
+    @classmethod
+    def from_models(cls, plants: typing.Sequence[typing.Any]) -> "Fleet":
+        """
+        Builds the fleet from validated `PowerPlant` models, without going through a dict per plant
+        :param plants:
+        :return:
+        """
+        return cls.from_columns(
+            [plant.name for plant in plants],
+            [plant.type for plant in plants],
+            np.array([plant.efficiency for plant in plants], dtype=float),
+            np.array([plant.pmin for plant in plants], dtype=float),
+            np.array([plant.pmax for plant in plants], dtype=float),
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        names: typing.List[str],
+        types: typing.List[str],
+        efficiency: np.ndarray,
+        pmin: np.ndarray,
+        pmax: np.ndarray,
+    ) -> "Fleet":
+        """
+        Builds the fleet from a column per plant field, without going through a dict per plant. The fleet takes
+        ownership of the arrays, which become read-only.
+        :param names:
+        :param types:
+        :param efficiency:
+        :param pmin:
+        :param pmax:
+        :return:
+        """
+        fleet = cls.__new__(cls)
+        fleet._set_columns(names, types, efficiency, pmin, pmax)
+        return fleet
+
+    def _set_columns(
+        self,
+        names: typing.List[str],
+        types: typing.List[str],
+        efficiency: np.ndarray,
+        pmin: np.ndarray,
+        pmax: np.ndarray,
+    ) -> None:
+        # Unique id of this fleet instance, to key data calculated for it
+        self.uid = uuid.uuid4().hex
+        self.names = tuple(names)
+        # Types are few, so they are interned and plants only keep the smallest code pointing to theirs
+        codes: typing.Dict[str, int] = {}
+        type_codes = [codes.setdefault(fuel_type, len(codes)) for fuel_type in types]
+        self.fuel_types = tuple(sys.intern(fuel_type) for fuel_type in codes)
+        self.type_codes = np.array(type_codes, dtype=np.min_scalar_type(max(len(codes) - 1, 0)))
+        self.efficiency = np.asarray(efficiency, dtype=float)
+        self.pmin = np.asarray(pmin, dtype=float)
+        self.pmax = np.asarray(pmax, dtype=float)
+
+        # Efficiency, pmin and pmax descending. np.lexsort sorts by the last key first, and it is stable, so ties
+        # keep the order in which the plants were received, same as the pandas sort.
+        self.plant_order = np.lexsort((-self.pmax, -self.pmin, -self.efficiency))
+        for column in (self.type_codes, self.efficiency, self.pmin, self.pmax, self.plant_order):
+            column.flags.writeable = False
+        # Merit orders already calculated, by type ranking. Scenarios usually share the ranking of fuel prices.
+        self._merit_orders: typing.Dict[bytes, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def key(self) -> typing.Tuple:
+        """
+        Returns a hashable key identifying the plants of the fleet, so requests sharing the same fleet can be grouped
+        :return:
+        """
+        return (
+            self.names,
+            self.fuel_types,
+            self.type_codes.tobytes(),
+            self.efficiency.tobytes(),
+            self.pmin.tobytes(),
+            self.pmax.tobytes(),
+        )
+
+    def plants(self) -> typing.List[typing.Dict]:
+        """
+        Returns the plants of the fleet, in the same format and order they were given
+        :return:
+        """
+        return [
+            {"name": name, "type": self.fuel_types[code], "efficiency": efficiency, "pmin": int(pmin), "pmax": int(pmax)}
+            for name, code, efficiency, pmin, pmax in zip(
+                self.names,
+                self.type_codes.tolist(),
+                self.efficiency.tolist(),
+                self.pmin.tolist(),
+                self.pmax.tolist(),
+            )
+        ]
+
+    def merit_order(self, fuel_costs: np.ndarray) -> np.ndarray:
+        """
+        Returns the indices of the plants in the order they enter the grid:
+        - type, by fuel cost (ascending)
+        - plant efficiency (descending)
+        - minimal power (descending)
+        - max power (descending)
+        :param fuel_costs: Cost of each of `fuel_types`
+        :return:
+        """
+        type_rank = np.empty(len(self.fuel_types), dtype=np.intp)
+        type_rank[np.argsort(fuel_costs, kind="stable")] = np.arange(len(self.fuel_types))
+        key = type_rank.tobytes()
+        if key not in self._merit_orders:
+            plant_rank = type_rank[self.type_codes[self.plant_order]]
+            self._merit_orders[key] = self.plant_order[np.argsort(plant_rank, kind="stable")]
+        return self._merit_orders[key]
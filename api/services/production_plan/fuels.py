@@ -0,0 +1,105 @@
+import typing
+import numpy as np
+
+
+CO2_PRICE = "co2(euro/ton)"
+
+
+def fuel_value(value) -> typing.Union[float, np.ndarray]:
+    # Fuels hold a number, or an array with a sample of it per scenario
+    return value.astype(float) if isinstance(value, np.ndarray) else float(value)
+
+
+class FuelCostModel:
+    """
+    Cost and availability of a plant type, read from the `fuels` of a payload.
+
+    The cost is the price of its fuel per MWh, plus the cost of the CO2 emitted when CO2-adjusted costs are
+    enabled. The factor is the ratio of the plant power available, e.g. the wind percentage for windturbines.
+    Types with special needs can subclass it and override `cost` or `factor`.
+
+    Fuels may hold arrays of samples instead of numbers, in which case costs and factors are arrays too.
+    """
+
+    def __init__(
+        self,
+        price: typing.Optional[str] = None,
+        co2_intensity: float = 0.0,
+        availability: typing.Optional[str] = None,
+    ):
+        """
+        :param price: Key of the fuel price in `fuels`, None for types with no fuel cost
+        :param co2_intensity: Tons of CO2 emitted per MWh
+        :param availability: Key of the availability percentage in `fuels`, None for types always fully available
+        """
+        self.price = price
+        self.co2_intensity = co2_intensity
+        self.availability = availability
+
+    def cost(self, fuels: typing.Dict, co2_adjusted: bool = False) -> typing.Union[float, np.ndarray]:
+        cost = fuel_value(fuels[self.price]) if self.price is not None else 0.0
+        if co2_adjusted and self.co2_intensity:
+            cost = cost + fuel_value(fuels[CO2_PRICE]) * self.co2_intensity
+        return cost
+
+    def factor(self, fuels: typing.Dict) -> typing.Union[float, np.ndarray]:
+        if self.availability is None:
+            return 1.0
+        return fuel_value(fuels[self.availability]) / 100
+
+
+# Types not registered have no cost and are always fully available
+DEFAULT_MODEL = FuelCostModel()
+
+FUEL_COST_MODELS: typing.Dict[str, FuelCostModel] = {
+    "gasfired": FuelCostModel(price="gas(euro/MWh)", co2_intensity=0.3),
+    "turbojet": FuelCostModel(price="kerosine(euro/MWh)"),
+    "windturbine": FuelCostModel(availability="wind(%)"),
+}
+
+
+def register_fuel_cost_model(fuel_type: str, model: FuelCostModel) -> None:
+    FUEL_COST_MODELS[fuel_type] = model
+
+
+def get_fuel_cost_model(fuel_type: str) -> FuelCostModel:
+    return FUEL_COST_MODELS.get(fuel_type, DEFAULT_MODEL)
+
+
+def compile_fuels(
+    fuels: typing.Dict, fuel_types: typing.Sequence[str], co2_adjusted: bool = False
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Compiles the fuels of a payload into the cost and the factor of each of the given types, so plants are costed
+    by indexing them with their type codes
+    :param fuels: Fuels of the payload
+    :param fuel_types:
+    :param co2_adjusted: Whether to add the cost of the CO2 emitted
+    :return: Costs and factors, in the order of `fuel_types`
+    :raises KeyError: When a fuel needed by any of the types is missing
+    """
+    models = [get_fuel_cost_model(fuel_type) for fuel_type in fuel_types]
+    costs = np.array([model.cost(fuels, co2_adjusted) for model in models], dtype=float)
+    factors = np.array([model.factor(fuels) for model in models], dtype=float)
+    return costs, factors
+
+
+def compile_fuel_samples(
+    fuels: typing.Dict, fuel_types: typing.Sequence[str], samples: int, co2_adjusted: bool = False
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Same as `compile_fuels`, for fuels holding an array of samples instead of some of their numbers
+    :param fuels: Fuels of the payload, with the sampled ones replaced by their samples
+    :param fuel_types:
+    :param samples: Number of samples
+    :param co2_adjusted: Whether to add the cost of the CO2 emitted
+    :return: Costs and factors, as types x samples matrices
+    :raises KeyError: When a fuel needed by any of the types is missing
+    """
+    models = [get_fuel_cost_model(fuel_type) for fuel_type in fuel_types]
+    costs = np.empty((len(models), samples), dtype=float)
+    factors = np.empty((len(models), samples), dtype=float)
+    for row, model in enumerate(models):
+        costs[row] = model.cost(fuels, co2_adjusted)
+        factors[row] = model.factor(fuels)
+    return costs, factors
@@ -0,0 +1,212 @@
+import json
+import typing
+import numpy as np
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import DictError, FloatError, IntegerError, MissingError, NoneIsNotAllowedError, StrError
+from api.core.formats import ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, media_type, read_arrow_table, unpack_msgpack
+from api.services.production_plan.fleet import Fleet
+from api.services.production_plan.types import PowerPlantPayload
+
+
+# Same messages as the validators of `PowerPlant`
+EFFICIENCY_ERROR = "Plant efficiency can not be bigger than 1"
+PMIN_ERROR = "Minimum value for plant pmin is 0"
+
+
+def parse_payload(
+    body: bytes, content_type: typing.Optional[str] = None, fast: bool = True
+) -> typing.Tuple[Fleet, typing.Dict]:
+    """
+    Parses a `PowerPlantPayload` request body into the fleet of its plants, and the rest of the payload.
+
+    The body is decoded once, and the plants are read straight into a column per field and validated with array
+    operations. Payloads with any value that would need pydantic to coerce it, e.g. numbers as strings, are
+    validated by `PowerPlantPayload` instead, so results and errors are the same ones in both cases.
+
+    Bodies can also be MessagePack, with the same structure as the JSON ones, or an Arrow IPC stream with a column
+    per plant field and the load and fuels, as JSON, in the `load` and `fuels` schema metadata.
+    :param body: Request body
+    :param content_type: Request content type
+    :param fast: Whether to use the columns fast path, or always validate with `PowerPlantPayload`
+    :return: The fleet, and a dict with the load and fuels
+    :raises RequestValidationError: Same errors as FastAPI would give validating the body as `PowerPlantPayload`
+    """
+    if media_type(content_type) == ARROW_MEDIA_TYPE:
+        return parse_arrow(body)
+    data = decode_body(body, content_type)
+    if fast:
+        parsed = parse_columns(data)
+        if parsed is not None:
+            return parsed
+    return parse_model(data)
+
+
+def decode_body(body: bytes, content_type: typing.Optional[str]) -> typing.Any:
+    # Same decoding as FastAPI does for body parameters
+    if not body:
+        return None
+    body_type = media_type(content_type)
+    if body_type in MSGPACK_MEDIA_TYPES:
+        try:
+            return unpack_msgpack(body)
+        except ValueError as e:
+            raise RequestValidationError([ErrorWrapper(ValueError(f"Invalid MessagePack body: {e}"), ("body",))])
+    if content_type and not (body_type == "application/json" or body_type.endswith("+json")):
+        return body
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([ErrorWrapper(e, ("body", e.pos))], body=e.doc)
+
+
+def parse_model(data: typing.Any) -> typing.Tuple[Fleet, typing.Dict]:
+    if data is None:
+        raise RequestValidationError([ErrorWrapper(MissingError(), ("body",))])
+    if not isinstance(data, dict):
+        raise RequestValidationError([ErrorWrapper(DictError(), ("body",))], body=data)
+    try:
+        payload = PowerPlantPayload.parse_obj(data)
+    except ValidationError as e:
+        raise RequestValidationError([ErrorWrapper(e, ("body",))], body=data)
+    return Fleet.from_models(payload.powerplants), {"load": payload.load, "fuels": payload.fuels}
+
+
+def parse_columns(data: typing.Any) -> typing.Optional[typing.Tuple[Fleet, typing.Dict]]:
+    """
+    Reads the plants of the payload into columns, when all the values have the exact types of the model
+    :param data: Decoded body
+    :return: The fleet and the rest of the payload, None when the payload needs to be validated by the model
+    :raises RequestValidationError: When any plant efficiency or pmin is not valid
+    """
+    if not isinstance(data, dict) or type(data.get("load")) is not int or not isinstance(data.get("fuels"), dict):
+        return None
+    plants = data.get("powerplants")
+    if not isinstance(plants, list) or not all(type(plant) is dict for plant in plants):
+        return None
+    # A list per field straight away, instead of a row per plant to transpose
+    try:
+        names, types, efficiency, pmin, pmax = (
+            [plant[field] for plant in plants] for field in ("name", "type", "efficiency", "pmin", "pmax")
+        )
+    except KeyError:
+        return None
+    if not (
+        set(map(type, names)) <= {str}
+        and set(map(type, types)) <= {str}
+        and set(map(type, efficiency)) <= {int, float}
+        and set(map(type, pmin)) <= {int}
+        and set(map(type, pmax)) <= {int}
+    ):
+        return None
+
+    fleet = validate_columns(names, types, efficiency, pmin, pmax, data)
+    return fleet, {"load": data["load"], "fuels": data["fuels"]}
+
+
+def validate_columns(
+    names: typing.List[str],
+    types: typing.List[str],
+    efficiency: typing.Sequence[float],
+    pmin: typing.Sequence[float],
+    pmax: typing.Sequence[float],
+    body: typing.Any = None,
+) -> Fleet:
+    """
+    Runs the checks of the `PowerPlant` validators on whole columns, and builds the fleet from them
+    :param names:
+    :param types:
+    :param efficiency:
+    :param pmin:
+    :param pmax:
+    :param body: Decoded body, sent along the validation errors
+    :return:
+    :raises RequestValidationError: When any plant efficiency or pmin is not valid
+    """
+    efficiency = np.asarray(efficiency, dtype=float)
+    pmin = np.asarray(pmin, dtype=float)
+    errors = [(int(i), 0, "efficiency", EFFICIENCY_ERROR) for i in np.flatnonzero(efficiency > 1.0)]
+    errors += [(int(i), 1, "pmin", PMIN_ERROR) for i in np.flatnonzero(pmin < 0)]
+    if errors:
+        # Sorted by plant then by field, as the model reports them
+        raise RequestValidationError(
+            [ErrorWrapper(ValueError(msg), ("body", "powerplants", i, field)) for i, _, field, msg in sorted(errors)],
+            body=body,
+        )
+    return Fleet.from_columns(names, types, efficiency, pmin, np.asarray(pmax, dtype=float))
+
+
+def parse_arrow(body: bytes) -> typing.Tuple[Fleet, typing.Dict]:
+    """
+    Parses an Arrow IPC stream body. Float efficiency columns are used as they are, without copies; pmin and pmax
+    are converted to floats for the calculations.
+    :param body:
+    :return: The fleet and the rest of the payload
+    :raises RequestValidationError: Same errors as the model would give, with columns instead of plants missing
+    """
+    import pyarrow as pa
+
+    if not body:
+        raise RequestValidationError([ErrorWrapper(MissingError(), ("body",))])
+    try:
+        table = read_arrow_table(body)
+    except (pa.ArrowException, OSError) as e:
+        raise RequestValidationError([ErrorWrapper(ValueError(f"Invalid Arrow IPC stream body: {e}"), ("body",))])
+
+    errors = []
+    metadata = table.schema.metadata or {}
+    data = {}
+    for field, error in (("load", IntegerError), ("fuels", DictError)):
+        if field.encode() not in metadata:
+            errors.append(ErrorWrapper(MissingError(), ("body", field)))
+            continue
+        try:
+            data[field] = json.loads(metadata[field.encode()])
+        except ValueError:
+            data[field] = None
+        if not isinstance(data[field], int if field == "load" else dict) or isinstance(data[field], bool):
+            errors.append(ErrorWrapper(error(), ("body", field)))
+
+    columns = {}
+    for field, kind, error in (
+        ("name", pa.types.is_string, StrError),
+        ("type", pa.types.is_string, StrError),
+        ("efficiency", _is_number, FloatError),
+        ("pmin", _is_number, IntegerError),
+        ("pmax", _is_number, IntegerError),
+    ):
+        if field not in table.column_names:
+            errors.append(ErrorWrapper(MissingError(), ("body", "powerplants", field)))
+            continue
+        column = table.column(field)
+        if not kind(column.type):
+            errors.append(ErrorWrapper(error(), ("body", "powerplants", field)))
+            continue
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+        for i in np.flatnonzero(column.is_null().to_numpy(zero_copy_only=False)).tolist():
+            errors.append(ErrorWrapper(NoneIsNotAllowedError(), ("body", "powerplants", i, field)))
+        columns[field] = column
+    if errors:
+        raise RequestValidationError(errors)
+
+    # Integer fields take the integer part of float values, as the model does
+    pmin, pmax = (
+        np.trunc(columns[field].to_numpy(zero_copy_only=False)) if pa.types.is_floating(columns[field].type)
+        else columns[field].to_numpy(zero_copy_only=False)
+        for field in ("pmin", "pmax")
+    )
+    fleet = validate_columns(
+        columns["name"].to_pylist(),
+        columns["type"].to_pylist(),
+        columns["efficiency"].to_numpy(zero_copy_only=False),
+        pmin,
+        pmax,
+    )
+    return fleet, data
+
+
+def _is_number(arrow_type) -> bool:
+    import pyarrow as pa
+
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
@@ -0,0 +1,135 @@
+import os
+import json
+import typing
+import hashlib
+import tempfile
+import threading
+import contextlib
+from functools import lru_cache
+from api.settings import get_app_settings
+from api.services.production_plan.fleet import Fleet
+
+
+class FleetRegistry:
+    """
+    Thread-safe store of the registered fleets, by id
+    """
+
+    def __init__(self, max_fleets: int):
+        self.max_fleets = max_fleets
+        self._lock = threading.Lock()
+        self._fleets: typing.Dict[str, Fleet] = {}
+
+    def __len__(self) -> int:
+        return len(self._fleets)
+
+    def get(self, fleet_id: str) -> typing.Optional[Fleet]:
+        return self._fleets.get(fleet_id)
+
+    def put(self, fleet_id: str, fleet: Fleet) -> bool:
+        """
+        Stores the fleet, replacing any previous one with the same id
+        :param fleet_id:
+        :param fleet:
+        :return: False when the registry is full, so the fleet was not stored
+        """
+        with self._lock:
+            if fleet_id not in self._fleets and len(self._fleets) >= self.max_fleets:
+                return False
+            self._fleets[fleet_id] = fleet
+            return True
+
+    def delete(self, fleet_id: str) -> bool:
+        with self._lock:
+            return self._fleets.pop(fleet_id, None) is not None
+
+
+class SharedFleetRegistry:
+    """
+    Store of the registered fleets shared by the worker processes of the API, through a file per fleet in a
+    directory. Each worker keeps the fleets it has read, and only reads them again once another worker replaces
+    them. Files are replaced atomically, so workers never read a fleet half written.
+    """
+
+    def __init__(self, directory: str, max_fleets: int):
+        self.directory = directory
+        self.max_fleets = max_fleets
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Fleets read by this process, with the identity of the file they were read from
+        self._fleets: typing.Dict[str, typing.Tuple[typing.Tuple, Fleet]] = {}
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def _path(self, fleet_id: str) -> str:
+        # Ids are hashed, so any of them makes a valid file name
+        return os.path.join(self.directory, hashlib.sha256(fleet_id.encode()).hexdigest() + ".json")
+
+    @staticmethod
+    def _stamp(stat: os.stat_result) -> typing.Tuple:
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # Changes of all the workers go one at a time, so they all count the same fleets
+        import fcntl
+
+        with self._lock, open(os.path.join(self.directory, ".lock"), "a") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            yield
+
+    def get(self, fleet_id: str) -> typing.Optional[Fleet]:
+        try:
+            stream = open(self._path(fleet_id), "r")
+        except FileNotFoundError:
+            self._fleets.pop(fleet_id, None)
+            return None
+        with stream:
+            stamp = self._stamp(os.fstat(stream.fileno()))
+            cached = self._fleets.get(fleet_id)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            fleet = Fleet(json.load(stream)["powerplants"])
+        self._fleets[fleet_id] = (stamp, fleet)
+        return fleet
+
+    def put(self, fleet_id: str, fleet: Fleet) -> bool:
+        """
+        Stores the fleet, replacing any previous one with the same id
+        :param fleet_id:
+        :param fleet:
+        :return: False when the registry is full, so the fleet was not stored
+        """
+        path = self._path(fleet_id)
+        with self._locked():
+            if not os.path.exists(path) and len(self) >= self.max_fleets:
+                return False
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(descriptor, "w") as stream:
+                    json.dump({"fleet_id": fleet_id, "powerplants": fleet.plants()}, stream)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+            self._fleets[fleet_id] = (self._stamp(os.stat(path)), fleet)
+            return True
+
+    def delete(self, fleet_id: str) -> bool:
+        with self._locked():
+            self._fleets.pop(fleet_id, None)
+            try:
+                os.unlink(self._path(fleet_id))
+            except FileNotFoundError:
+                return False
+            return True
+
+
+@lru_cache(maxsize=1)
+def get_fleet_registry() -> typing.Union[FleetRegistry, SharedFleetRegistry]:
+    settings = get_app_settings()
+    # Several workers must share their fleets, so each of them can dispatch the ones registered on the others
+    if settings.fleet_registry_dir:
+        return SharedFleetRegistry(settings.fleet_registry_dir, max_fleets=settings.fleet_registry_max_fleets)
+    return FleetRegistry(max_fleets=settings.fleet_registry_max_fleets)
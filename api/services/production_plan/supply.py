@@ -0,0 +1,129 @@
+import typing
+import numpy as np
+from functools import lru_cache
+from api.core.cache import LRUCache
+from api.settings import get_app_settings
+from api.services.production_plan import dispatch
+
+
+class SupplyCurve:
+    """
+    Merit order of a fleet for a given set of fuel prices, kept as the cumulative max generation of the plants.
+
+    The plan for any load is then found with binary searches instead of going through every plant: the
+    cumulative generation gives the plants fully used, and when a plant can't take the remaining load because of
+    its pmin, the next one fitting it is found on the block minimums of the lowest generation of each plant. Only
+    the plants around those positions are calculated one by one.
+    """
+
+    def __init__(self, names: typing.List[str], pmax_generated: np.ndarray, pmin_generated: np.ndarray):
+        self.names = names
+        self.pmax_generated = pmax_generated
+        self.pmin_generated = pmin_generated
+        self.cum_pmax = np.cumsum(pmax_generated)
+        # Binary searches need a non decreasing cumulative generation
+        self.monotone = bool((pmax_generated >= 0).all() and np.isfinite(pmin_generated).all())
+
+        # Minimum of the lowest generation each plant can enter the grid with, over blocks of 1, 2, 4... plants
+        self._lowest_blocks = [np.minimum(pmax_generated, pmin_generated)]
+        width = 1
+        while width * 2 <= len(names):
+            previous = self._lowest_blocks[-1]
+            self._lowest_blocks.append(np.minimum(previous[:-width], previous[width:]))
+            width *= 2
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def next_fitting(self, start: int, remaining: float) -> int:
+        """
+        Returns the position of the first plant from `start` on that can take part of the remaining load, or
+        the number of plants if there is none
+        :param start:
+        :param remaining:
+        :return:
+        """
+        position = start
+        for level in reversed(range(len(self._lowest_blocks))):
+            blocks = self._lowest_blocks[level]
+            if position < len(blocks) and blocks[position] > remaining:
+                position += 1 << level
+        return position
+
+    def usage(self, load: float) -> np.ndarray:
+        """
+        Calculates the power used from each plant, in merit order, for the given load. Results are the same as the
+        ones of `dispatch.remaining_load` and `dispatch.plant_usage`, bit-for-bit.
+        :param load:
+        :return:
+        """
+        pmax_generated, pmin_generated, cum_pmax = self.pmax_generated, self.pmin_generated, self.cum_pmax
+        size = len(self)
+        if not size or not self.monotone:
+            remaining = dispatch.remaining_load(pmax_generated, pmin_generated, load)
+            return dispatch.plant_usage(pmax_generated, pmin_generated, remaining, load)
+
+        usage = np.zeros(size, dtype=float)
+        # First plant is a 0-cost one, so it does not check for the min power generated. It's always accounted as
+        # fully used for the remaining load, though.
+        if load - pmax_generated[0] >= pmax_generated[0]:
+            usage[0] = pmax_generated[0]
+        elif load <= pmax_generated[0]:
+            usage[0] = load
+
+        start, remaining = 1, load - pmax_generated[0]
+        while start < size and remaining > 0:
+            # The cumulative generation tells where the remaining load runs out. Float rounding may move that by a
+            # plant, so a couple more are checked with the same chained subtractions as the row by row calculation.
+            guess = int(np.searchsorted(cum_pmax, cum_pmax[start - 1] + remaining, side="right"))
+            stop = min(max(guess + 2, start + 1), size)
+            pmax_window, pmin_window = pmax_generated[start:stop], pmin_generated[start:stop]
+            before = np.subtract.accumulate(np.concatenate(([remaining], pmax_window)))[:-1]
+            partial = (pmax_window > before) & (before > 0)
+            found = bool(partial.any())
+            if found:
+                # Up to the first plant not fully used
+                count = int(partial.argmax()) + 1
+                stop, before = start + count, before[:count]
+                pmax_window, pmin_window = pmax_window[:count], pmin_window[:count]
+            usage[start:stop] = np.where(
+                before >= pmax_window,
+                pmax_window,
+                np.where((before >= 0) & (before >= pmin_window), before, 0.0),
+            )
+            if not found:
+                start, remaining = stop, before[-1] - pmax_window[-1]
+                continue
+            if usage[stop - 1] > 0:
+                # The plant takes all the remaining load
+                break
+            # The plant is skipped because of its pmin, and so are the next ones until one fits the remaining load
+            start, remaining = self.next_fitting(stop, before[-1]), before[-1]
+        return usage
+
+    def dispatch(self, load: float) -> typing.List[typing.Dict]:
+        return dispatch.as_result(self.names, self.usage(load))
+
+    def sweep(self, loads: np.ndarray) -> np.ndarray:
+        """
+        Calculates the power used from each plant, in merit order, for each of the given loads, as a plants x loads
+        matrix. All the loads move along the merit order together, in a single pass over the plants, with the same
+        results as `usage` for each of them.
+        :param loads:
+        :return:
+        """
+        shape = (len(self), len(loads))
+        pmax_generated = np.broadcast_to(self.pmax_generated[:, None], shape)
+        pmin_generated = np.broadcast_to(self.pmin_generated[:, None], shape)
+        remaining = dispatch.remaining_load(pmax_generated, pmin_generated, loads)
+        return dispatch.plant_usage(pmax_generated, pmin_generated, remaining, loads)
+
+
+@lru_cache(maxsize=1)
+def get_supply_curve_cache() -> LRUCache:
+    """
+    Returns the cache of supply curves, by fleet and fuel prices. They don't expire, least recently used ones are
+    evicted first.
+    :return:
+    """
+    return LRUCache(maxsize=get_app_settings().supply_curve_cache_size, ttl=float("inf"))
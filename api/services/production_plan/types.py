@@ -1,6 +1,7 @@
 import logging
-from typing import Dict, List
-from pydantic import BaseModel, validator
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, root_validator, validator
+from api.services.production_plan.uncertainty import DISTRIBUTIONS
 
 
 logger = logging.getLogger("api.services.production_plan.types")
@@ -32,6 +33,168 @@ class PowerPlantPayload(BaseModel):
     powerplants: List[PowerPlant]
 
 
+class TimeSeriesPowerPlantPayload(BaseModel):
+    load: List[int]
+    fuels: Dict[str, Union[float, List[float]]]
+    powerplants: List[PowerPlant]
+
+    @validator("load")
+    def check_load_has_intervals(cls, v):
+        if not v:
+            raise ValueError("At least one load interval is required")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def check_fuels_match_intervals(cls, values):
+        intervals = len(values["load"])
+        for key, value in values["fuels"].items():
+            if isinstance(value, list) and len(value) != intervals:
+                raise ValueError(f"Fuel '{key}' has {len(value)} values, but there are {intervals} load intervals")
+        return values
+
+
+class FleetPayload(BaseModel):
+    powerplants: List[PowerPlant]
+
+
+class RegisteredFleetPayload(BaseModel):
+    fleet_id: str
+    powerplants: int
+
+
+class FleetPowerPlantPayload(BaseModel):
+    fleet_id: str
+    load: int
+    fuels: Dict
+
+
+class SupplyStackPayload(BaseModel):
+    fuels: Dict
+    powerplants: List[PowerPlant]
+    load_min: int = 0
+    load_max: Optional[int] = None
+    step: Optional[int] = None
+
+    @validator("step")
+    def check_step_is_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("Load step must be bigger than 0")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def check_load_range(cls, values):
+        if values["load_max"] is not None and values["load_max"] < values["load_min"]:
+            raise ValueError("load_max can not be lower than load_min")
+        return values
+
+
+class StackPlantPayload(BaseModel):
+    name: str
+    type: str
+    cost: float
+    pmin_generated: float
+    pmax_generated: float
+    capacity: float
+
+
+class SweepPointPayload(BaseModel):
+    load: int
+    marginal_price: Optional[float]
+    served: float
+    cost: float
+    p: List[int]
+
+
+class SupplyStackResultPayload(BaseModel):
+    capacity: float
+    stack: List[StackPlantPayload]
+    points: List[SweepPointPayload]
+
+
+class FuelDistributionPayload(BaseModel):
+    distribution: Optional[str] = None
+    values: Optional[List[float]] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+
+    @root_validator(skip_on_failure=True)
+    def check_distribution_parameters(cls, values):
+        if values["values"] is not None:
+            return values
+        distribution = values["distribution"]
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Either explicit values or a distribution among {', '.join(DISTRIBUTIONS)} is required")
+        missing = [name for name in DISTRIBUTIONS[distribution] if values[name] is None]
+        if missing:
+            raise ValueError(f"Missing parameters of the {distribution} distribution: {', '.join(missing)}")
+        if values["std"] is not None and values["std"] < 0:
+            raise ValueError("Standard deviation can not be negative")
+        if values["low"] is not None and values["high"] is not None and values["low"] > values["high"]:
+            raise ValueError("low can not be bigger than high")
+        if distribution == "triangular" and not values["low"] <= values["mode"] <= values["high"]:
+            raise ValueError("mode must be between low and high")
+        return values
+
+
+class MonteCarloPayload(BaseModel):
+    load: int
+    fuels: Dict
+    powerplants: List[PowerPlant]
+    uncertainty: Dict[str, FuelDistributionPayload]
+    samples: int = 1000
+    seed: Optional[int] = None
+    percentiles: List[float] = [10, 50, 90]
+
+    @validator("samples")
+    def check_samples_is_positive(cls, v):
+        if v <= 0:
+            raise ValueError("At least one sample is required")
+        return v
+
+    @validator("seed")
+    def check_seed_not_below_zero(cls, v):
+        if v is not None and v < 0:
+            raise ValueError("Seed can not be negative")
+        return v
+
+    @validator("percentiles")
+    def check_percentiles_range(cls, v):
+        if not v or not all(0 <= percentile <= 100 for percentile in v):
+            raise ValueError("Percentiles must be between 0 and 100")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def check_values_match_samples(cls, values):
+        samples = values["samples"]
+        for key, spec in values["uncertainty"].items():
+            if spec.values is not None and len(spec.values) != samples:
+                raise ValueError(f"Fuel '{key}' has {len(spec.values)} values, but there are {samples} samples")
+        return values
+
+
+class StatisticsPayload(BaseModel):
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]
+
+
+class PlantStatisticsPayload(StatisticsPayload):
+    name: str
+
+
+class MonteCarloResultPayload(BaseModel):
+    samples: int
+    seed: int
+    cost: StatisticsPayload
+    served: StatisticsPayload
+    powerplants: List[PlantStatisticsPayload]
+
+
 class PerPlanCalculationsPayload(BaseModel):
     name: str
     p: int
@@ -39,3 +202,15 @@ class PerPlanCalculationsPayload(BaseModel):
 
 class CalculationsPayload(BaseModel):
     data: List[PerPlanCalculationsPayload]
+
+
+class ScenarioErrorPayload(BaseModel):
+    responseType: str
+    code: str
+    message: str
+    detail: Optional[List[Dict]] = None
+
+
+class ScenarioResultPayload(BaseModel):
+    result: Optional[List[PerPlanCalculationsPayload]] = None
+    error: Optional[ScenarioErrorPayload] = None
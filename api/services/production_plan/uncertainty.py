@@ -0,0 +1,64 @@
+import typing
+import numpy as np
+
+
+# Distributions the uncertain fuels can be sampled from, with the parameters each of them needs
+DISTRIBUTIONS: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "normal": ("mean", "std"),
+    "uniform": ("low", "high"),
+    "triangular": ("low", "mode", "high"),
+}
+
+
+def new_seed() -> int:
+    # Random seed for requests not giving one, returned to them so their samples can be drawn again
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def sample_fuels(
+    uncertainty: typing.Dict[str, typing.Dict], samples: int, seed: int
+) -> typing.Dict[str, np.ndarray]:
+    """
+    Draws the samples of the uncertain fuels. Fuels are sampled in order of their key, so the same seed always gives
+    the same samples, whatever the order they were given in.
+
+    Each fuel has either explicit `values`, used as they are, or a `distribution` with its parameters. Normal samples
+    are clipped to `low` and `high` when given, e.g. to keep wind percentages within 0 and 100.
+    :param uncertainty: Distribution of each uncertain fuel, by fuel key
+    :param samples: Number of samples
+    :param seed:
+    :return: Samples of each fuel
+    """
+    rng = np.random.default_rng(seed)
+    sampled = {}
+    for key in sorted(uncertainty):
+        spec = uncertainty[key]
+        if spec.get("values") is not None:
+            sampled[key] = np.asarray(spec["values"], dtype=float)
+        elif spec["distribution"] == "normal":
+            values = rng.normal(spec["mean"], spec["std"], samples)
+            if spec.get("low") is not None or spec.get("high") is not None:
+                values = np.clip(values, spec.get("low"), spec.get("high"))
+            sampled[key] = values
+        elif spec["distribution"] == "uniform":
+            sampled[key] = rng.uniform(spec["low"], spec["high"], samples)
+        else:
+            sampled[key] = rng.triangular(spec["low"], spec["mode"], spec["high"], samples)
+    return sampled
+
+
+def statistics(values: np.ndarray, percentiles: typing.Sequence[float]) -> typing.Dict[str, typing.Any]:
+    """
+    Summarizes samples along their last axis
+    :param values: Samples, or a matrix with the samples of something on each row
+    :param percentiles: Percentiles to calculate, from 0 to 100
+    :return: Mean, standard deviation, min, max and percentiles, keyed `p<percentile>`, of the values or of each row
+    """
+    bands = np.percentile(values, percentiles, axis=-1)
+    return {
+        "mean": values.mean(axis=-1).tolist(),
+        "std": values.std(axis=-1).tolist(),
+        "min": values.min(axis=-1).tolist(),
+        "max": values.max(axis=-1).tolist(),
+        "percentiles": {f"p{percentile:g}": band.tolist() for percentile, band in zip(percentiles, bands)},
+    }
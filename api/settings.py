@@ -11,11 +11,71 @@ LISTEN_HOST: str = os.getenv("HOST", "127.0.0.1")
 LISTEN_PORT: int = int(os.getenv("PORT", 8888))
 BASE_URL: str = f"http://{LISTEN_HOST}:{LISTEN_PORT}"
 
+# Serving
+SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", 1))
+SERVER_CPU_AFFINITY: bool = True if os.getenv("SERVER_CPU_AFFINITY", "False").upper() in ("TRUE", "1") else False
+SERVER_READY_TIMEOUT: float = float(os.getenv("SERVER_READY_TIMEOUT", 60))
+SERVER_SHUTDOWN_TIMEOUT: float = float(os.getenv("SERVER_SHUTDOWN_TIMEOUT", 30))
+
 # Debug and Logging format
 DEBUG: bool = True if os.getenv("DEBUG", "False").upper() in ("TRUE", "1") else False
 LOG_FORMAT: str = "%(asctime)s - %(levelname)s - %(name)s:%(filename)s:%(lineno)d - %(message)s"
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
+# Startup
+WARM_UP_ENABLED: bool = True if os.getenv("WARM_UP_ENABLED", "True").upper() in ("TRUE", "1") else False
+WARM_UP_SIZE: int = int(os.getenv("WARM_UP_SIZE", 100))
+
+# Metrics
+METRICS_ENABLED: bool = True if os.getenv("METRICS_ENABLED", "True").upper() in ("TRUE", "1") else False
+
+# Tracing
+TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", 0))
+TRACE_HISTORY_SIZE: int = int(os.getenv("TRACE_HISTORY_SIZE", 100))
+
+# Production plan calculations
+DISPATCH_ENGINE: str = os.getenv("DISPATCH_ENGINE", "numpy")
+CO2_ADJUSTED_COSTS: bool = True if os.getenv("CO2_ADJUSTED_COSTS", "False").upper() in ("TRUE", "1") else False
+FAST_INGESTION: bool = True if os.getenv("FAST_INGESTION", "True").upper() in ("TRUE", "1") else False
+BATCH_MAX_SCENARIOS: int = int(os.getenv("BATCH_MAX_SCENARIOS", 1000))
+SUPPLY_STACK_MAX_POINTS: int = int(os.getenv("SUPPLY_STACK_MAX_POINTS", 10000))
+MONTE_CARLO_MAX_SAMPLES: int = int(os.getenv("MONTE_CARLO_MAX_SAMPLES", 10000))
+MONTE_CARLO_MEMORY_MB: int = int(os.getenv("MONTE_CARLO_MEMORY_MB", 64))
+EXACT_SOLVER_MAX_NODES: int = int(os.getenv("EXACT_SOLVER_MAX_NODES", 200000))
+EXACT_SOLVER_TIME_BUDGET_MS: int = int(os.getenv("EXACT_SOLVER_TIME_BUDGET_MS", 100))
+
+# Production plan requests micro-batching
+BATCHING_ENABLED: bool = True if os.getenv("BATCHING_ENABLED", "False").upper() in ("TRUE", "1") else False
+BATCHING_WINDOW_MS: float = float(os.getenv("BATCHING_WINDOW_MS", 2))
+BATCHING_MAX_SIZE: int = int(os.getenv("BATCHING_MAX_SIZE", 64))
+
+# Production plan results cache
+RESULT_CACHE_ENABLED: bool = True if os.getenv("RESULT_CACHE_ENABLED", "True").upper() in ("TRUE", "1") else False
+RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", 60))
+ETAG_ENABLED: bool = True if os.getenv("ETAG_ENABLED", "True").upper() in ("TRUE", "1") else False
+
+# Registered fleets
+FLEET_REGISTRY_MAX_FLEETS: int = int(os.getenv("FLEET_REGISTRY_MAX_FLEETS", 100))
+FLEET_REGISTRY_DIR: str = os.getenv("FLEET_REGISTRY_DIR", "")
+SUPPLY_CURVE_CACHE_SIZE: int = int(os.getenv("SUPPLY_CURVE_CACHE_SIZE", 256))
+
+# Calculations executor
+EXECUTOR_INLINE_MAX_SIZE: int = int(os.getenv("EXECUTOR_INLINE_MAX_SIZE", 20))
+EXECUTOR_PROCESS_MIN_SIZE: int = int(os.getenv("EXECUTOR_PROCESS_MIN_SIZE", 5000))
+EXECUTOR_THREAD_WORKERS: int = int(os.getenv("EXECUTOR_THREAD_WORKERS", 0))
+EXECUTOR_PROCESS_WORKERS: int = int(os.getenv("EXECUTOR_PROCESS_WORKERS", 0))
+ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 0))
+ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", 100))
+ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+# Compression
+COMPRESSION_ENABLED: bool = True if os.getenv("COMPRESSION_ENABLED", "True").upper() in ("TRUE", "1") else False
+REQUEST_MAX_DECOMPRESSED_MB: int = int(os.getenv("REQUEST_MAX_DECOMPRESSED_MB", 64))
+RESPONSE_COMPRESSION_MIN_SIZE: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+RESPONSE_ZSTD_LEVEL: int = int(os.getenv("RESPONSE_ZSTD_LEVEL", 3))
+
 
 # Load in an environment specific config file the build process maps environment variables
 env_config_file = os.getenv("CFG_FILE", "config/dev.json")
@@ -33,11 +93,71 @@ class AppSettings(BaseSettings):
     listen_port: int = LISTEN_PORT
     base_url: str = BASE_URL
 
+    # Serving
+    server_workers: int = SERVER_WORKERS
+    server_cpu_affinity: bool = SERVER_CPU_AFFINITY
+    server_ready_timeout: float = SERVER_READY_TIMEOUT
+    server_shutdown_timeout: float = SERVER_SHUTDOWN_TIMEOUT
+
     # Debug and Logging format
     debug: bool = DEBUG
     log_format: str = LOG_FORMAT
     log_level: str = LOG_LEVEL
 
+    # Startup
+    warm_up_enabled: bool = WARM_UP_ENABLED
+    warm_up_size: int = WARM_UP_SIZE
+
+    # Metrics
+    metrics_enabled: bool = METRICS_ENABLED
+
+    # Tracing
+    trace_sample_rate: float = TRACE_SAMPLE_RATE
+    trace_history_size: int = TRACE_HISTORY_SIZE
+
+    # Production plan calculations
+    dispatch_engine: str = DISPATCH_ENGINE
+    co2_adjusted_costs: bool = CO2_ADJUSTED_COSTS
+    fast_ingestion: bool = FAST_INGESTION
+    batch_max_scenarios: int = BATCH_MAX_SCENARIOS
+    supply_stack_max_points: int = SUPPLY_STACK_MAX_POINTS
+    monte_carlo_max_samples: int = MONTE_CARLO_MAX_SAMPLES
+    monte_carlo_memory_mb: int = MONTE_CARLO_MEMORY_MB
+    exact_solver_max_nodes: int = EXACT_SOLVER_MAX_NODES
+    exact_solver_time_budget_ms: int = EXACT_SOLVER_TIME_BUDGET_MS
+
+    # Production plan requests micro-batching
+    batching_enabled: bool = BATCHING_ENABLED
+    batching_window_ms: float = BATCHING_WINDOW_MS
+    batching_max_size: int = BATCHING_MAX_SIZE
+
+    # Production plan results cache
+    result_cache_enabled: bool = RESULT_CACHE_ENABLED
+    result_cache_size: int = RESULT_CACHE_SIZE
+    result_cache_ttl: float = RESULT_CACHE_TTL
+    etag_enabled: bool = ETAG_ENABLED
+
+    # Registered fleets
+    fleet_registry_max_fleets: int = FLEET_REGISTRY_MAX_FLEETS
+    fleet_registry_dir: str = FLEET_REGISTRY_DIR
+    supply_curve_cache_size: int = SUPPLY_CURVE_CACHE_SIZE
+
+    # Calculations executor
+    executor_inline_max_size: int = EXECUTOR_INLINE_MAX_SIZE
+    executor_process_min_size: int = EXECUTOR_PROCESS_MIN_SIZE
+    executor_thread_workers: int = EXECUTOR_THREAD_WORKERS
+    executor_process_workers: int = EXECUTOR_PROCESS_WORKERS
+    admission_max_concurrency: int = ADMISSION_MAX_CONCURRENCY
+    admission_max_queue: int = ADMISSION_MAX_QUEUE
+    admission_retry_after: int = ADMISSION_RETRY_AFTER
+
+    # Compression
+    compression_enabled: bool = COMPRESSION_ENABLED
+    request_max_decompressed_mb: int = REQUEST_MAX_DECOMPRESSED_MB
+    response_compression_min_size: int = RESPONSE_COMPRESSION_MIN_SIZE
+    response_gzip_level: int = RESPONSE_GZIP_LEVEL
+    response_zstd_level: int = RESPONSE_ZSTD_LEVEL
+
     services = [
         "api.services.production_plan",
     ]
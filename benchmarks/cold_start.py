@@ -0,0 +1,124 @@
+"""
+Cold start of the API: import time of its modules, time to create the app and warm it up, and latency of the first
+`/productionplan` request compared to the following ones, with and without warm-up.
+
+Run with `python -m benchmarks.cold_start`, see `--help` for the options. Every measure is taken on a new
+interpreter, so nothing is imported beforehand. Exits with an error when the import of the API goes over its budget,
+or when any of the modules it should only import on first use gets imported at startup.
+"""
+import sys
+import json
+import time
+import typing
+import argparse
+import subprocess
+
+
+# Maximum time to import the API, in milliseconds
+IMPORT_BUDGET_MS = 800
+# Modules only needed by some requests, which must not be imported when creating the app
+DEFERRED_MODULES = ["pandas", "msgpack", "pyarrow", "zstandard"]
+SIZE = 1000
+RUNS = 20
+
+
+def import_times(module: str) -> typing.List[typing.Dict]:
+    """
+    Imports the module on a new interpreter, with `-X importtime`
+    :param module:
+    :return: Self and cumulative import time of each module imported, in milliseconds, slowest first
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in process.stderr.splitlines():
+        # e.g. "import time:       468 |     242850 |   fastapi"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append({"module": name.strip(), "self_ms": int(own) / 1000, "cumulative_ms": int(cumulative) / 1000})
+    return sorted(times, key=lambda item: item["cumulative_ms"], reverse=True)
+
+
+def startup(warm_up: bool, size: int = SIZE, runs: int = RUNS) -> typing.Dict:
+    """
+    Creates the app and sends it requests, to be run on a new interpreter
+    :param warm_up: Whether to warm up the app before the first request
+    :param size: Plants of the requests fleet
+    :param runs: Requests sent after the first one
+    :return:
+    """
+    import numpy as np
+    from benchmarks.suite import ASGIClient, payloads
+
+    start = time.perf_counter()
+    from api import create_app
+    from api.core.readiness import get_readiness
+
+    imported = time.perf_counter()
+    client = ASGIClient(create_app(testing=True))
+    created = time.perf_counter()
+    deferred = [module for module in DEFERRED_MODULES if module in sys.modules]
+    if warm_up:
+        get_readiness().warm_up()
+    warmed_up = time.perf_counter()
+
+    timings = []
+    for body in [json.dumps(item).encode() for item in payloads(size, 0, runs + 1)]:
+        request_start = time.perf_counter()
+        status, content = client.post("/productionplan", body)
+        if status != 200:
+            raise RuntimeError(f"Unexpected {status} response: {content[:200]!r}")
+        timings.append(time.perf_counter() - request_start)
+    client.close()
+
+    return {
+        "import_ms": (imported - start) * 1000,
+        "create_app_ms": (created - imported) * 1000,
+        "warm_up_ms": (warmed_up - created) * 1000,
+        "first_request_ms": timings[0] * 1000,
+        "p50_ms": float(np.percentile(timings[1:], 50)) * 1000,
+        "deferred_modules_imported": deferred,
+    }
+
+
+def run_startup(warm_up: bool, size: int, runs: int) -> typing.Dict:
+    code = f"import json; from benchmarks.cold_start import startup; print(json.dumps(startup({warm_up}, {size}, {runs})))"
+    process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main(args: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.cold_start", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("--size", type=int, default=SIZE, help="Plants of the requests fleet")
+    parser.add_argument("--runs", type=int, default=RUNS, help="Requests sent after the first one")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    options = parser.parse_args(args)
+
+    times = import_times("api")
+    report = {
+        "import": {
+            "total_ms": next(item["cumulative_ms"] for item in times if item["module"] == "api"),
+            "slowest": times[: options.top],
+        },
+        "cold": run_startup(False, options.size, options.runs),
+        "warm": run_startup(True, options.size, options.runs),
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["import"]["total_ms"] > options.import_budget_ms:
+        failures.append(f"Importing the API took {report['import']['total_ms']:.0f} ms")
+    for module in report["cold"]["deferred_modules_imported"]:
+        failures.append(f"{module} is imported at startup")
+    for failure in failures:
+        print(f"Over budget: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import random
+import typing
+
+
+# Plant templates per type: efficiencies, and pmin / pmax ranges
+PLANT_TYPES = {
+    "gasfired": {"efficiency": (0.35, 0.6), "pmin": (20, 150), "pmax": (150, 500)},
+    "turbojet": {"efficiency": (0.25, 0.35), "pmin": (0, 0), "pmax": (10, 50)},
+    "windturbine": {"efficiency": (1.0, 1.0), "pmin": (0, 0), "pmax": (20, 200)},
+}
+
+
+def generate_payload(size: int, seed: int = 0, load_ratio: float = 0.6) -> typing.Dict:
+    """
+    Generates a production plan payload with a fleet of the given size. The same seed always gives the
+    same payload.
+    :param size: Number of plants
+    :param seed:
+    :param load_ratio: Required load, as a ratio of the total fleet capacity
+    :return:
+    """
+    rnd = random.Random(seed)
+    plants = []
+    for i in range(size):
+        plant_type = rnd.choice(list(PLANT_TYPES))
+        template = PLANT_TYPES[plant_type]
+        pmin = rnd.randint(*template["pmin"])
+        plants.append(
+            {
+                "name": f"{plant_type}{i}",
+                "type": plant_type,
+                "efficiency": round(rnd.uniform(*template["efficiency"]), 2),
+                "pmin": pmin,
+                "pmax": max(pmin, rnd.randint(*template["pmax"])),
+            }
+        )
+    return {
+        "load": int(sum(plant["pmax"] for plant in plants) * load_ratio * 0.5),
+        "fuels": {
+            "gas(euro/MWh)": round(rnd.uniform(10, 30), 1),
+            "kerosine(euro/MWh)": round(rnd.uniform(40, 60), 1),
+            "co2(euro/ton)": 20,
+            "wind(%)": rnd.randint(0, 100),
+        },
+        "powerplants": plants,
+    }
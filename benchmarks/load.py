@@ -0,0 +1,440 @@
+"""
+Load test of the API served on localhost, so the measures include the whole stack: the server, the validation, the
+exception handlers and the offload of the calculations.
+
+Run with `python -m benchmarks.load`, see `--help` for the options. The API is started on a free port, from
+`api:create_app` or `main.py`, and driven at each concurrency level with a weighted mix of the test datasets and
+synthetic fleets, along with invalid payloads. Results are printed as JSON, and can be compared against a stored
+baseline, exiting with an error when any level got slower, served fewer requests per second than allowed, or got any
+unexpected response.
+
+The API is started with its result cache and entity tags disabled, so every request is parsed, validated and
+calculated instead of answered from the cache.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import random
+import socket
+import typing
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.parse
+import numpy as np
+from benchmarks.fleets import generate_payload
+
+
+CONCURRENCY = [1, 8, 32]
+# Seconds each concurrency level is measured, after its warm-up
+DURATION = 10
+WARM_UP = 1
+DATASETS_PATH = "tests/datasets"
+# Sources of the requests, with their weight in the mix
+MIX = "datasets=1,synthetic:100=1,synthetic:1000=1,invalid=0.2"
+# Synthetic payloads of each size, with different loads so micro-batches mix different scenarios
+VARIANTS = 16
+# Settings of the API started, so requests go through the whole calculation instead of the result cache
+SERVER_SETTINGS = {"RESULT_CACHE_ENABLED": "False", "ETAG_ENABLED": "False"}
+BASELINE_PATH = "benchmarks/load_baseline.json"
+# Relative change of latency and throughput over the baseline considered a regression
+TOLERANCE = 0.25
+PERCENTILES = [50, 90, 99]
+READY_TIMEOUT = 60
+
+
+def parse_mix(mix: str) -> typing.List[typing.Tuple[str, float]]:
+    """
+    Parses a payload mix, e.g. `datasets=2,synthetic:1000=1`. Sources are `datasets` for all the test datasets,
+    `dataset:<name>` for one of them, `synthetic:<plants>` for generated fleets of that size, and `invalid` for
+    payloads the API must reject with a 4xx response.
+    :param mix:
+    :return: Each source with its weight
+    """
+    sources = []
+    for item in mix.split(","):
+        source, _, weight = item.strip().partition("=")
+        sources.append((source, float(weight) if weight else 1.0))
+    return sources
+
+
+def source_bodies(source: str, seed: int) -> typing.List[bytes]:
+    kind, _, arg = source.partition(":")
+    if kind == "datasets":
+        paths = sorted(glob.glob(os.path.join(DATASETS_PATH, "*.json")))
+    elif kind == "dataset":
+        paths = [os.path.join(DATASETS_PATH, f"{arg}.json")]
+    elif kind == "synthetic":
+        data = generate_payload(int(arg), seed=seed)
+        return [json.dumps(dict(data, load=data["load"] + variant)).encode() for variant in range(VARIANTS)]
+    elif kind == "invalid":
+        return invalid_bodies(seed)
+    else:
+        raise ValueError(f"Unknown payload source '{source}'")
+    bodies = []
+    for path in paths:
+        with open(path, "rb") as f:
+            bodies.append(f.read())
+    return bodies
+
+
+class Connection:
+    """
+    Minimal keep-alive HTTP/1.1 client, so the load generator costs as little as possible next to the API
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: typing.Optional[asyncio.StreamReader] = None
+        self.writer: typing.Optional[asyncio.StreamWriter] = None
+
+    async def request(
+        self, method: str, path: str, body: bytes = b"", content_type: str = "application/json"
+    ) -> typing.Tuple[int, bytes]:
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        try:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.writer.write(head.encode() + body)
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            content = await self._read_body(headers)
+        except (OSError, IndexError, ValueError, asyncio.IncompleteReadError):
+            self.close()
+            raise ConnectionError(f"{method} {path} failed")
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, content
+
+    async def _read_body(self, headers: typing.Dict[str, str]) -> bytes:
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"]))
+        if headers.get("transfer-encoding", "").lower() != "chunked":
+            return b""
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            chunk = await self.reader.readexactly(size + 2)
+            if not size:
+                return b"".join(chunks)
+            chunks.append(chunk[:-2])
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader, self.writer = None, None
+
+
+def invalid_bodies(seed: int) -> typing.List[bytes]:
+    # Payloads failing the parsing, the validation and the calculations, so the load goes through the error handlers
+    data = generate_payload(100, seed=seed)
+    plants = data["powerplants"]
+    fuels = {key: value for key, value in data["fuels"].items() if key != "gas(euro/MWh)"}
+    return [
+        json.dumps(data).encode()[:-10],
+        json.dumps({key: value for key, value in data.items() if key != "load"}).encode(),
+        json.dumps(dict(data, powerplants=[dict(plants[0], efficiency=1.5), *plants[1:]])).encode(),
+        json.dumps(dict(data, fuels=fuels)).encode(),
+    ]
+
+
+def failed(source: str, status: int) -> bool:
+    # Invalid payloads must be rejected as client errors, any other request must succeed
+    if source == "invalid":
+        return not 400 <= status < 500
+    return not 200 <= status < 300
+
+
+def free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, host: str, port: int, config: str, log, cache: bool = False) -> subprocess.Popen:
+    """
+    Starts the API on a new process
+    :param app: `main` to run `main.py`, as in production, otherwise the app factory given to uvicorn
+    :param host:
+    :param port:
+    :param config: Config file of the API, none by default so the development one does not enable the reload
+    :param log: File the API output goes to
+    :param cache: Keep the result cache and entity tags the API has by default
+    :return:
+    """
+    env = dict(os.environ, HOST=host, PORT=str(port), CFG_FILE=config)
+    if not cache:
+        env.update(SERVER_SETTINGS)
+    if app == "main":
+        command = [sys.executable, "main.py"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", app, "--factory", "--host", host, "--port", str(port)]
+        command += ["--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(host: str, port: int, process: typing.Optional[subprocess.Popen], timeout: float) -> None:
+    # The API answers `/ready` once warmed up
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode} before getting ready")
+        connection = Connection(host, port)
+        try:
+            status, _ = await connection.request("GET", "/ready")
+            if status == 200:
+                return
+        except ConnectionError:
+            pass
+        finally:
+            connection.close()
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"API not ready after {timeout} s")
+
+
+async def drive(
+    host: str,
+    port: int,
+    path: str,
+    mix: typing.List[typing.Tuple[str, typing.List[bytes], float]],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> typing.List[typing.Tuple[str, float, int]]:
+    """
+    Sends requests from `concurrency` clients, each one waiting for its response before sending the next one
+    :param host:
+    :param port:
+    :param path: Path the requests are posted to
+    :param mix: Name, bodies and weight of each source of payloads
+    :param concurrency:
+    :param duration: Seconds to keep sending requests
+    :param seed:
+    :return: Source, latency in seconds and status of each request, 0 for the ones that got no response
+    """
+    deadline = time.monotonic() + duration
+    weights = [weight for _, _, weight in mix]
+    samples: typing.List[typing.Tuple[str, float, int]] = []
+
+    async def client(number: int):
+        rnd = random.Random(seed * 1000 + number)
+        connection = Connection(host, port)
+        try:
+            while time.monotonic() < deadline:
+                name, bodies, _ = rnd.choices(mix, weights)[0]
+                body = rnd.choice(bodies)
+                start = time.perf_counter()
+                try:
+                    status, _ = await connection.request("POST", path, body)
+                except ConnectionError:
+                    status = 0
+                samples.append((name, time.perf_counter() - start, status))
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    return samples
+
+
+def latencies(timings: typing.List[float]) -> typing.Dict[str, float]:
+    milliseconds = np.array(timings) * 1000
+    summary = {f"p{percentile}_ms": float(np.percentile(milliseconds, percentile)) for percentile in PERCENTILES}
+    summary.update({"mean_ms": float(milliseconds.mean()), "max_ms": float(milliseconds.max())})
+    return summary
+
+
+def summarize(samples: typing.List[typing.Tuple[str, float, int]], duration: float) -> typing.Dict:
+    """
+    Summarizes the requests of a concurrency level
+    :param samples: As returned by `drive`
+    :param duration: Seconds the requests were sent for
+    :return: Throughput, errors and latency percentiles, overall and of each source. Errors are the unexpected
+    responses, see `failed`.
+    """
+    if not samples:
+        return {"requests": 0, "errors": 0, "throughput_per_s": 0.0}
+    summary = {
+        "requests": len(samples),
+        "errors": sum(1 for source, _, status in samples if failed(source, status)),
+        "throughput_per_s": len(samples) / duration,
+        **latencies([latency for _, latency, _ in samples]),
+        "sources": {},
+    }
+    for name in dict.fromkeys(name for name, _, _ in samples):
+        timings = [latency for source, latency, _ in samples if source == name]
+        summary["sources"][name] = {"requests": len(timings), **latencies(timings)}
+    return summary
+
+
+async def run_levels(
+    host: str,
+    port: int,
+    path: str,
+    mix: typing.List[typing.Tuple[str, typing.List[bytes], float]],
+    levels: typing.List[int],
+    duration: float,
+    warm_up: float,
+    seed: int,
+) -> typing.Dict[str, typing.Dict]:
+    results = {}
+    for concurrency in levels:
+        # Connections are opened and the API pools started before measuring
+        await drive(host, port, path, mix, concurrency, warm_up, seed)
+        start = time.monotonic()
+        samples = await drive(host, port, path, mix, concurrency, duration, seed)
+        results[str(concurrency)] = summarize(samples, time.monotonic() - start)
+    return results
+
+
+def run_load(
+    app: str = "api:create_app",
+    url: typing.Optional[str] = None,
+    path: str = "/productionplan",
+    mix: str = MIX,
+    levels: typing.Sequence[int] = CONCURRENCY,
+    duration: float = DURATION,
+    warm_up: float = WARM_UP,
+    seed: int = 0,
+    config: str = "",
+    cache: bool = False,
+) -> typing.Dict:
+    """
+    Load tests the API, started on a free port unless the URL of a running one is given
+    :return: Report with the results of each concurrency level
+    """
+    sources = [(source, source_bodies(source, seed), weight) for source, weight in parse_mix(mix)]
+    process = None
+    with tempfile.TemporaryFile() as log:
+        if url:
+            parsed = urllib.parse.urlsplit(url)
+            host, port = parsed.hostname, parsed.port or 80
+        else:
+            host = "127.0.0.1"
+            port = free_port(host)
+            process = start_server(app, host, port, config, log, cache)
+        try:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(wait_ready(host, port, process, READY_TIMEOUT))
+                results = loop.run_until_complete(
+                    run_levels(host, port, path, sources, list(levels), duration, warm_up, seed)
+                )
+            finally:
+                loop.close()
+        except Exception:
+            log.seek(0)
+            print(log.read().decode(errors="replace")[-4000:], file=sys.stderr)
+            raise
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(READY_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "app": url or app,
+            "path": path,
+            "mix": mix,
+            "duration_s": duration,
+            "seed": seed,
+            "cache": cache,
+        },
+        "results": results,
+    }
+
+
+def compare(report: typing.Dict, baseline: typing.Dict, tolerance: float = TOLERANCE) -> typing.List[str]:
+    """
+    Compares each concurrency level with the one in the baseline: p50 and p99 latencies can't be over it, nor the
+    throughput under it, by more than the tolerance. Any error response is a regression too.
+    :param report: Results of `run_load`
+    :param baseline: Results of a previous `run_load`
+    :param tolerance: Relative change allowed
+    :return: Description of each regression found
+    """
+    regressions = []
+    for level, summary in report["results"].items():
+        if summary["errors"]:
+            regressions.append(f"concurrency {level}: {summary['errors']} of {summary['requests']} requests failed")
+        reference = baseline.get("results", {}).get(level)
+        if reference is None:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if summary.get(key, 0) > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"concurrency {level}: {key[:3]} {summary[key]:.2f} ms, baseline {reference[key]:.2f} ms"
+                )
+        if summary["throughput_per_s"] < reference["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"concurrency {level}: {summary['throughput_per_s']:.1f} requests/s, "
+                f"baseline {reference['throughput_per_s']:.1f} requests/s"
+            )
+    return regressions
+
+
+def main(args: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("concurrency", nargs="*", type=int, default=CONCURRENCY, help="Concurrent clients of each level")
+    parser.add_argument("--app", default="api:create_app", help="App factory to serve, or `main` to run main.py")
+    parser.add_argument("--url", help="URL of an already running API to test instead, e.g. http://127.0.0.1:8888")
+    parser.add_argument("--config", default="", help="Config file of the API started, none by default")
+    parser.add_argument("--path", default="/productionplan", help="Path the payloads are posted to")
+    parser.add_argument("--mix", default=MIX, help="Payload sources and their weights, e.g. datasets=2,synthetic:100=1")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds each level is measured")
+    parser.add_argument("--warm-up", type=float, default=WARM_UP, help="Seconds of requests before each level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache and entity tags of the API started")
+    parser.add_argument("--output", help="File to write the results to, besides printing them")
+    parser.add_argument("--baseline", help=f"Baseline results to compare with, e.g. {BASELINE_PATH}")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Relative latency and throughput change")
+    options = parser.parse_args(args)
+
+    report = run_load(
+        app=options.app,
+        url=options.url,
+        path=options.path,
+        mix=options.mix,
+        levels=options.concurrency,
+        duration=options.duration,
+        warm_up=options.warm_up,
+        seed=options.seed,
+        config=options.config,
+        cache=options.cache,
+    )
+    print(json.dumps(report, indent=2))
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, "r") as f:
+            regressions = compare(report, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
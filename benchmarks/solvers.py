@@ -0,0 +1,40 @@
+"""
+Runtime of the dispatch engines versus fleet size.
+
+Run with `python -m benchmarks.solvers`.
+"""
+import sys
+import time
+import typing
+from benchmarks.fleets import generate_payload
+from api.services.production_plan.controller import ENGINES
+
+
+SIZES = [10, 100, 1000, 5000]
+# The dataframe engine is too slow to be measured on big fleets
+MAX_SIZES = {"pandas": 1000}
+
+
+def measure(engine: typing.Callable, data: typing.Dict, repeat: int = 5) -> float:
+    # Best of `repeat` runs, in milliseconds
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main(sizes: typing.List[int] = SIZES):
+    print(f"{'plants':>8}" + "".join(f"{name + ' (ms)':>16}" for name in ENGINES))
+    for size in sizes:
+        data = generate_payload(size, seed=size)
+        timings = [
+            f"{measure(engine, data):16.2f}" if size <= MAX_SIZES.get(name, size) else f"{'-':>16}"
+            for name, engine in ENGINES.items()
+        ]
+        print(f"{size:>8}" + "".join(timings))
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or SIZES)
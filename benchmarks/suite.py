@@ -0,0 +1,221 @@
+"""
+Latency, throughput and peak memory of the production plan calculations on synthetic fleets, measuring both
+`process()` directly and `/productionplan` through the ASGI app, without any network.
+
+Run with `python -m benchmarks.suite`, see `--help` for the options. Results are printed as JSON, and can be
+compared against a stored baseline, exiting with an error when any benchmark got slower than allowed.
+"""
+import sys
+import json
+import time
+import typing
+import asyncio
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from benchmarks.fleets import generate_payload
+
+
+SIZES = [10, 100, 1000, 10000, 100000]
+BASELINE_PATH = "benchmarks/baseline.json"
+# Relative increase of the p50 latency over the baseline considered a regression
+TOLERANCE = 0.25
+PERCENTILES = [50, 90, 99]
+
+
+def payloads(size: int, seed: int, runs: int) -> typing.List[typing.Dict]:
+    # Same fleet on every run, with a different load so cached results are never hit
+    data = generate_payload(size, seed=seed)
+    return [dict(data, load=data["load"] + run) for run in range(runs)]
+
+
+def summarize(timings: typing.List[float], peak_memory: int) -> typing.Dict[str, float]:
+    """
+    Summarizes the timings, in seconds, of the runs of a benchmark
+    :param timings:
+    :param peak_memory: Peak memory allocated by a single run, in bytes
+    :return:
+    """
+    milliseconds = np.array(timings) * 1000
+    summary = {f"p{percentile}_ms": float(np.percentile(milliseconds, percentile)) for percentile in PERCENTILES}
+    summary.update(
+        {
+            "mean_ms": float(milliseconds.mean()),
+            "min_ms": float(milliseconds.min()),
+            "max_ms": float(milliseconds.max()),
+            "runs": len(timings),
+            "throughput_per_s": len(timings) / float(np.sum(timings)),
+            "peak_memory_bytes": peak_memory,
+        }
+    )
+    return summary
+
+
+def traced_peak(func: typing.Callable[[], typing.Any]) -> int:
+    # Tracing allocations slows everything down, so the peak memory is measured on its own run
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_timed(func: typing.Callable[[typing.Dict], typing.Any], data: typing.List[typing.Dict]) -> typing.List[float]:
+    timings = []
+    for item in data:
+        start = time.perf_counter()
+        func(item)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_process(size: int, seed: int, runs: int) -> typing.Dict[str, float]:
+    from api.services.production_plan.controller import process
+
+    data = payloads(size, seed, runs + 1)
+    peak = traced_peak(lambda: process(data[-1]))
+    return summarize(run_timed(process, data[:runs]), peak)
+
+
+class ASGIClient:
+    """
+    Sends requests straight to an ASGI app, so the measures include the whole app but no network nor test client
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+
+    async def _request(self, method: str, path: str, body: bytes) -> typing.Tuple[int, bytes]:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status, chunks = 0, []
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    def post(self, path: str, body: bytes) -> typing.Tuple[int, bytes]:
+        return self.loop.run_until_complete(self._request("POST", path, body))
+
+    def close(self):
+        self.loop.close()
+
+
+def bench_http(size: int, seed: int, runs: int) -> typing.Dict[str, float]:
+    from api import create_app
+
+    client = ASGIClient(create_app(testing=True))
+    bodies = [json.dumps(item).encode() for item in payloads(size, seed, runs + 1)]
+
+    def post(body: bytes):
+        status, content = client.post("/productionplan", body)
+        if status != 200:
+            raise RuntimeError(f"Unexpected {status} response: {content[:200]!r}")
+
+    try:
+        peak = traced_peak(lambda: post(bodies[-1]))
+        return summarize(run_timed(post, bodies[:runs]), peak)
+    finally:
+        client.close()
+
+
+BENCHMARKS = {"process": bench_process, "http": bench_http}
+
+
+def runs_for(size: int, runs: int) -> int:
+    # Fewer runs on big fleets, so the whole suite takes a few minutes at most
+    return max(3, min(runs, runs * 1000 // max(size, 1)))
+
+
+def run_suite(sizes: typing.List[int], seed: int, runs: int) -> typing.Dict:
+    from api.settings import get_app_settings
+
+    results: typing.Dict[str, typing.Dict[str, typing.Dict]] = {name: {} for name in BENCHMARKS}
+    for size in sizes:
+        for name, bench in BENCHMARKS.items():
+            results[name][str(size)] = bench(size, seed, runs_for(size, runs))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "engine": get_app_settings().dispatch_engine,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report: typing.Dict, baseline: typing.Dict, tolerance: float = TOLERANCE) -> typing.List[str]:
+    """
+    Compares the p50 latency of each benchmark with the one in the baseline
+    :param report: Results of `run_suite`
+    :param baseline: Results of a previous `run_suite`
+    :param tolerance: Relative increase allowed
+    :return: Description of each regression found
+    """
+    regressions = []
+    for name, sizes in report["results"].items():
+        for size, summary in sizes.items():
+            reference = baseline.get("results", {}).get(name, {}).get(size)
+            if reference is None:
+                continue
+            if summary["p50_ms"] > reference["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} with {size} plants: p50 {summary['p50_ms']:.2f} ms, baseline {reference['p50_ms']:.2f} ms"
+                )
+    return regressions
+
+
+def main(args: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES, help="Fleet sizes to measure")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=50, help="Runs per benchmark, fewer on big fleets")
+    parser.add_argument("--output", help="File to write the results to, besides printing them")
+    parser.add_argument("--baseline", help=f"Baseline results to compare with, e.g. {BASELINE_PATH}")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Relative p50 increase allowed")
+    options = parser.parse_args(args)
+
+    report = run_suite(options.sizes, options.seed, options.runs)
+    print(json.dumps(report, indent=2))
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, "r") as f:
+            regressions = compare(report, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
+import os
+import shutil
 import uvicorn
 import logging
+import tempfile
 from api.settings import get_app_settings
 from api import create_app
+from api.core.server import Supervisor, worker_count
 
 
 logger = logging.getLogger("app.main")
@@ -11,13 +15,43 @@ app = create_app(testing=False)
 def main():
     settings = get_app_settings()
     logger.info(f"Starting , listening on " f"{settings.listen_host}:{settings.listen_port}")
-    uvicorn.run(
+    workers = worker_count(settings.server_workers)
+    if workers == 1:
+        uvicorn.run(
+            "api:create_app",
+            host=settings.listen_host,
+            port=settings.listen_port,
+            reload=settings.debug,
+            debug=settings.debug,
+        )
+        return
+
+    # Workers are spawned with the environment of this process, so they all share the fleets registered on any of
+    # them through the same directory, which is kept while workers are restarted
+    registry_dir = None
+    if not settings.fleet_registry_dir:
+        registry_dir = tempfile.mkdtemp(prefix="fleets-")
+        os.environ["FLEET_REGISTRY_DIR"] = registry_dir
+
+    # Workers are restarted with SIGHUP instead of reloading on changes
+    config = uvicorn.Config(
         "api:create_app",
         host=settings.listen_host,
         port=settings.listen_port,
-        reload=settings.debug,
+        factory=True,
         debug=settings.debug,
     )
+    try:
+        Supervisor(
+            config,
+            workers,
+            cpu_affinity=settings.server_cpu_affinity,
+            ready_timeout=settings.server_ready_timeout,
+            shutdown_timeout=settings.server_shutdown_timeout,
+        ).run()
+    finally:
+        if registry_dir is not None:
+            shutil.rmtree(registry_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
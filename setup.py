@@ -6,6 +6,10 @@ with open("requirements.txt") as f:
     required = f.read().splitlines()
 
 
+with open("zstd-requirements.txt") as f:
+    zstd_required = f.read().splitlines()
+
+
 with open("manifest.json", "r") as f:
     manifest = json.load(f)
 
@@ -28,6 +32,9 @@ setup(
     install_requires=[
         required,
     ],
+    extras_require={
+        "zstd": zstd_required,
+    },
     entry_points="""
         [console_scripts]
             api = main:main
@@ -0,0 +1,82 @@
+import sys
+import json
+import pytest
+from api.services.production_plan.fleet import Fleet
+from api.services.production_plan.registry import SharedFleetRegistry, get_fleet_registry
+
+
+@pytest.fixture(scope="function")
+def registered_fleet(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    response = client.put("/fleets/test", json={"powerplants": data["powerplants"]})
+    yield response
+    get_fleet_registry().delete("test")
+
+
+def test_api_register_fleet(client, registered_fleet, normal_json_dataset):
+    assert registered_fleet.status_code == 200
+    assert registered_fleet.json() == {"fleet_id": "test", "powerplants": 6}
+
+    response = client.get("/fleets/test")
+    assert response.status_code == 200
+    assert response.json() == {"powerplants": json.loads(normal_json_dataset)["powerplants"]}
+
+
+def test_api_register_invalid_fleet_returns_422(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    data["powerplants"][0]["efficiency"] = 1.5
+    response = client.put("/fleets/test", json={"powerplants": data["powerplants"]})
+    assert response.status_code == 422
+    assert get_fleet_registry().get("test") is None
+
+
+def test_api_registered_fleet_production_plan(client, registered_fleet, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    response = client.post("/productionplan/fleet", json={"fleet_id": "test", "load": 480, "fuels": data["fuels"]})
+    assert response.status_code == 200
+    assert response.json() == client.post("/productionplan", data=normal_json_dataset).json()
+
+
+def test_api_unknown_fleet_returns_404(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    response = client.post("/productionplan/fleet", json={"fleet_id": "nope", "load": 480, "fuels": data["fuels"]})
+    assert response.status_code == 404
+    assert response.json()["code"] == "not_found"
+    assert client.get("/fleets/nope").status_code == 404
+    assert client.delete("/fleets/nope").status_code == 404
+
+
+def test_api_delete_fleet(client, registered_fleet):
+    response = client.delete("/fleets/test")
+    assert response.status_code == 204
+    assert client.get("/fleets/test").status_code == 404
+
+
+def test_api_registry_full_returns_400(client, normal_json_dataset, monkeypatch):
+    monkeypatch.setattr(get_fleet_registry(), "max_fleets", 0)
+    data = json.loads(normal_json_dataset)
+    response = client.put("/fleets/test", json={"powerplants": data["powerplants"]})
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Shared fleets are locked with fcntl")
+def test_shared_registry_between_processes(tmp_path, normal_json_dataset):
+    # Each registry stands for the one of a worker process
+    plants = json.loads(normal_json_dataset)["powerplants"]
+    first, second = (SharedFleetRegistry(str(tmp_path), max_fleets=2) for _ in range(2))
+
+    assert first.put("a", Fleet(plants))
+    fleet = second.get("a")
+    assert fleet.plants() == plants
+    assert second.get("a") is fleet
+
+    # Replacing a fleet on one worker reaches the others
+    assert first.put("a", Fleet(plants[:2]))
+    assert second.get("a").plants() == plants[:2]
+
+    assert second.put("b", Fleet(plants))
+    assert not first.put("c", Fleet(plants))
+    assert first.delete("b")
+    assert second.get("b") is None
+    assert not second.delete("b")
+    assert len(first) == len(second) == 1
@@ -0,0 +1,36 @@
+import gzip
+from api.core.metrics import PROMETHEUS_MEDIA_TYPE, REQUESTS
+
+
+def test_metrics_report_requests_and_stages(client, normal_json_dataset):
+    before = REQUESTS.value("calculate_production_plan", "POST", "200")
+    # A load not used by other tests, so the result is not cached
+    response = client.post("/productionplan", data=normal_json_dataset.replace('"load": 480', '"load": 479'))
+    assert response.status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == f"{PROMETHEUS_MEDIA_TYPE}; charset=utf-8"
+    assert REQUESTS.value("calculate_production_plan", "POST", "200") == before + 1
+    for sample in (
+        'api_request_duration_seconds_count{handler="calculate_production_plan"}',
+        'api_stage_duration_seconds_count{stage="request_parsing"}',
+        'api_stage_duration_seconds_count{stage="calculation"}',
+        'api_stage_duration_seconds_count{stage="dispatch"}',
+        'api_executor_pending_tasks{backend="thread"} 0',
+    ):
+        assert sample in response.text
+
+
+def test_metrics_label_unmatched_paths(client):
+    before = REQUESTS.value("unmatched", "GET", "404")
+    assert client.get("/not/a/path").status_code == 404
+    assert REQUESTS.value("unmatched", "GET", "404") == before + 1
+
+
+def test_metrics_label_compressed_requests(client, normal_json_dataset):
+    before = REQUESTS.value("calculate_production_plan", "POST", "200")
+    body = gzip.compress(normal_json_dataset.encode())
+    response = client.post("/productionplan", data=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert REQUESTS.value("calculate_production_plan", "POST", "200") == before + 1
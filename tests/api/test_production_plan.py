@@ -1,4 +1,7 @@
 import json
+import pytest
+from fastapi.testclient import TestClient
+from api.settings import get_app_settings
 
 
 def test_api_prod_plan_no_post_methods_request_returns_405(client):
@@ -86,3 +89,105 @@ def test_api_prod_plan_normal_json_data(client, normal_json_dataset):
         {"name": "gasfiredsomewhatsmaller", "p": 0},
         {"name": "tj1", "p": 0},
     ]
+
+
+@pytest.mark.parametrize("dispatch_engine", ["numpy", "pandas", "exact"])
+def test_api_prod_plan_missing_fuel_returns_400(client, normal_json_dataset, dispatch_engine, monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "dispatch_engine", dispatch_engine)
+    data = json.loads(normal_json_dataset)
+    data["fuels"].pop("gas(euro/MWh)")
+    response = client.post("/productionplan", json=data)
+    assert response.status_code == 400
+    assert response.json()["code"] == "bad_request"
+
+
+def test_api_prod_plan_timeseries(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    data["load"] = [480, 0]
+    data["fuels"]["wind(%)"] = [60, 0]
+    response = client.post("/productionplan/timeseries", json=data)
+    assert response.status_code == 200
+    assert response.json() == [
+        [
+            {"name": "windpark1", "p": 90},
+            {"name": "windpark2", "p": 22},
+            {"name": "gasfiredbig1", "p": 244},
+            {"name": "gasfiredbig2", "p": 125},
+            {"name": "gasfiredsomewhatsmaller", "p": 0},
+            {"name": "tj1", "p": 0},
+        ],
+        [
+            {"name": "windpark1", "p": 0},
+            {"name": "windpark2", "p": 0},
+            {"name": "gasfiredbig1", "p": 0},
+            {"name": "gasfiredbig2", "p": 0},
+            {"name": "gasfiredsomewhatsmaller", "p": 0},
+            {"name": "tj1", "p": 0},
+        ],
+    ]
+
+
+def test_api_prod_plan_timeseries_fuels_not_matching_intervals_returns_422(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    data["load"] = [480, 400, 300]
+    data["fuels"]["wind(%)"] = [60, 0]
+    response = client.post("/productionplan/timeseries", json=data)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"] == "Fuel 'wind(%)' has 2 values, but there are 3 load intervals"
+
+
+def test_api_prod_plan_supply_stack(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    del data["load"]
+    response = client.post("/productionplan/supplystack", json=dict(data, load_min=480, load_max=500, step=20))
+    assert response.status_code == 200
+    result = response.json()
+    assert [plant["name"] for plant in result["stack"]][:2] == ["windpark1", "windpark2"]
+    names = [plant["name"] for plant in result["stack"]]
+    point = result["points"][0]
+    assert [point["load"] for point in result["points"]] == [480, 500]
+    assert dict(zip(names, point["p"])) == {
+        "windpark1": 90,
+        "windpark2": 22,
+        "gasfiredbig1": 244,
+        "gasfiredbig2": 125,
+        "gasfiredsomewhatsmaller": 0,
+        "tj1": 0,
+    }
+    assert point["marginal_price"] == result["stack"][3]["cost"]
+
+
+def test_api_prod_plan_supply_stack_invalid_range_returns_422(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    response = client.post("/productionplan/supplystack", json=dict(data, load_min=500, load_max=100))
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"] == "load_max can not be lower than load_min"
+
+
+def test_api_prod_plan_monte_carlo(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    uncertainty = {"wind(%)": {"distribution": "uniform", "low": 0, "high": 100}, "gas(euro/MWh)": {"values": [10, 20]}}
+    response = client.post("/productionplan/montecarlo", json=dict(data, uncertainty=uncertainty, samples=2, seed=7))
+    assert response.status_code == 200
+    result = response.json()
+    assert result["samples"] == 2
+    assert result["seed"] == 7
+    assert result["served"]["percentiles"]["p50"] == 480
+    assert [plant["name"] for plant in result["powerplants"]] == [plant["name"] for plant in data["powerplants"]]
+    assert set(result["cost"]["percentiles"]) == {"p10", "p50", "p90"}
+
+
+def test_api_prod_plan_monte_carlo_values_not_matching_samples_returns_422(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    uncertainty = {"wind(%)": {"values": [60, 0]}}
+    response = client.post("/productionplan/montecarlo", json=dict(data, uncertainty=uncertainty, samples=3))
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"] == "Fuel 'wind(%)' has 2 values, but there are 3 samples"
+
+
+def test_api_prod_plan_with_executor_started(app, normal_json_dataset):
+    # Startup and shutdown events start and stop the executor pools
+    with TestClient(app) as client:
+        response = client.post("/productionplan", data=normal_json_dataset)
+    assert response.status_code == 200
+    assert response.json()[0] == {"name": "windpark1", "p": 90}
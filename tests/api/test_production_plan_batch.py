@@ -0,0 +1,86 @@
+import json
+from api.settings import get_app_settings
+
+
+def test_api_prod_plan_batch_results_in_input_order(client, normal_json_dataset):
+    scenario = json.loads(normal_json_dataset)
+    no_load = dict(scenario, load=0)
+    response = client.post("/productionplan/batch", json=[scenario, no_load])
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "result": [
+                {"name": "windpark1", "p": 90},
+                {"name": "windpark2", "p": 22},
+                {"name": "gasfiredbig1", "p": 244},
+                {"name": "gasfiredbig2", "p": 125},
+                {"name": "gasfiredsomewhatsmaller", "p": 0},
+                {"name": "tj1", "p": 0},
+            ],
+            "error": None,
+        },
+        {
+            "result": [
+                {"name": "windpark1", "p": 0},
+                {"name": "windpark2", "p": 0},
+                {"name": "gasfiredbig1", "p": 0},
+                {"name": "gasfiredbig2", "p": 0},
+                {"name": "gasfiredsomewhatsmaller", "p": 0},
+                {"name": "tj1", "p": 0},
+            ],
+            "error": None,
+        },
+    ]
+
+
+def test_api_prod_plan_batch_per_item_errors(client, normal_json_dataset, missing_load_dataset):
+    scenario = json.loads(normal_json_dataset)
+    no_fuels = dict(scenario, fuels={})
+    response = client.post("/productionplan/batch", json=[json.loads(missing_load_dataset), scenario, no_fuels])
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0] == {
+        "result": None,
+        "error": {
+            "responseType": "error",
+            "code": "bad_request",
+            "message": "Something was wrong with the request payload.",
+            "detail": [{"loc": ["load"], "msg": "field required", "type": "value_error.missing"}],
+        },
+    }
+    assert results[1]["error"] is None
+    assert results[1]["result"][0] == {"name": "windpark1", "p": 90}
+    assert results[2]["result"] is None
+    assert results[2]["error"]["code"] == "bad_request"
+
+
+def test_api_prod_plan_batch_too_many_scenarios_returns_400(client, normal_json_dataset):
+    scenario = json.loads(normal_json_dataset)
+    max_scenarios = get_app_settings().batch_max_scenarios
+    response = client.post("/productionplan/batch", json=[scenario] * (max_scenarios + 1))
+    assert response.status_code == 400
+    assert response.json()["code"] == "bad_request"
+
+
+def test_api_prod_plan_batch_not_a_list_returns_422(client, normal_json_dataset):
+    response = client.post("/productionplan/batch", data=normal_json_dataset)
+    assert response.status_code == 422
+
+
+def test_api_prod_plan_batch_uses_dispatch_engine(client, normal_json_dataset, monkeypatch):
+    # The merit order misses the gas plant, its pmin is above what's left after the wind plant
+    monkeypatch.setattr(get_app_settings(), "dispatch_engine", "exact")
+    pmin = {
+        "load": 60,
+        "fuels": {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "co2(euro/ton)": 20, "wind(%)": 50},
+        "powerplants": [
+            {"name": "gasfired", "type": "gasfired", "efficiency": 0.5, "pmin": 40, "pmax": 200},
+            {"name": "windpark", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 100},
+        ],
+    }
+    scenarios = [pmin, json.loads(normal_json_dataset)]
+    response = client.post("/productionplan/batch", json=scenarios)
+    assert response.status_code == 200
+    results = [item["result"] for item in response.json()]
+    assert results == [client.post("/productionplan", json=scenario).json() for scenario in scenarios]
+    assert sum(item["p"] for item in results[0]) == 60
@@ -0,0 +1,46 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from api.core.batching import BATCH_SIZE
+from api.core.exceptions import BadRequestException
+from api.services.production_plan import app as production_plan_app
+from api.services.production_plan.controller import dispatch_fleet_batch, process_arrays
+from api.services.production_plan.fleet import Fleet
+from api.settings import get_app_settings
+from tests.controller.test_controller_engines import random_payload
+
+
+@pytest.fixture(scope="function")
+def batching(monkeypatch):
+    settings = get_app_settings()
+    monkeypatch.setattr(settings, "batching_enabled", True)
+    monkeypatch.setattr(settings, "batching_window_ms", 200)
+    monkeypatch.setattr(settings, "result_cache_enabled", False)
+    production_plan_app.get_request_batcher.cache_clear()
+    yield
+    production_plan_app.get_request_batcher.cache_clear()
+
+
+def test_fleet_batch_matches_single_calculations():
+    data = random_payload(3, size=40)
+    scenarios = [dict(data, load=load) for load in (0, 500, 1500, 100000)]
+    scenarios.append(dict(data, fuels={}))
+
+    results = dispatch_fleet_batch(Fleet(data["powerplants"]), scenarios)
+
+    assert results[:-1] == [process_arrays(scenario) for scenario in scenarios[:-1]]
+    assert isinstance(results[-1], BadRequestException)
+
+
+def test_api_prod_plan_concurrent_requests_are_batched(app, batching):
+    data = random_payload(5, size=50)
+    payloads = [dict(data, load=1000 + 100 * i) for i in range(8)]
+    batches = BATCH_SIZE.count()
+
+    # Requests sent from several threads are handled concurrently by the event loop of the client
+    with TestClient(app) as client, ThreadPoolExecutor(len(payloads)) as pool:
+        responses = list(pool.map(lambda payload: client.post("/productionplan", data=json.dumps(payload)), payloads))
+
+    assert [response.json() for response in responses] == [process_arrays(payload) for payload in payloads]
+    assert BATCH_SIZE.count() - batches < len(payloads)
@@ -0,0 +1,65 @@
+import json
+import pytest
+from api.core.exceptions import BadRequestException
+from api.services.production_plan import app as production_plan_app
+from api.services.production_plan.cache import cache_key, get_result_cache
+
+
+@pytest.fixture(scope="function")
+def result_cache():
+    cache = get_result_cache()
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def test_cache_key_does_not_depend_on_plants_order(normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    shuffled = dict(data, powerplants=[data["powerplants"][i] for i in [4, 0, 3, 1, 5, 2]])
+    shuffled["fuels"] = dict(reversed(list(data["fuels"].items())))
+
+    assert cache_key(data, "numpy") == cache_key(shuffled, "numpy")
+    assert cache_key(data, "numpy") != cache_key(data, "exact")
+    assert cache_key(data, "numpy") != cache_key(dict(data, load=481), "numpy")
+
+
+def test_cache_key_keeps_order_of_same_plants(normal_json_dataset):
+    # Both gasfiredbig plants have the same values, so their order decides which one enters the grid first
+    data = json.loads(normal_json_dataset)
+    swapped = dict(data, powerplants=[data["powerplants"][i] for i in [1, 0, 2, 3, 4, 5]])
+
+    assert cache_key(data, "numpy") != cache_key(swapped, "numpy")
+
+
+def test_cache_key_invalid_fuels(normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    data["fuels"].pop("gas(euro/MWh)")
+
+    with pytest.raises(BadRequestException):
+        cache_key(data, "numpy")
+
+
+def test_api_prod_plan_cache_hit_skips_calculations(client, normal_json_dataset, result_cache, monkeypatch):
+    first = client.post("/productionplan", data=normal_json_dataset)
+    hits = result_cache.hits
+
+    def fail(fleet, data):
+        raise AssertionError("Cached results should not be calculated again")
+
+    monkeypatch.setattr(production_plan_app, "process_parsed", fail)
+    second = client.post("/productionplan", data=normal_json_dataset)
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert result_cache.hits == hits + 1
+
+
+def test_api_prod_plan_cache_stats(client, normal_json_dataset, result_cache):
+    client.post("/productionplan", data=normal_json_dataset)
+    response = client.get("/productionplan/cache")
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["enabled"] is True
+    assert stats["size"] == 1
+    assert set(stats) == {"enabled", "size", "maxsize", "hits", "misses", "evictions", "expirations"}
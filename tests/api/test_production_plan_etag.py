@@ -0,0 +1,66 @@
+import json
+import pytest
+from api.core.responses import etag_matches
+from api.services.production_plan import app as production_plan_app
+from api.services.production_plan import cache as production_plan_cache
+from api.settings import get_app_settings
+
+
+@pytest.fixture(scope="function")
+def no_result_cache(monkeypatch):
+    # Without cached results, only the tags can spare the calculations
+    monkeypatch.setattr(get_app_settings(), "result_cache_enabled", False)
+    production_plan_app.get_result_cache.cache_clear()
+    yield
+    production_plan_app.get_result_cache.cache_clear()
+
+
+def test_etag_depends_on_canonical_content(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    shuffled = dict(data, powerplants=[data["powerplants"][i] for i in [4, 0, 3, 1, 5, 2]])
+    shuffled["fuels"] = dict(reversed(list(data["fuels"].items())))
+
+    etag = client.post("/productionplan", json=data).headers["etag"]
+    assert client.post("/productionplan", json=shuffled).headers["etag"] == etag
+    assert client.post("/productionplan", json=dict(data, load=481)).headers["etag"] != etag
+    assert client.post("/productionplan", json=data, headers={"Accept": "application/x-ndjson"}).headers["etag"] != etag
+
+
+def test_etag_depends_on_engine_version(client, normal_json_dataset, monkeypatch):
+    etag = client.post("/productionplan", data=normal_json_dataset).headers["etag"]
+    monkeypatch.setattr(production_plan_cache, "ENGINE_VERSION", production_plan_cache.ENGINE_VERSION + 1)
+    assert client.post("/productionplan", data=normal_json_dataset).headers["etag"] != etag
+
+
+def test_api_prod_plan_not_modified_skips_calculations(client, normal_json_dataset, no_result_cache, monkeypatch):
+    # Without compression, tags are strong
+    headers = {"Accept-Encoding": "identity"}
+    etag = client.post("/productionplan", data=normal_json_dataset, headers=headers).headers["etag"]
+    assert not etag.startswith("W/")
+
+    def fail(fleet, data):
+        raise AssertionError("Results the client already holds should not be calculated again")
+
+    monkeypatch.setattr(production_plan_app, "process_parsed", fail)
+    headers["If-None-Match"] = f'"x", W/{etag}'
+    response = client.post("/productionplan", data=normal_json_dataset, headers=headers)
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_api_prod_plan_etag_disabled(client, normal_json_dataset, monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "etag_enabled", False)
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "header, matches",
+    [(None, False), ("", False), ('"abc"', True), ('W/"abc"', True), ('"x", "abc"', True), ("*", True), ('"ab"', False)],
+)
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
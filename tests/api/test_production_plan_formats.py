@@ -0,0 +1,130 @@
+import json
+import pytest
+from api.core.formats import ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+from api.settings import get_app_settings
+
+msgpack = pytest.importorskip("msgpack")
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture(scope="function", autouse=True)
+def no_result_cache(monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "result_cache_enabled", False)
+
+
+def arrow_body(data, **columns):
+    plants = data["powerplants"]
+    fields = ("name", "type", "efficiency", "pmin", "pmax")
+    table = pa.table({field: [plant[field] for plant in plants] for field in fields})
+    table = table.replace_schema_metadata({"load": json.dumps(data["load"]), "fuels": json.dumps(data["fuels"])})
+    for name, column in columns.items():
+        table = table.set_column(table.column_names.index(name), name, column)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_arrow(content):
+    return pa.ipc.open_stream(pa.py_buffer(content)).read_all().to_pylist()
+
+
+def test_api_prod_plan_msgpack(client, normal_json_dataset):
+    expected = client.post("/productionplan", data=normal_json_dataset).json()
+    body = msgpack.packb(json.loads(normal_json_dataset))
+    headers = {"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE}
+    response = client.post("/productionplan", data=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(response.content) == expected
+
+
+def test_api_prod_plan_arrow(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    expected = client.post("/productionplan", json=data).json()
+    headers = {"Content-Type": ARROW_MEDIA_TYPE, "Accept": ARROW_MEDIA_TYPE}
+    response = client.post("/productionplan", data=arrow_body(data), headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    assert read_arrow(response.content) == expected
+
+
+def test_api_prod_plan_arrow_body_with_json_response(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    response = client.post("/productionplan", data=arrow_body(data), headers={"Content-Type": ARROW_MEDIA_TYPE})
+
+    assert response.status_code == 200
+    assert response.json() == client.post("/productionplan", json=data).json()
+
+
+def test_api_prod_plan_arrow_validation_errors(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    efficiency = pa.array([1.5, 0.53, 0.37, 0.3, 1.0, None])
+    body = arrow_body(data, efficiency=efficiency)
+    response = client.post("/productionplan", data=body, headers={"Content-Type": ARROW_MEDIA_TYPE})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == [
+        {
+            "loc": ["body", "powerplants", 5, "efficiency"],
+            "msg": "none is not an allowed value",
+            "type": "type_error.none.not_allowed",
+        }
+    ]
+
+    body = arrow_body(data, efficiency=pa.array([1.5, 0.53, 0.37, 0.3, 1.0, 1.0]))
+    response = client.post("/productionplan", data=body, headers={"Content-Type": ARROW_MEDIA_TYPE})
+    assert response.status_code == 422
+    assert response.json()["detail"] == [
+        {
+            "loc": ["body", "powerplants", 0, "efficiency"],
+            "msg": "Plant efficiency can not be bigger than 1",
+            "type": "value_error",
+        }
+    ]
+
+
+def test_api_prod_plan_invalid_binary_bodies(client):
+    response = client.post("/productionplan", data=b"\x00\x01", headers={"Content-Type": ARROW_MEDIA_TYPE})
+    assert response.status_code == 422
+    response = client.post("/productionplan", data=b"\xc1", headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body"]
+
+
+@pytest.mark.parametrize(
+    "accept, content_type",
+    [
+        ("application/json, application/msgpack;q=0.1", "application/json"),
+        ("application/msgpack;q=0", "application/json"),
+        ("application/json;q=0.5, application/x-msgpack", MSGPACK_MEDIA_TYPE),
+        ("application/msgpack;q=0.5, application/vnd.apache.arrow.stream", ARROW_MEDIA_TYPE),
+        ("application/x-ndjson;q=0.2, application/msgpack;q=0.8", MSGPACK_MEDIA_TYPE),
+    ],
+)
+def test_api_prod_plan_accept_preferences(client, normal_json_dataset, accept, content_type):
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"Accept": accept})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == content_type
+
+
+
+@pytest.mark.parametrize(
+    "fuels, status_code",
+    [
+        ({"gas(euro/MWh)": b"\x00\x01"}, 400),
+        # Fuels no plant type needs are left out, same as in JSON bodies
+        ({"comment": b"\x00\x01"}, 200),
+        ({1: 13.4}, 422),
+    ],
+)
+def test_api_prod_plan_msgpack_fuels(client, normal_json_dataset, fuels, status_code):
+    data = json.loads(normal_json_dataset)
+    data["fuels"].update(fuels)
+    response = client.post("/productionplan", data=msgpack.packb(data), headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == status_code
+    if status_code == 200:
+        assert response.json() == client.post("/productionplan", data=normal_json_dataset).json()
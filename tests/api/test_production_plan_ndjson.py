@@ -0,0 +1,83 @@
+import json
+import pytest
+from api.core.responses import NDJSON_MEDIA_TYPE, iter_ndjson, preferred_media_type
+
+ndjson_headers = {"Accept": NDJSON_MEDIA_TYPE}
+
+
+def read_ndjson(response):
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_iter_ndjson_chunks():
+    chunks = list(iter_ndjson([{"a": 1}, {"b": 2}, {"c": 3}], chunk_size=2))
+
+    assert chunks == [b'{"a":1}\n{"b":2}\n', b'{"c":3}\n']
+    assert list(iter_ndjson([])) == []
+
+
+def test_api_prod_plan_ndjson(client, normal_json_dataset):
+    response = client.post("/productionplan", data=normal_json_dataset, headers=ndjson_headers)
+    assert response.status_code == 200
+    assert read_ndjson(response) == client.post("/productionplan", data=normal_json_dataset).json()
+
+
+def test_api_prod_plan_without_ndjson_accept_returns_json(client, normal_json_dataset):
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"Accept": "application/json"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.parametrize(
+    "accept",
+    ["application/json, application/x-ndjson;q=0", "application/json, application/x-ndjson;q=0.5", "application/*"],
+)
+def test_api_prod_plan_preferred_json(client, normal_json_dataset, accept):
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"Accept": accept})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_api_prod_plan_preferred_ndjson(client, normal_json_dataset):
+    headers = {"Accept": "application/json;q=0.5, application/x-ndjson"}
+    response = client.post("/productionplan", data=normal_json_dataset, headers=headers)
+    assert read_ndjson(response) == client.post("/productionplan", data=normal_json_dataset).json()
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, "application/json"),
+        ("*/*", "application/json"),
+        ("application/x-ndjson", NDJSON_MEDIA_TYPE),
+        ("application/x-ndjson, application/json", NDJSON_MEDIA_TYPE),
+        ("*/*;q=0.1, application/x-ndjson;q=0.2", NDJSON_MEDIA_TYPE),
+        ("*/*, application/json;q=0", NDJSON_MEDIA_TYPE),
+        ("Application/X-NDJSON; charset=utf-8", NDJSON_MEDIA_TYPE),
+        ("text/html", None),
+    ],
+)
+def test_preferred_media_type(accept, expected):
+    assert preferred_media_type(accept, ["application/json", NDJSON_MEDIA_TYPE]) == expected
+
+
+def test_api_prod_plan_timeseries_ndjson(client, normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    data["load"] = [480, 0]
+    data["fuels"]["wind(%)"] = [60, 0]
+    response = client.post("/productionplan/timeseries", json=data, headers=ndjson_headers)
+    assert response.status_code == 200
+    records = read_ndjson(response)
+    expected = client.post("/productionplan/timeseries", json=data).json()
+    assert records == [{"interval": i, **item} for i, result in enumerate(expected) for item in result]
+
+
+def test_api_prod_plan_batch_ndjson(client, normal_json_dataset):
+    scenario = json.loads(normal_json_dataset)
+    response = client.post("/productionplan/batch", json=[scenario, {"load": 10}], headers=ndjson_headers)
+    assert response.status_code == 200
+    records = read_ndjson(response)
+    assert [record["scenario"] for record in records] == [0] * 6 + [1]
+    assert records[0] == {"scenario": 0, "name": "windpark1", "p": 90}
+    assert records[-1]["error"]["code"] == "bad_request"
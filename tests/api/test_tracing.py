@@ -0,0 +1,38 @@
+import pytest
+from api.core import tracing
+from api.settings import get_app_settings
+from tests.controller.test_controller_engines import random_payload
+
+
+def test_untraced_request_has_no_trace(client, normal_json_dataset):
+    response = client.post("/productionplan", data=normal_json_dataset)
+    assert response.status_code == 200
+    assert "x-trace-id" not in response.headers
+
+
+@pytest.mark.parametrize("engine", ["pandas", "numpy"])
+def test_traced_request_records_intermediate_tables(client, monkeypatch, engine):
+    monkeypatch.setattr(get_app_settings(), "dispatch_engine", engine)
+    monkeypatch.setattr(get_app_settings(), "result_cache_enabled", False)
+    # Big enough to be calculated on a worker thread
+    data = random_payload(seed=3, size=50)
+    response = client.post("/productionplan", json=data, headers={"X-Trace": "1"})
+    assert response.status_code == 200
+
+    trace = client.get(f"/traces/{response.headers['x-trace-id']}").json()
+    events = {event["name"]: event["value"] for event in trace["events"]}
+    assert "fuel_costs" in events
+    # Results of every plant, in merit order
+    usage = {row["name"]: round(row["usage"]) for row in events["results"]}
+    assert usage == {item["name"]: item["p"] for item in response.json()}
+
+
+def test_sampled_requests_are_traced(client, monkeypatch, normal_json_dataset):
+    monkeypatch.setattr(get_app_settings(), "trace_sample_rate", 1.0)
+    response = client.post("/productionplan", data=normal_json_dataset)
+    assert response.status_code == 200
+    assert tracing.get_trace_store().get(response.headers["x-trace-id"]) is not None
+
+
+def test_unknown_trace_returns_404(client):
+    assert client.get("/traces/unknown").status_code == 404
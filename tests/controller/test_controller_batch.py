@@ -0,0 +1,36 @@
+import random
+from api.core.exceptions import BadRequestException
+from api.services.production_plan.controller import process_arrays, process_batch
+from tests.controller.test_controller_engines import random_payload
+
+
+def test_batch_matches_single_calculations():
+    """
+    Scenarios sharing fleets, with different loads and fuels, must give the same as one by one calculations
+    """
+    rnd = random.Random(7)
+    fleets = [random_payload(seed, size=rnd.randint(1, 60))["powerplants"] for seed in range(3)]
+    scenarios = []
+    for seed in range(40):
+        data = random_payload(100 + seed, size=1)
+        data["powerplants"] = rnd.choice(fleets)
+        data["load"] = rnd.randint(0, 30 * len(data["powerplants"]))
+        scenarios.append(data)
+
+    assert process_batch(scenarios) == [process_arrays(data) for data in scenarios]
+
+
+def test_batch_invalid_scenario_does_not_fail_the_others():
+    valid = random_payload(1, size=10)
+    invalid = random_payload(2, size=10)
+    invalid["powerplants"] = valid["powerplants"]
+    invalid["fuels"] = {}
+
+    results = process_batch([valid, invalid, valid])
+
+    assert results[0] == results[2] == process_arrays(valid)
+    assert isinstance(results[1], BadRequestException)
+
+
+def test_batch_empty():
+    assert process_batch([]) == []
@@ -0,0 +1,67 @@
+import os
+import json
+import random
+import pytest
+from api.services.production_plan.controller import ENGINES, get_engine, process_arrays, process_dataframe
+
+
+dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../datasets")
+datasets = sorted(f for f in os.listdir(dataset_path) if f.endswith(".json"))
+
+
+def random_payload(seed, size):
+    """
+    Generates a random payload, with lots of repeated values so the sorting ties are exercised too
+    """
+    rnd = random.Random(seed)
+    plants = []
+    for i in range(size):
+        plant_type = rnd.choice(["gasfired", "turbojet", "windturbine"])
+        pmin = rnd.choice([0, 0, 10, 40, 100])
+        plants.append(
+            {
+                "name": f"plant{i}",
+                "type": plant_type,
+                "efficiency": 1 if plant_type == "windturbine" else rnd.choice([0.3, 0.37, 0.53, 0.6]),
+                "pmin": pmin,
+                "pmax": pmin + rnd.choice([16, 36, 150, 210, 460]),
+            }
+        )
+    return {
+        "load": rnd.randint(0, 30 * size),
+        "fuels": {
+            "gas(euro/MWh)": rnd.choice([13.4, 18.4, 60.0]),
+            "kerosine(euro/MWh)": rnd.choice([33.8, 50.8]),
+            "co2(euro/ton)": 20,
+            "wind(%)": rnd.choice([0, 25, 60, 100]),
+        },
+        "powerplants": plants,
+    }
+
+
+@pytest.mark.parametrize("dataset", datasets)
+def test_engines_give_same_results_on_datasets(dataset):
+    with open(os.path.join(dataset_path, dataset), "r") as f:
+        data = json.load(f)
+
+    assert process_arrays(data) == process_dataframe(data)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_engines_give_same_results_on_random_fleets(seed):
+    data = random_payload(seed, size=random.Random(seed).randint(1, 120))
+
+    assert process_arrays(data) == process_dataframe(data)
+
+
+def test_arrays_engine_with_empty_fleet():
+    data = {"load": 100, "fuels": {}, "powerplants": []}
+
+    assert process_arrays(data) == []
+
+
+def test_get_engine():
+    assert set(ENGINES) == {"pandas", "numpy", "exact"}
+    assert get_engine("numpy") is process_arrays
+    with pytest.raises(ValueError):
+        get_engine("unknown")
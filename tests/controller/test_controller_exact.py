@@ -0,0 +1,77 @@
+import os
+import json
+import pytest
+from api.settings import get_app_settings
+from api.services.production_plan.controller import process_arrays, process_exact
+
+
+dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../datasets")
+
+
+def pmin_payload():
+    """
+    Greedy skips the gas plant since its pmin is above what's left after the wind plant, so the load is not
+    served, although using less wind and the gas plant at pmin serves it exactly.
+    """
+    return {
+        "load": 60,
+        "fuels": {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "co2(euro/ton)": 20, "wind(%)": 50},
+        "powerplants": [
+            {"name": "gasfired", "type": "gasfired", "efficiency": 0.5, "pmin": 40, "pmax": 200},
+            {"name": "windpark", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 100},
+        ],
+    }
+
+
+def test_exact_serves_load_skipped_by_greedy():
+    data = pmin_payload()
+
+    assert sum(item["p"] for item in process_arrays(data)) != data["load"]
+    assert process_exact(data) == [
+        {"name": "windpark", "p": 40},
+        {"name": "gasfired", "p": 20},
+    ]
+
+
+def test_exact_backs_off_cheaper_plant_for_pmin():
+    data = pmin_payload()
+    data["load"] = 110
+    data["powerplants"][0]["pmin"] = 140
+    data["powerplants"].append(
+        {"name": "tj1", "type": "turbojet", "efficiency": 0.3, "pmin": 0, "pmax": 100},
+    )
+
+    # Greedy uses all the wind and the kerosine plant, not serving the load. The gas plant at pmin (70) only fits
+    # by reducing the wind.
+    assert process_exact(data) == [
+        {"name": "windpark", "p": 40},
+        {"name": "gasfired", "p": 70},
+        {"name": "tj1", "p": 0},
+    ]
+
+
+@pytest.mark.parametrize(
+    "dataset",
+    ["power_normal_load.json", "power_test_efficiencies_order.json", "power_no_load.json"],
+)
+def test_exact_serves_load_on_datasets(dataset):
+    with open(os.path.join(dataset_path, dataset), "r") as f:
+        data = json.load(f)
+
+    result = process_exact(data)
+
+    assert abs(sum(item["p"] for item in result) - data["load"]) <= len(result)
+
+
+def test_exact_falls_back_to_greedy_when_infeasible():
+    with open(os.path.join(dataset_path, "power_huge_load.json"), "r") as f:
+        data = json.load(f)
+
+    assert process_exact(data) == process_arrays(data)
+
+
+def test_exact_falls_back_to_greedy_when_out_of_budget(monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "exact_solver_max_nodes", 0)
+    data = pmin_payload()
+
+    assert process_exact(data) == process_arrays(data)
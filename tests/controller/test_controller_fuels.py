@@ -0,0 +1,50 @@
+import pytest
+from api.services.production_plan import fuels
+from api.services.production_plan.controller import dispatch_fleet, get_cost_per_fuel_type, get_wind_factor
+from api.services.production_plan.fleet import Fleet
+from api.services.production_plan.fuels import FuelCostModel, compile_fuels, register_fuel_cost_model
+from api.settings import get_app_settings
+
+
+FUELS = {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "co2(euro/ton)": 20, "wind(%)": 60}
+
+
+@pytest.fixture
+def hydrogen(monkeypatch):
+    monkeypatch.setattr(fuels, "FUEL_COST_MODELS", dict(fuels.FUEL_COST_MODELS))
+    register_fuel_cost_model("hydrogen", FuelCostModel(price="hydrogen(euro/MWh)"))
+
+
+def test_default_models():
+    costs, factors = compile_fuels(FUELS, ["gasfired", "turbojet", "windturbine", "nuclear"])
+
+    assert costs.tolist() == [13.4, 50.8, 0.0, 0.0]
+    assert factors.tolist() == [1.0, 1.0, 0.6, 1.0]
+    assert get_cost_per_fuel_type({"fuels": FUELS}, "gasfired") == 13.4
+    assert get_wind_factor({"fuels": FUELS}) == 0.6
+
+
+def test_co2_adjusted_costs(monkeypatch):
+    costs, _ = compile_fuels(FUELS, ["gasfired", "turbojet"], co2_adjusted=True)
+    assert costs.tolist() == [13.4 + 0.3 * 20, 50.8]
+
+    monkeypatch.setattr(get_app_settings(), "co2_adjusted_costs", True)
+    assert get_cost_per_fuel_type({"fuels": FUELS}, "gasfired") == 13.4 + 0.3 * 20
+
+
+def test_registered_model_is_used(hydrogen):
+    plants = [
+        {"name": "h2", "type": "hydrogen", "efficiency": 0.5, "pmin": 0, "pmax": 100},
+        {"name": "gas", "type": "gasfired", "efficiency": 0.5, "pmin": 0, "pmax": 100},
+    ]
+    data = {"load": 50, "fuels": {**FUELS, "hydrogen(euro/MWh)": 5}}
+
+    assert compile_fuels(data["fuels"], ["hydrogen"])[0].tolist() == [5.0]
+    assert dispatch_fleet(Fleet(plants), data) == [{"name": "h2", "p": 50}, {"name": "gas", "p": 0}]
+
+
+def test_missing_fuel():
+    with pytest.raises(KeyError):
+        compile_fuels({"gas(euro/MWh)": 13.4}, ["gasfired", "turbojet"])
+    with pytest.raises(KeyError):
+        compile_fuels({"gas(euro/MWh)": 13.4}, ["gasfired"], co2_adjusted=True)
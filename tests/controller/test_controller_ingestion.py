@@ -0,0 +1,77 @@
+import json
+import pytest
+from fastapi.exceptions import RequestValidationError
+from api.services.production_plan.cache import fleet_cache_key
+from api.services.production_plan.controller import process_parsed
+from api.services.production_plan.ingestion import parse_payload
+from tests.controller.test_controller_engines import random_payload
+
+
+def parse_errors(body, fast):
+    with pytest.raises(RequestValidationError) as e:
+        parse_payload(body, "application/json", fast=fast)
+    return e.value.errors()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fast_path_gives_same_fleet_as_model(seed):
+    body = json.dumps(random_payload(seed, size=50)).encode()
+    fast_fleet, fast_data = parse_payload(body, fast=True)
+    model_fleet, model_data = parse_payload(body, fast=False)
+
+    assert fast_fleet.plants() == model_fleet.plants()
+    assert fast_data == model_data
+    assert fleet_cache_key(fast_fleet, fast_data, "numpy") == fleet_cache_key(model_fleet, model_data, "numpy")
+
+
+def test_fleet_is_immutable_and_compact():
+    fleet, data = parse_payload(json.dumps(random_payload(3, size=20)).encode())
+
+    assert fleet.type_codes.dtype.itemsize == 1
+    for column in (fleet.type_codes, fleet.efficiency, fleet.pmin, fleet.pmax, fleet.plant_order):
+        with pytest.raises(ValueError):
+            column[0] = 0
+    # Results refer to the same name strings as the fleet
+    names = {id(name) for name in fleet.names}
+    assert all(id(item["name"]) in names for item in process_parsed(fleet, data))
+
+
+def test_values_to_coerce_are_validated_by_model():
+    data = random_payload(1, size=3)
+    data["powerplants"][1]["pmin"] = "10"
+    data["powerplants"][2]["efficiency"] = "0.5"
+    fleet, _ = parse_payload(json.dumps(data).encode())
+
+    assert fleet.pmin[1] == 10
+    assert fleet.efficiency[2] == 0.5
+
+
+def test_fast_path_errors_are_the_model_ones():
+    data = random_payload(2, size=5)
+    data["powerplants"][3]["pmin"] = -1
+    data["powerplants"][1]["efficiency"] = 1.5
+    data["powerplants"][3]["efficiency"] = 2
+    body = json.dumps(data).encode()
+
+    errors = parse_errors(body, fast=True)
+    assert errors == parse_errors(body, fast=False)
+    assert [error["loc"] for error in errors] == [
+        ("body", "powerplants", 1, "efficiency"),
+        ("body", "powerplants", 3, "efficiency"),
+        ("body", "powerplants", 3, "pmin"),
+    ]
+    assert errors[0]["msg"] == "Plant efficiency can not be bigger than 1"
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"",
+        b"[]",
+        b'{"load": 10',
+        b'{"load": 10, "fuels": {}, "powerplants": [{"name": "a"}]}',
+        b'{"load": "x", "fuels": {}, "powerplants": []}',
+    ],
+)
+def test_invalid_bodies_give_model_errors(body):
+    assert parse_errors(body, fast=True) == parse_errors(body, fast=False)
@@ -0,0 +1,111 @@
+import random
+import pytest
+import numpy as np
+from api.core.exceptions import BadRequestException
+from api.services.production_plan import controller
+from api.services.production_plan.controller import process_arrays, process_monte_carlo
+from api.services.production_plan.uncertainty import sample_fuels
+from tests.controller.test_controller_engines import random_payload
+
+
+UNCERTAINTY = {
+    "wind(%)": {"distribution": "normal", "mean": 50, "std": 30, "low": 0, "high": 100},
+    "gas(euro/MWh)": {"distribution": "triangular", "low": 5, "mode": 15, "high": 70},
+    "kerosine(euro/MWh)": {"distribution": "uniform", "low": 20, "high": 60},
+}
+
+
+def monte_carlo_payload(seed, samples=21):
+    data = random_payload(seed, size=random.Random(seed).randint(1, 60))
+    return dict(data, uncertainty=UNCERTAINTY, samples=samples, seed=seed, percentiles=[0, 50, 100])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_samples_match_single_dispatch(seed, monkeypatch):
+    # A sample per chunk, so the dispatch goes through all of them
+    monkeypatch.setattr(controller, "MONTE_CARLO_MATRICES", 1 << 20)
+    data = monte_carlo_payload(seed)
+
+    result = process_monte_carlo(data)
+
+    samples = sample_fuels(UNCERTAINTY, data["samples"], seed)
+    plans = {plant["name"]: [] for plant in data["powerplants"]}
+    for sample in range(data["samples"]):
+        fuels = dict(data["fuels"], **{key: float(values[sample]) for key, values in samples.items()})
+        for item in process_arrays(dict(data, fuels=fuels)):
+            plans[item["name"]].append(item["p"])
+    # Rounding keeps the order of the values, so the min, median and max of an odd number of samples match the
+    # rounded plans
+    for plant in result["powerplants"]:
+        bands = plant["percentiles"]
+        expected = plans[plant["name"]]
+        assert [round(bands["p0"]), round(bands["p50"]), round(bands["p100"])] == [
+            min(expected),
+            int(np.median(expected)),
+            max(expected),
+        ]
+    assert result["served"]["max"] <= data["load"] + 1e-6
+
+
+def test_same_seed_same_results():
+    data = monte_carlo_payload(1, samples=200)
+    reordered = dict(data, uncertainty=dict(reversed(list(UNCERTAINTY.items()))))
+    assert process_monte_carlo(data) == process_monte_carlo(reordered)
+
+    result = process_monte_carlo(dict(data, seed=None))
+    assert process_monte_carlo(dict(data, seed=result["seed"])) == result
+
+
+def test_explicit_values_and_cost():
+    data = {
+        "load": 100,
+        "fuels": {"gas(euro/MWh)": 10, "kerosine(euro/MWh)": 50, "co2(euro/ton)": 20, "wind(%)": 50},
+        "powerplants": [
+            {"name": "gas", "type": "gasfired", "efficiency": 0.5, "pmin": 0, "pmax": 200},
+            {"name": "wind", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 100},
+        ],
+        "uncertainty": {"wind(%)": {"values": [0, 50, 100, 100]}},
+        "samples": 4,
+        "seed": 0,
+        "percentiles": [50],
+    }
+    result = process_monte_carlo(data)
+
+    # Gas costs 20 per MWh generated, and covers what the wind does not
+    assert result["cost"]["min"] == 0
+    assert result["cost"]["max"] == 2000
+    assert result["cost"]["mean"] == (2000 + 1000) / 4
+    assert result["served"]["min"] == result["served"]["max"] == 100
+    assert [(plant["name"], plant["percentiles"]["p50"]) for plant in result["powerplants"]] == [
+        ("gas", 25),
+        ("wind", 75),
+    ]
+
+
+def test_invalid_requests(monkeypatch):
+    data = monte_carlo_payload(2)
+    monkeypatch.setattr(controller.get_app_settings(), "monte_carlo_max_samples", 10)
+    with pytest.raises(BadRequestException):
+        process_monte_carlo(data)
+
+    data = monte_carlo_payload(2, samples=5)
+    data["fuels"].pop("gas(euro/MWh)")
+    data["uncertainty"] = {}
+    data["powerplants"].append({"name": "gas", "type": "gasfired", "efficiency": 0.5, "pmin": 0, "pmax": 10})
+    with pytest.raises(BadRequestException):
+        process_monte_carlo(data)
+
+
+def test_samples_within_memory_budget(monkeypatch):
+    # The usage of 100 plants and its sorted copy take 1600 bytes per sample, 655 of them fit in 1 MB
+    data = dict(monte_carlo_payload(3), powerplants=random_payload(3, size=100)["powerplants"])
+    monkeypatch.setattr(controller.get_app_settings(), "monte_carlo_memory_mb", 1)
+    assert process_monte_carlo(dict(data, samples=655))["samples"] == 655
+    with pytest.raises(BadRequestException, match="maximum allowed is 655"):
+        process_monte_carlo(dict(data, samples=656))
+
+
+def test_normal_samples_are_clipped():
+    samples = sample_fuels({"wind(%)": {"distribution": "normal", "mean": 90, "std": 50, "high": 100}}, 1000, 4)
+    assert samples["wind(%)"].max() == 100
+    assert samples["wind(%)"].min() < 0
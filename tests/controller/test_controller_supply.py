@@ -0,0 +1,55 @@
+import os
+import json
+import random
+import numpy as np
+import pytest
+from api.services.production_plan.controller import dispatch_fleet_curve, get_supply_curve, process_arrays
+from api.services.production_plan.fleet import Fleet
+from api.services.production_plan.supply import SupplyCurve
+from tests.controller.test_controller_engines import random_payload
+
+
+dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../datasets")
+datasets = sorted(f for f in os.listdir(dataset_path) if f.endswith(".json"))
+
+
+@pytest.mark.parametrize("dataset", datasets)
+def test_supply_curve_matches_merit_order_on_datasets(dataset):
+    with open(os.path.join(dataset_path, dataset), "r") as f:
+        data = json.load(f)
+    fleet = Fleet(data["powerplants"])
+
+    for load in range(0, 1200, 7):
+        assert dispatch_fleet_curve(fleet, dict(data, load=load)) == process_arrays(dict(data, load=load))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_supply_curve_matches_merit_order_on_random_fleets(seed):
+    data = random_payload(seed, size=random.Random(seed).randint(1, 200))
+    curve = get_supply_curve(Fleet(data["powerplants"]), data)
+
+    for load in range(0, 30 * len(curve) + 100, 13):
+        assert curve.dispatch(float(load)) == process_arrays(dict(data, load=load))
+
+
+def test_supply_curve_next_fitting():
+    pmax_generated = np.array([100.0, 50.0, 60.0, 10.0, 80.0, 5.0])
+    pmin_generated = np.array([0.0, 40.0, 50.0, 0.0, 30.0, 5.0])
+    curve = SupplyCurve(["a", "b", "c", "d", "e", "f"], pmax_generated, pmin_generated)
+
+    assert curve.next_fitting(1, 45) == 1
+    assert curve.next_fitting(2, 45) == 3
+    assert curve.next_fitting(1, 9) == 3
+    assert curve.next_fitting(4, 9) == 5
+    assert curve.next_fitting(4, 4) == 6
+
+
+def test_supply_curves_are_cached_by_fleet_and_fuel_costs(normal_json_dataset):
+    data = json.loads(normal_json_dataset)
+    fleet = Fleet(data["powerplants"])
+    curve = get_supply_curve(fleet, data)
+
+    # CO2 is not used, so the same curve is valid
+    assert get_supply_curve(fleet, dict(data, fuels=dict(data["fuels"], **{"co2(euro/ton)": 30}))) is curve
+    assert get_supply_curve(fleet, dict(data, fuels=dict(data["fuels"], **{"wind(%)": 30}))) is not curve
+    assert get_supply_curve(Fleet(data["powerplants"]), data) is not curve
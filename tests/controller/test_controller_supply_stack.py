@@ -0,0 +1,58 @@
+import random
+import pytest
+from api.core.exceptions import BadRequestException
+from api.services.production_plan import controller
+from api.services.production_plan.controller import process_arrays, process_supply_stack
+from tests.controller.test_controller_engines import random_payload
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sweep_matches_single_loads(seed, monkeypatch):
+    # Small chunks, so the sweep goes through several of them
+    monkeypatch.setattr(controller, "SWEEP_MAX_CELLS", 500)
+    data = random_payload(seed, size=random.Random(seed).randint(1, 80))
+    data["step"] = 37
+
+    result = process_supply_stack(data)
+
+    assert [point["load"] for point in result["points"]] == list(range(0, int(result["capacity"]) + 1, 37))
+    names = [plant["name"] for plant in result["stack"]]
+    for point in result["points"]:
+        plan = process_arrays(dict(data, load=point["load"]))
+        assert sorted(zip(names, point["p"])) == sorted((item["name"], item["p"]) for item in plan)
+
+
+def test_stack_and_marginal_price():
+    data = {
+        "fuels": {"gas(euro/MWh)": 10, "kerosine(euro/MWh)": 50, "co2(euro/ton)": 20, "wind(%)": 50},
+        "powerplants": [
+            {"name": "tj", "type": "turbojet", "efficiency": 0.5, "pmin": 0, "pmax": 100},
+            {"name": "gas", "type": "gasfired", "efficiency": 0.5, "pmin": 0, "pmax": 200},
+            {"name": "wind", "type": "windturbine", "efficiency": 1, "pmin": 0, "pmax": 100},
+        ],
+        "load_min": 0,
+        "load_max": 200,
+        "step": 50,
+    }
+    result = process_supply_stack(data)
+
+    assert result["capacity"] == 200
+    assert [(plant["name"], plant["cost"], plant["capacity"]) for plant in result["stack"]] == [
+        ("wind", 0, 50),
+        ("gas", 20, 150),
+        ("tj", 100, 200),
+    ]
+    assert [(point["load"], point["marginal_price"], point["p"]) for point in result["points"]] == [
+        (0, None, [0, 0, 0]),
+        (50, 0, [50, 0, 0]),
+        (100, 20, [50, 50, 0]),
+        (150, 20, [50, 100, 0]),
+        (200, 100, [50, 100, 50]),
+    ]
+    assert result["points"][2]["cost"] == 50 * 20
+
+
+def test_too_many_loads():
+    data = random_payload(1, size=10)
+    with pytest.raises(BadRequestException):
+        process_supply_stack(dict(data, load_min=0, load_max=10 ** 9, step=1))
@@ -0,0 +1,46 @@
+import time
+from api.services.production_plan.controller import get_interval_fuels, process_arrays, process_timeseries
+from tests.controller.test_controller_engines import random_payload
+
+
+def test_interval_fuels():
+    fuels = {"gas(euro/MWh)": [13.4, 15.0], "kerosine(euro/MWh)": 50.8, "wind(%)": [60, 0]}
+
+    assert get_interval_fuels(fuels, 2) == [
+        {"gas(euro/MWh)": 13.4, "kerosine(euro/MWh)": 50.8, "wind(%)": 60},
+        {"gas(euro/MWh)": 15.0, "kerosine(euro/MWh)": 50.8, "wind(%)": 0},
+    ]
+
+
+def test_timeseries_matches_single_calculations():
+    data = random_payload(3, size=80)
+    data["load"] = [0, 40, 480, 900, 1500, 2400, 10000]
+    data["fuels"]["gas(euro/MWh)"] = [13.4, 18.4, 60.0, 13.4, 13.4, 70.0, 13.4]
+    data["fuels"]["wind(%)"] = [60, 0, 100, 25, 60, 60, 0]
+
+    result = process_timeseries(data)
+
+    assert len(result) == len(data["load"])
+    for load, fuels, interval_result in zip(data["load"], get_interval_fuels(data["fuels"], 7), result):
+        assert interval_result == process_arrays(dict(data, load=load, fuels=fuels))
+
+
+def test_timeseries_quarter_hour_day_is_faster_than_single_calls():
+    data = random_payload(4, size=500)
+    single = dict(data, load=6000, fuels=dict(data["fuels"]))
+    data["load"] = [4000 + 40 * i for i in range(96)]
+    data["fuels"]["wind(%)"] = [i % 100 for i in range(96)]
+
+    def best_time(func):
+        # Best of a few runs, so the first one paying for cold caches doesn't count
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    timeseries_time = best_time(lambda: process_timeseries(data))
+    single_calls_time = best_time(lambda: [process_arrays(single) for _ in range(96)])
+
+    assert timeseries_time < single_calls_time
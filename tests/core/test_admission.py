@@ -0,0 +1,127 @@
+import time
+import asyncio
+import pytest
+from api.core.admission import Admission
+from api.core.exceptions import ServiceUnavailableException
+from api.core.executor import get_executor
+from api.services.production_plan import app as production_plan_app
+from api.settings import get_app_settings
+from tests.controller.test_controller_engines import random_payload
+
+
+async def hold(admission, events, name, seconds, deadline=None):
+    await admission.acquire(deadline)
+    events.append(name)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        admission.release()
+    return name
+
+
+def test_over_limits_are_rejected():
+    admission = Admission(max_concurrency=1, max_queue=1, retry_after=3)
+    events = []
+
+    async def run_all():
+        return await asyncio.gather(
+            hold(admission, events, "first", 0.05),
+            hold(admission, events, "second", 0),
+            hold(admission, events, "third", 0),
+            return_exceptions=True,
+        )
+
+    first, second, third = asyncio.run(run_all())
+
+    assert (first, second) == ("first", "second")
+    assert isinstance(third, ServiceUnavailableException)
+    assert third.headers == {"Retry-After": "3"}
+    assert events == ["first", "second"]
+    assert admission.running == admission.queued == 0
+
+
+def test_waiting_calculations_start_in_order():
+    admission = Admission(max_concurrency=1, max_queue=10)
+    events = []
+
+    async def run_all():
+        return await asyncio.gather(*(hold(admission, events, i, 0.001) for i in range(5)))
+
+    assert asyncio.run(run_all()) == list(range(5))
+    assert events == list(range(5))
+
+
+def test_deadline_exceeded():
+    admission = Admission(max_concurrency=1, max_queue=10)
+    events = []
+
+    async def run_all():
+        return await asyncio.gather(
+            hold(admission, events, "first", 0.1),
+            hold(admission, events, "queued", 0, deadline=time.monotonic() + 0.01),
+            hold(admission, events, "late", 0, deadline=time.monotonic() - 1),
+            hold(admission, events, "last", 0),
+            return_exceptions=True,
+        )
+
+    first, queued, late, last = asyncio.run(run_all())
+
+    assert (first, last) == ("first", "last")
+    assert "deadline exceeded while waiting" in queued.message
+    assert "deadline exceeded before starting" in late.message
+    assert events == ["first", "last"]
+    assert admission.running == admission.queued == 0
+
+
+def test_no_concurrency_limit():
+    admission = Admission(max_concurrency=0, max_queue=0)
+
+    async def run_all():
+        return await asyncio.gather(*(hold(admission, [], i, 0.01) for i in range(20)))
+
+    assert asyncio.run(run_all()) == list(range(20))
+
+
+@pytest.mark.parametrize("deadline, status", [("0", 503), ("60000", 200), ("invalid", 200)])
+def test_api_prod_plan_deadline(client, deadline, status, monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "result_cache_enabled", False)
+    # Bigger than the calculations run inline, which are not subject to admission
+    data = random_payload(9, size=50)
+    response = client.post("/productionplan", json=data, headers={"X-Deadline-Ms": deadline})
+
+    assert response.status_code == status
+    if status == 503:
+        assert response.headers["Retry-After"] == "1"
+        assert response.json()["code"] == "service_unavailable"
+
+
+def test_api_prod_plan_inline_deadline(client, normal_json_dataset, monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "result_cache_enabled", False)
+    production_plan_app.get_result_cache.cache_clear()
+    # Small enough to run inline, without waiting for a slot
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"X-Deadline-Ms": "0"})
+
+    assert response.status_code == 503
+    assert response.json()["code"] == "service_unavailable"
+    production_plan_app.get_result_cache.cache_clear()
+
+
+def test_api_executor_stats(client):
+    stats = client.get("/executor").json()
+    assert stats["admission"]["max_queue"] == 100
+    assert set(stats["admission"]["rejected"]) == {"queue_full", "deadline_exceeded"}
+
+
+def test_default_concurrency_limit(monkeypatch):
+    # Bounded by the workers unless set, so the queue limit applies
+    settings = get_app_settings()
+    monkeypatch.setattr(settings, "executor_thread_workers", 3)
+    monkeypatch.setattr(settings, "executor_process_workers", 1)
+    get_executor.cache_clear()
+    try:
+        assert get_executor().admission.max_concurrency == 4
+        monkeypatch.setattr(settings, "admission_max_concurrency", 2)
+        get_executor.cache_clear()
+        assert get_executor().admission.max_concurrency == 2
+    finally:
+        get_executor.cache_clear()
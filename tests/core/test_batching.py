@@ -0,0 +1,54 @@
+import asyncio
+from api.core.batching import MicroBatcher
+
+
+def run_batches(batcher, submissions):
+    async def run_all():
+        return await asyncio.gather(*(batcher.submit(key, item) for key, item in submissions), return_exceptions=True)
+
+    return asyncio.run(run_all())
+
+
+def test_items_in_window_are_batched_by_key():
+    batches = []
+
+    async def run(key, items):
+        batches.append((key, items))
+        return [f"{key}{item}" for item in items]
+
+    batcher = MicroBatcher(run, window=0.01, max_size=10)
+    results = run_batches(batcher, [("a", 1), ("b", 2), ("a", 3)])
+
+    assert results == ["a1", "b2", "a3"]
+    assert sorted(batches) == [("a", [1, 3]), ("b", [2])]
+    assert batcher.pending == 0
+
+
+def test_full_batches_run_straight_away():
+    batches = []
+
+    async def run(key, items):
+        batches.append(items)
+        return items
+
+    # The window is never waited for, as batches fill up before
+    batcher = MicroBatcher(run, window=60, max_size=2)
+    assert run_batches(batcher, [("a", 1), ("a", 2), ("a", 3), ("a", 4)]) == [1, 2, 3, 4]
+    assert batches == [[1, 2], [3, 4]]
+
+
+def test_errors_go_to_their_item():
+    async def run(key, items):
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    results = run_batches(MicroBatcher(run, window=0.01, max_size=10), [("a", 1), ("a", -1)])
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+
+
+def test_failed_batch_fails_all_its_items():
+    async def run(key, items):
+        raise RuntimeError("failed")
+
+    results = run_batches(MicroBatcher(run, window=0.01, max_size=10), [("a", 1), ("a", 2)])
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,155 @@
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+from api import create_app
+from api.core.compression import negotiate_encoding, supported_encodings
+from api.settings import get_app_settings
+
+
+@pytest.fixture(scope="function")
+def large_json_dataset(normal_json_dataset):
+    # Enough plants for the response to go over the compression threshold
+    data = json.loads(normal_json_dataset)
+    plants = [dict(plant, name=f"{plant['name']}-{i}") for i in range(20) for plant in data["powerplants"]]
+    return json.dumps(dict(data, powerplants=plants))
+
+
+def test_gzip_request(client, normal_json_dataset):
+    expected = client.post("/productionplan", data=normal_json_dataset).json()
+    response = client.post(
+        "/productionplan", data=gzip.compress(normal_json_dataset.encode()), headers={"Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+def test_zstd_request(client, normal_json_dataset):
+    zstandard = pytest.importorskip("zstandard")
+    expected = client.post("/productionplan", data=normal_json_dataset).json()
+    body = zstandard.ZstdCompressor().compress(normal_json_dataset.encode())
+    response = client.post("/productionplan", data=body, headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
+def test_invalid_zstd_request(client, normal_json_dataset):
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(normal_json_dataset.encode())
+    response = client.post("/productionplan", data=body[:-10], headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 400
+    assert "truncated" in response.json()["message"]
+    response = client.post("/productionplan", data=b"not zstd", headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+@pytest.mark.parametrize("trailing", [b"{}", b" " * 1000], ids=["short", "long"])
+def test_trailing_data_request(client, normal_json_dataset, encoding, trailing):
+    if encoding == "zstd":
+        compress = pytest.importorskip("zstandard").ZstdCompressor().compress
+    else:
+        compress = gzip.compress
+    body = compress(normal_json_dataset.encode()) + trailing
+    response = client.post("/productionplan", data=body, headers={"Content-Encoding": encoding})
+    assert response.status_code == 400
+    assert "data after the end of the stream" in response.json()["message"]
+def test_zstd_decompressed_size_limit(normal_json_dataset, monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    monkeypatch.setattr(get_app_settings(), "request_max_decompressed_mb", 1)
+    client = TestClient(create_app(testing=True))
+    body = zstandard.ZstdCompressor().compress(normal_json_dataset.encode() + b" " * (64 * 1024 * 1024))
+    response = client.post("/productionplan", data=body, headers={"Content-Encoding": "zstd"})
+    assert response.status_code == 413
+
+
+def test_zstd_response(client, large_json_dataset):
+    zstandard = pytest.importorskip("zstandard")
+    response = client.post(
+        "/productionplan", data=large_json_dataset, headers={"Accept-Encoding": "gzip, zstd"}, stream=True
+    )
+    assert response.headers["content-encoding"] == "zstd"
+    assert len(json.loads(zstandard.ZstdDecompressor().decompressobj().decompress(response.raw.read()))) == 120
+
+
+def test_decompressed_size_limit(normal_json_dataset, monkeypatch):
+    # The limit is given to the middleware when the app is created
+    monkeypatch.setattr(get_app_settings(), "request_max_decompressed_mb", 1)
+    client = TestClient(create_app(testing=True))
+    # Padding compresses into a few kilobytes, but inflates over the limit
+    body = gzip.compress(normal_json_dataset.encode() + b" " * (2 * 1024 * 1024))
+    response = client.post("/productionplan", data=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+    assert response.json()["code"] == "payload_too_large"
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip, gzip"])
+def test_unsupported_encoding(client, normal_json_dataset, encoding):
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"Content-Encoding": encoding})
+    assert response.status_code == 415
+    assert response.json()["code"] == "unsupported_media_type"
+
+
+def test_invalid_gzip_request(client, normal_json_dataset):
+    body = gzip.compress(normal_json_dataset.encode())
+    response = client.post("/productionplan", data=body[:-10], headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+    response = client.post("/productionplan", data=b"not gzip", headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 400
+
+
+def test_gzip_response(client, large_json_dataset):
+    response = client.post("/productionplan", data=large_json_dataset, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(response.json()) == 120
+
+
+@pytest.mark.parametrize("dataset", ["large_json_dataset", "normal_json_dataset"])
+def test_not_modified_keeps_etag(client, dataset, request):
+    # Compressed or not, the 304 response carries the same tag as the 200 one it revalidates
+    body = request.getfixturevalue(dataset)
+    response = client.post("/productionplan", data=body, headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert etag.startswith("W/")
+
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": etag}
+    response = client.post("/productionplan", data=body, headers=headers)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert "accept-encoding" in response.headers["vary"].lower()
+
+
+def test_gzip_streamed_response(client, large_json_dataset):
+    headers = {"Accept-Encoding": "gzip", "Accept": "application/x-ndjson"}
+    response = client.post("/productionplan", data=large_json_dataset, headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 120
+
+
+def test_small_response_not_compressed(client, normal_json_dataset):
+    response = client.post("/productionplan", data=normal_json_dataset, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_identity_response(client, large_json_dataset):
+    response = client.post("/productionplan", data=large_json_dataset, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP;q=0.5, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("*", supported_encodings()[0]),
+        ("*;q=0.1, gzip;q=0", "zstd" if "zstd" in supported_encodings() else None),
+        ("x-gzip", "gzip"),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
@@ -0,0 +1,51 @@
+import os
+import pickle
+import asyncio
+import threading
+from api.core.exceptions import BadRequestException
+from api.core.executor import INLINE, PROCESS, THREAD, Executor
+
+
+def current_worker():
+    return os.getpid(), threading.get_ident()
+
+
+def test_executor_backend_by_size():
+    executor = Executor(inline_max_size=10, process_min_size=1000, thread_workers=2, process_workers=2)
+
+    assert executor.backend(10) == INLINE
+    assert executor.backend(11) == THREAD
+    assert executor.backend(1000) == PROCESS
+    assert executor.backend(1000, processes=False) == THREAD
+
+
+def test_executor_without_process_workers_uses_threads():
+    executor = Executor(inline_max_size=10, process_min_size=1000, thread_workers=2, process_workers=0)
+
+    assert executor.backend(10**6) == THREAD
+
+
+def test_executor_runs_on_each_backend():
+    executor = Executor(inline_max_size=10, process_min_size=1000, thread_workers=2, process_workers=1)
+
+    async def run_all():
+        return [await executor.run(current_worker, size=size) for size in (1, 100, 1000)]
+
+    try:
+        inline, thread, process = asyncio.run(run_all())
+    finally:
+        executor.shutdown()
+
+    assert inline == current_worker()
+    assert thread[0] == os.getpid() and thread[1] != threading.get_ident()
+    assert process[0] != os.getpid()
+    assert executor.stats["completed"] == {INLINE: 1, THREAD: 1, PROCESS: 1}
+    assert executor.stats["pending"] == {INLINE: 0, THREAD: 0, PROCESS: 0}
+
+
+def test_api_exceptions_can_be_pickled():
+    error = pickle.loads(pickle.dumps(BadRequestException("Invalid fuels")))
+
+    assert isinstance(error, BadRequestException)
+    assert error.data == BadRequestException("Invalid fuels").data
+    assert error.status_code == 400
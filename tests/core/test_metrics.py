@@ -0,0 +1,55 @@
+from api.core import metrics
+from api.core.metrics import Counter, Gauge, Histogram, Registry
+from api.settings import get_app_settings
+
+
+def test_histogram_samples_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1])
+    histogram.observe(0.05, "sort")
+    histogram.observe(0.5, "sort")
+    histogram.observe(5, "sort")
+
+    assert list(histogram.samples()) == [
+        'latency_seconds_bucket{stage="sort",le="0.1"} 1',
+        'latency_seconds_bucket{stage="sort",le="1.0"} 2',
+        'latency_seconds_bucket{stage="sort",le="+Inf"} 3',
+        'latency_seconds_sum{stage="sort"} 5.55',
+        'latency_seconds_count{stage="sort"} 3',
+    ]
+    assert histogram.count("sort") == 3
+
+
+def test_registry_render():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Requests", ["status"]))
+    registry.register(Gauge("pending", "Pending tasks", lambda: {(): 2}))
+    counter.inc("200")
+    counter.inc("200")
+    counter.inc('4"0"4')
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{status="200"} 2.0\n'
+        'requests_total{status="4\\"0\\"4"} 1.0\n'
+        "# HELP pending Pending tasks\n"
+        "# TYPE pending gauge\n"
+        "pending 2\n"
+    )
+
+
+def test_stage_does_nothing_when_disabled(monkeypatch):
+    monkeypatch.setattr(get_app_settings(), "metrics_enabled", False)
+    before = metrics.STAGE_DURATION.count("disabled_stage")
+    with metrics.stage("disabled_stage"):
+        pass
+
+    assert metrics.STAGE_DURATION.count("disabled_stage") == before
+
+
+def test_stage_observes_duration():
+    before = metrics.STAGE_DURATION.count("enabled_stage")
+    with metrics.stage("enabled_stage"):
+        pass
+
+    assert metrics.STAGE_DURATION.count("enabled_stage") == before + 1
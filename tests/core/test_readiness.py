@@ -0,0 +1,61 @@
+import sys
+import subprocess
+from fastapi.testclient import TestClient
+from api.core import readiness
+from api.core.readiness import Readiness
+
+
+def test_ready_after_warm_up():
+    calls = []
+    ready = Readiness()
+    ready.register("first", lambda: calls.append("first"))
+    ready.register("second", lambda: calls.append("second"))
+    assert not ready.ready
+
+    ready.warm_up()
+    assert ready.ready
+    assert calls == ["first", "second"]
+    assert list(ready.stats["warm_up_ms"]) == ["first", "second"]
+
+
+def test_failed_warm_up_is_not_ready():
+    def fail():
+        raise RuntimeError("cold")
+
+    ready = Readiness()
+    ready.register("failing", fail)
+    ready.warm_up()
+
+    assert not ready.ready
+    assert ready.error == "Warm-up task 'failing' failed: cold"
+
+
+def test_ready_endpoint(app, monkeypatch):
+    monkeypatch.setattr(readiness, "get_readiness", lambda: ready)
+    ready = Readiness()
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["code"] == "service_unavailable"
+
+    ready.ready = True
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True, "warm_up_ms": {}}
+
+
+def test_ready_once_started(app):
+    # Startup runs the warm-up of the services, shutdown waits for it to finish
+    with TestClient(app):
+        pass
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 200
+    assert set(response.json()["warm_up_ms"]) == {"executor", "production_plan"}
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    code = (
+        "import sys; from api import create_app; create_app(); "
+        "print(sorted(set(sys.modules) & {'pandas', 'msgpack', 'pyarrow'}))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.splitlines()[-1] == "[]"
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import subprocess
+import urllib.error
+import urllib.request
+import pytest
+from api.core.server import Supervisor, available_cpus, worker_count
+
+
+SUPERVISOR = """
+import sys, logging, uvicorn
+from api.core.server import Supervisor
+logging.basicConfig(level=logging.INFO)
+Supervisor(uvicorn.Config("api:create_app", port=int(sys.argv[1]), factory=True), 2, ready_timeout=20).run()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_worker_count():
+    assert worker_count(3) == 3
+    assert worker_count(0) == len(available_cpus())
+
+
+def test_cpu_affinity():
+    supervisor = Supervisor(config=None, workers=4, cpu_affinity=True)
+    supervisor.cpus = [2, 5]
+    assert [supervisor.cpu(slot) for slot in range(4)] == [2, 5, 2, 5]
+    supervisor.cpu_affinity = False
+    assert supervisor.cpu(0) is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Workers are restarted with SIGHUP")
+def test_supervisor_serves_restarts_and_stops(tmp_path):
+    port = free_port()
+    log = tmp_path / "supervisor.log"
+    with open(log, "w") as stream:
+        process = subprocess.Popen([sys.executable, "-c", SUPERVISOR, str(port)], stdout=stream, stderr=stream)
+
+    def ready():
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    try:
+        assert wait_for(lambda: log.read_text().count("ready in") == 2), log.read_text()
+        assert ready()
+
+        # Workers are replaced one at a time, once their replacement is ready
+        process.send_signal(signal.SIGHUP)
+        assert wait_for(lambda: "Workers restarted" in log.read_text()), log.read_text()
+        assert log.read_text().count("Started worker") == 4
+        assert ready()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    assert "Stopping workers" in log.read_text()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Workers are restarted with SIGHUP")
+def test_workers_share_registered_fleets(tmp_path, normal_json_dataset):
+    port = free_port()
+    log = tmp_path / "main.log"
+    env = dict(os.environ, CFG_FILE="", SERVER_WORKERS="2", LISTEN_PORT=str(port), WARM_UP_ENABLED="False")
+    with open(log, "w") as stream:
+        process = subprocess.Popen([sys.executable, "main.py"], stdout=stream, stderr=stream, env=env)
+
+    def call(method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body, method=method)
+        request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    data = json.loads(normal_json_dataset)
+    dispatch = {"fleet_id": "f1", "load": 480, "fuels": data["fuels"]}
+    try:
+        assert wait_for(lambda: log.read_text().count("ready in") == 2), log.read_text()
+        assert call("PUT", "/fleets/f1", {"powerplants": data["powerplants"]}) == 200
+        # Each request opens a new connection, accepted by either worker
+        assert [call("POST", "/productionplan/fleet", dispatch) for _ in range(20)] == [200] * 20
+        assert call("DELETE", "/fleets/f1") == 204
+        assert [call("POST", "/productionplan/fleet", dispatch) for _ in range(20)] == [404] * 20
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0